@@ -56,6 +56,22 @@ class StrategyDevelopInput(BaseOverlay):
         column_layout.addWidget(decision_script_input)
         self.decision_script_input = decision_script_input
 
+        # column layout
+        column_layout = QtWidgets.QVBoxLayout()
+        this_layout.addLayout(column_layout)
+
+        # title
+        detail_text = QtWidgets.QLabel()
+        detail_text.setText("Signals script (optional, for simulation)")
+        detail_text.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        column_layout.addWidget(detail_text)
+
+        # input
+        signals_script_input = ScriptEditor(self)
+        signals_script_input.setPlainText(strategy.signals_script)
+        column_layout.addWidget(signals_script_input)
+        self.signals_script_input = signals_script_input
+
         # ■■■■■ a card ■■■■■
 
         # card structure
@@ -76,6 +92,7 @@ class StrategyDevelopInput(BaseOverlay):
         async def job_ss():
             strategy.indicators_script = indicators_script_input.toPlainText()
             strategy.decision_script = decision_script_input.toPlainText()
+            strategy.signals_script = signals_script_input.toPlainText()
             self.done_event.set()
 
         button = QtWidgets.QPushButton("Save and close", card)
@@ -113,6 +130,13 @@ class StrategyDevelopInput(BaseOverlay):
 
             decision_script_input.setPlainText(script)
 
+            # signals script
+            filepath = PACKAGE_PATH / "static" / "sample_signals_script.txt"
+            async with aiofiles.open(filepath, "r", encoding="utf8") as file:
+                script = await file.read()
+
+            signals_script_input.setPlainText(script)
+
             await ask(
                 "Sample scripts applied",
                 "It hasn't been saved yet,"
@@ -163,7 +187,13 @@ class StrategyDevelopInput(BaseOverlay):
         is_decision_script_saved = written_decision == strategy.decision_script
         written_indicators = self.indicators_script_input.toPlainText()
         is_indicators_script_saved = written_indicators == strategy.indicators_script
-        if is_decision_script_saved and is_indicators_script_saved:
+        written_signals = self.signals_script_input.toPlainText()
+        is_signals_script_saved = written_signals == strategy.signals_script
+        if (
+            is_decision_script_saved
+            and is_indicators_script_saved
+            and is_signals_script_saved
+        ):
             return True
 
         should_close = False
@@ -2,14 +2,31 @@ from .analyze_market import (
     CalculationInput,
     CalculationOutput,
     SimulationError,
+    compile_decision_script,
     decide,
     make_indicators,
     simulate_chunk,
 )
 from .api_requester import ApiRequester, ApiRequestError
-from .api_streamer import ApiStreamer
+from .api_streamer import (
+    JSON_BACKEND,
+    OVERFLOW_POLICIES,
+    ApiMultiStreamer,
+    ApiStreamer,
+    MessageQueue,
+    decode_aggregate_trade,
+    decode_book_ticker,
+    decode_json,
+    decode_mark_prices,
+)
 from .backward_compatibility import examine_data_files
 from .ball import ball_ceil, ball_floor
+from .candle_builder import CandleBuilder
+from .candle_cache import CandleCache
+from .candle_journal import CandleJournal
+from .candle_pyramid import PYRAMID_LEVELS, CandlePyramid, choose_pyramid_level
+from .candle_store import CANDLE_FIELDS, CandleAssembler, CandleStore
+from .chart_points import decimate_points, make_candle_points
 from .check_internet import (
     internet_connected,
     is_internet_checked,
@@ -19,14 +36,25 @@ from .check_internet import (
 )
 from .compare_versions import is_left_version_higher
 from .convert import list_to_dict, slice_deque
+from .coverage_bitmap import CoverageBitmap, find_coverage_origin
+from .coverage_manifest import (
+    COVERAGE_SOURCES,
+    CoverageManifest,
+    check_day_completeness,
+)
 from .download_from_binance import (
+    BINANCE_DATA_URL,
+    ArchiveDownloader,
     DownloadPreset,
-    download_aggtrade_data,
+    convert_aggtrade_archive,
     fill_holes_with_aggtrades,
 )
+from .line_buffer import LineBuffer
 from .log_handler import LogHandler
 from .pandas_related import combine_candle_data
 from .percent_axis_item import PercentAxisItem
+from .record_key import RecordKeyAllocator
+from .ring_buffer import RingBuffer
 from .rw_lock import RWLock
 from .simply_format import format_numeric
 from .sort_pandas import sort_data_frame, sort_series
@@ -42,6 +70,8 @@ from .structs import (
     BOARD_LOCK_OPTIONS,
     AggregateTrade,
     BookTicker,
+    Candle,
+    LatestPrices,
     ManagementSettings,
     MarkPrice,
     SimulationSettings,
@@ -65,8 +95,32 @@ __all__ = [
     "ApiRequester",
     "ApiRequestError",
     "ApiStreamer",
+    "ApiMultiStreamer",
+    "MessageQueue",
+    "OVERFLOW_POLICIES",
+    "JSON_BACKEND",
+    "decode_json",
+    "decode_book_ticker",
+    "decode_aggregate_trade",
+    "decode_mark_prices",
     "ball_ceil",
     "ball_floor",
+    "CandleAssembler",
+    "CandleBuilder",
+    "CandleCache",
+    "CandleJournal",
+    "CandlePyramid",
+    "PYRAMID_LEVELS",
+    "choose_pyramid_level",
+    "CandleStore",
+    "CANDLE_FIELDS",
+    "CoverageBitmap",
+    "find_coverage_origin",
+    "CoverageManifest",
+    "COVERAGE_SOURCES",
+    "check_day_completeness",
+    "decimate_points",
+    "make_candle_points",
     "when_internet_connected",
     "when_internet_disconnected",
     "internet_connected",
@@ -75,14 +129,20 @@ __all__ = [
     "is_left_version_higher",
     "list_to_dict",
     "decide",
-    "download_aggtrade_data",
+    "compile_decision_script",
+    "ArchiveDownloader",
+    "BINANCE_DATA_URL",
+    "convert_aggtrade_archive",
     "examine_data_files",
     "fill_holes_with_aggtrades",
+    "LineBuffer",
     "LogHandler",
     "make_indicators",
     "PercentAxisItem",
+    "RecordKeyAllocator",
     "add_task_duration",
     "get_task_duration",
+    "RingBuffer",
     "RWLock",
     "format_numeric",
     "sort_data_frame",
@@ -119,5 +179,7 @@ __all__ = [
     "BookTicker",
     "MarkPrice",
     "AggregateTrade",
+    "Candle",
+    "LatestPrices",
     "slice_deque",
 ]
@@ -1,16 +1,19 @@
+import functools
 import itertools
 import math
 import random
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from multiprocessing.managers import ListProxy
-from types import CodeType
+from types import CodeType, FunctionType
 from typing import Tuple
 
 import numpy as np
 import pandas as pd
 import pandas_ta as ta
 
+from .record_key import RecordKeyAllocator
+
 
 def make_indicators(
     target_symbols: list[str],
@@ -78,6 +81,26 @@ def make_indicators(
         return indicators
 
 
+@functools.lru_cache(maxsize=16)
+def compile_decision_script(decision_script: str) -> FunctionType:
+    """
+    Turns a decision script into a function only once in each process.
+    The function runs the compiled module code in a namespace of its own,
+    so star imports and global names behave just like with `exec`.
+    That namespace persists across calls, like module globals,
+    and each decision only replaces the names given to the script.
+    """
+
+    code = compile(decision_script, "<string>", "exec")
+    namespace = {
+        "datetime": datetime,
+        "timezone": timezone,
+        "timedelta": timedelta,
+        "math": math,
+    }
+    return FunctionType(code, namespace)
+
+
 def decide(
     target_symbols: list[str],
     current_moment: datetime,
@@ -85,7 +108,7 @@ def decide(
     current_indicators: np.record,
     account_state: dict,
     scribbles: dict,
-    decision_script: str | CodeType,
+    decision_script: str,
 ) -> Tuple[dict, dict]:
     # ■■■■■ decision template ■■■■■
 
@@ -95,21 +118,17 @@ def decide(
 
     # ■■■■■ write decisions ■■■■■
 
-    namespace = {
-        "datetime": datetime,
-        "timezone": timezone,
-        "timedelta": timedelta,
-        "math": math,
-        "target_symbols": target_symbols,
-        "current_moment": current_moment,
-        "current_candle_data": current_candle_data,
-        "current_indicators": current_indicators,
-        "account_state": account_state,
-        "scribbles": scribbles,
-        "decision": decision,
-    }
+    decision_function = compile_decision_script(decision_script)
+    namespace = decision_function.__globals__
+    namespace["target_symbols"] = target_symbols
+    namespace["current_moment"] = current_moment
+    namespace["current_candle_data"] = current_candle_data
+    namespace["current_indicators"] = current_indicators
+    namespace["account_state"] = account_state
+    namespace["scribbles"] = scribbles
+    namespace["decision"] = decision
 
-    exec(decision_script, namespace)
+    decision_function()
 
     # ■■■■■ return decision ■■■■■
 
@@ -141,6 +160,7 @@ class CalculationInput:
     chunk_account_state: dict
     chunk_virtual_state: dict
     decision_script: str
+    signals_script: str = ""
 
 
 @dataclass
@@ -152,6 +172,168 @@ class CalculationOutput:
     chunk_virtual_state: dict
 
 
+# Placements other than `cancel_all`, in the order of being checked.
+# Each has whether it waits for the price to cross its boundary,
+# the trade role, and the direction of the amount shift.
+# Direction zero means closing the position.
+PLACEMENT_KINDS = (
+    ("now_close", False, "taker", 0),
+    ("now_buy", False, "taker", 1),
+    ("now_sell", False, "taker", -1),
+    ("later_up_close", True, "taker", 0),
+    ("later_down_close", True, "taker", 0),
+    ("later_up_buy", True, "taker", 1),
+    ("later_down_buy", True, "taker", 1),
+    ("later_up_sell", True, "taker", -1),
+    ("later_down_sell", True, "taker", -1),
+    ("book_buy", True, "maker", 1),
+    ("book_sell", True, "maker", -1),
+)
+
+# Placement names by slot, where `cancel_all` comes after `PLACEMENT_KINDS`.
+PLACEMENT_NAMES = tuple(k[0] for k in PLACEMENT_KINDS) + ("cancel_all",)
+PLACEMENT_SLOTS = {name: slot for slot, name in enumerate(PLACEMENT_NAMES)}
+CANCEL_SLOT = PLACEMENT_SLOTS["cancel_all"]
+
+
+@dataclass(slots=True)
+class PlacementCommand:
+    order_id: int
+    boundary: float | None = None
+    margin: float | None = None
+
+
+@dataclass(slots=True)
+class SymbolPlacements:
+    """
+    Placements of a symbol while a chunk is simulated,
+    held in fixed slots instead of dictionaries keyed by names.
+    They're converted from and to the dictionaries of the virtual state
+    only at the boundaries of a chunk.
+    """
+
+    commands: list[PlacementCommand | None]
+    placed_slots: list[int]  # In the order of being placed
+
+    @classmethod
+    def from_dict(cls, symbol_placements: dict[str, dict]) -> "SymbolPlacements":
+        placements = cls([None] * len(PLACEMENT_NAMES), [])
+        for placement_name, command in symbol_placements.items():
+            placements.place(placement_name, command, command["order_id"])
+        return placements
+
+    def to_dict(self) -> dict[str, dict]:
+        symbol_placements = {}
+        for slot in self.placed_slots:
+            command = self.commands[slot]
+            if command is None:
+                continue
+            command_dict = {}
+            if command.boundary is not None:
+                command_dict["boundary"] = command.boundary
+            if command.margin is not None:
+                command_dict["margin"] = command.margin
+            command_dict["order_id"] = command.order_id
+            symbol_placements[PLACEMENT_NAMES[slot]] = command_dict
+        return symbol_placements
+
+    def place(self, placement_name: str, command: dict, order_id: int):
+        # A placement with the same name is replaced, keeping its turn.
+        slot = PLACEMENT_SLOTS.get(placement_name)
+        if slot is None:
+            raise SimulationError(f"Got an unknown placement {placement_name}")
+        if slot < CANCEL_SLOT and PLACEMENT_KINDS[slot][1]:
+            if "boundary" not in command:
+                raise SimulationError(f"Got {placement_name} without a boundary")
+        if self.commands[slot] is None:
+            self.placed_slots.append(slot)
+        self.commands[slot] = PlacementCommand(
+            order_id,
+            command.get("boundary"),
+            command.get("margin"),
+        )
+
+    def remove(self, slot: int):
+        self.commands[slot] = None
+        self.placed_slots.remove(slot)
+
+
+def find_price_columns(
+    candle_columns: pd.Index,
+) -> dict[str, tuple[int, int, int, int]]:
+    """
+    Returns positions of open, high, low and close columns of each symbol.
+    """
+
+    price_columns: dict[str, tuple[int, int, int, int]] = {}
+    for symbol in candle_columns.get_level_values(0).unique():
+        price_columns[symbol] = (
+            int(candle_columns.get_loc((symbol, "Open"))),  # type:ignore
+            int(candle_columns.get_loc((symbol, "High"))),  # type:ignore
+            int(candle_columns.get_loc((symbol, "Low"))),  # type:ignore
+            int(candle_columns.get_loc((symbol, "Close"))),  # type:ignore
+        )
+    return price_columns
+
+
+def shift_location(
+    virtual_state: dict, location: dict, amount_shift: float, fill_price: float
+):
+    """
+    Applies a filled order to a virtual location of a symbol,
+    along with the available balance.
+    """
+
+    before_entry_price = location["entry_price"]
+    before_amount = location["amount"]
+
+    location["amount"] += amount_shift
+    current_amount = location["amount"]
+
+    # case when the position is created from 0
+    if before_amount == 0 and current_amount != 0:
+        location["entry_price"] = fill_price
+        invested_margin = abs(current_amount) * fill_price
+        virtual_state["available_balance"] -= invested_margin
+    # case when the position is closed from something
+    elif before_amount != 0 and current_amount == 0:
+        location["entry_price"] = 0
+        price_difference = fill_price - before_entry_price
+        realized_profit = price_difference * before_amount
+        returned_margin = abs(before_amount) * before_entry_price
+        virtual_state["available_balance"] += returned_margin
+        virtual_state["available_balance"] += realized_profit
+    # case when the position direction is flipped
+    elif before_amount * current_amount < 0:
+        location["entry_price"] = fill_price
+        price_difference = fill_price - before_entry_price
+        realized_profit = price_difference * before_amount
+        returned_margin = abs(before_amount) * before_entry_price
+        invested_margin = abs(current_amount) * fill_price
+        virtual_state["available_balance"] += returned_margin
+        virtual_state["available_balance"] -= invested_margin
+        virtual_state["available_balance"] += realized_profit
+    # case when the position size is increased one the same direction
+    elif abs(current_amount) > abs(before_amount):
+        before_numerator = before_entry_price * before_amount
+        new_numerator = fill_price * amount_shift
+        current_numerator = before_numerator + new_numerator
+        new_entry_price = current_numerator / current_amount
+        location["entry_price"] = new_entry_price
+        realized_profit = 0
+        invested_margin = abs(amount_shift) * fill_price
+        virtual_state["available_balance"] -= invested_margin
+        virtual_state["available_balance"] += realized_profit
+    # case when the position size is decreased one the same direction
+    else:
+        location["entry_price"] = before_entry_price
+        price_difference = fill_price - before_entry_price
+        realized_profit = price_difference * (-amount_shift)
+        returned_margin = abs(amount_shift) * before_entry_price
+        virtual_state["available_balance"] += returned_margin
+        virtual_state["available_balance"] += realized_profit
+
+
 def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
     # leverage is treated as 1
     # because those are going to be applied at the presentation phase
@@ -187,6 +369,11 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
         )
         return calculation_output
 
+    # ■■■■■ use array operations if signals are available ■■■■■
+
+    if can_simulate_signals(calculation_input):
+        return simulate_signals(calculation_input)
+
     # ■■■■■ convert to numpy objects for fast calculation ■■■■■
 
     calculation_index_ar = calculation_index.to_numpy()  # inside are datetime objects
@@ -195,24 +382,57 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
     asset_record_ar = chunk_asset_record.to_records()
     chunk_unrealized_changes_ar = chunk_unrealized_changes.to_frame().to_records()
 
-    # ■■■■■ actual loop calculation ■■■■■
+    # Prices are read by position from a plain 2-D array,
+    # while records are only passed to the decision script.
+    candle_values = chunk_candle_data.to_numpy()
+    price_columns = find_price_columns(chunk_candle_data.columns)
+
+    # ■■■■■ prepare room for results ■■■■■
 
     calculation_index_length = len(calculation_index_ar)
-    decision_script_compiled = compile(decision_script, "<string>", "exec")
+
+    # Each cycle adds exactly one unrealized change.
+    unrealized_changes_size = chunk_unrealized_changes_ar.shape[0]
+    chunk_unrealized_changes_ar.resize(
+        unrealized_changes_size + calculation_index_length
+    )
+
+    # Trades are unpredictable, so the room doubles whenever it's full.
+    asset_record_size = asset_record_ar.shape[0]
+
+    # Fill times are issued in order, instead of being searched in the record.
+    if asset_record_size > 0:
+        fill_time_allocator = RecordKeyAllocator(max(asset_record_ar["index"]))
+    else:
+        fill_time_allocator = RecordKeyAllocator()
+
+    # ■■■■■ actual loop calculation ■■■■■
+
     first_calculation_moment = calculation_index_ar[0]
+    all_placements = {
+        symbol: SymbolPlacements.from_dict(symbol_placements)
+        for symbol, symbol_placements in chunk_virtual_state["placements"].items()
+    }
+    all_locations = chunk_virtual_state["locations"]
 
     for cycle in range(calculation_index_length):
         before_moment = calculation_index_ar[cycle]
         current_moment = before_moment + timedelta(seconds=10)
+        candle_row = candle_values[cycle]
 
         for symbol in target_symbols:
             # ■■■■■ basic variables ■■■■■
 
-            open_price = candle_data_ar[cycle][str((symbol, "Open"))]
-            close_price = candle_data_ar[cycle][str((symbol, "Close"))]
+            open_column, high_column, low_column, close_column = price_columns[symbol]
+            open_price = candle_row[open_column]
+            close_price = candle_row[close_column]
             if math.isnan(open_price) or math.isnan(close_price):
                 continue
 
+            symbol_placements = all_placements[symbol]
+            placement_commands = symbol_placements.commands
+            symbol_location: dict[str, float] = all_locations[symbol]
+
             would_trade_happen = False
             is_new_trade_found = False
             amount_shift = 0
@@ -225,201 +445,48 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
             is_margin_negative = False
             is_margin_nan = False
 
-            # special placements
-            if "cancel_all" in chunk_virtual_state["placements"][symbol]:
-                cancel_placement_names = []
-                for placement_name in chunk_virtual_state["placements"][symbol].keys():
-                    if any(s in placement_name for s in ("later", "book")):
-                        cancel_placement_names.append(placement_name)
-                for cancel_placement_name in cancel_placement_names:
-                    chunk_virtual_state["placements"][symbol].pop(cancel_placement_name)
-                chunk_virtual_state["placements"][symbol].pop("cancel_all")
-
-            # instant placements
-            if "now_close" in chunk_virtual_state["placements"][symbol]:
-                would_trade_happen = True
-                command = chunk_virtual_state["placements"][symbol]["now_close"]
-                role = "taker"
-                fill_price = open_price + price_speed * (decision_lag / 1000)
-                amount_shift = -chunk_virtual_state["locations"][symbol]["amount"]
-                chunk_virtual_state["placements"][symbol].pop("now_close")
-
-            if "now_buy" in chunk_virtual_state["placements"][symbol]:
-                would_trade_happen = True
-                command = chunk_virtual_state["placements"][symbol]["now_buy"]
-                role = "taker"
-                fill_price = open_price + price_speed * (decision_lag / 1000)
-                fill_margin = command["margin"]
-                if fill_margin < 0:
-                    is_margin_negative = True
-                if math.isnan(fill_margin):
-                    is_margin_nan = True
-                amount_shift = fill_margin / fill_price
-                chunk_virtual_state["placements"][symbol].pop("now_buy")
-
-            if "now_sell" in chunk_virtual_state["placements"][symbol]:
-                would_trade_happen = True
-                command = chunk_virtual_state["placements"][symbol]["now_sell"]
-                role = "taker"
-                fill_price = open_price + price_speed * (decision_lag / 1000)
-                fill_margin = command["margin"]
-                if fill_margin < 0:
-                    is_margin_negative = True
-                if math.isnan(fill_margin):
-                    is_margin_nan = True
-                amount_shift = -fill_margin / fill_price
-                chunk_virtual_state["placements"][symbol].pop("now_sell")
-
-            # conditional placements
-            if "later_up_close" in chunk_virtual_state["placements"][symbol]:
-                command = chunk_virtual_state["placements"][symbol]["later_up_close"]
-                boundary = command["boundary"]
-
-                wobble_high = candle_data_ar[cycle][str((symbol, "High"))]
-                wobble_low = candle_data_ar[cycle][str((symbol, "Low"))]
-                did_cross = wobble_low < boundary < wobble_high
-
-                if did_cross:
-                    would_trade_happen = True
-                    role = "taker"
-                    fill_price = boundary
-                    amount_shift = -chunk_virtual_state["locations"][symbol]["amount"]
-                    chunk_virtual_state["placements"][symbol].pop("later_up_close")
-
-            if "later_down_close" in chunk_virtual_state["placements"][symbol]:
-                command = chunk_virtual_state["placements"][symbol]["later_down_close"]
-                boundary = command["boundary"]
-
-                wobble_high = candle_data_ar[cycle][str((symbol, "High"))]
-                wobble_low = candle_data_ar[cycle][str((symbol, "Low"))]
-                did_cross = wobble_low < boundary < wobble_high
-
-                if did_cross:
-                    would_trade_happen = True
-                    role = "taker"
-                    fill_price = boundary
-                    amount_shift = -chunk_virtual_state["locations"][symbol]["amount"]
-                    chunk_virtual_state["placements"][symbol].pop("later_down_close")
-
-            if "later_up_buy" in chunk_virtual_state["placements"][symbol]:
-                command = chunk_virtual_state["placements"][symbol]["later_up_buy"]
-                boundary = command["boundary"]
-
-                wobble_high = candle_data_ar[cycle][str((symbol, "High"))]
-                wobble_low = candle_data_ar[cycle][str((symbol, "Low"))]
-                did_cross = wobble_low < boundary < wobble_high
+            if len(symbol_placements.placed_slots) > 0:
+                # special placements
+                if placement_commands[CANCEL_SLOT] is not None:
+                    for slot in tuple(symbol_placements.placed_slots):
+                        if slot < CANCEL_SLOT and PLACEMENT_KINDS[slot][1]:
+                            symbol_placements.remove(slot)
+                    symbol_placements.remove(CANCEL_SLOT)
+
+                # instant and conditional placements
+                for slot, placement_kind in enumerate(PLACEMENT_KINDS):
+                    command = placement_commands[slot]
+                    if command is None:
+                        continue
+                    _, is_conditional, placement_role, direction = placement_kind
+
+                    if is_conditional:
+                        boundary: float = command.boundary  # type:ignore
+                        wobble_high = candle_row[high_column]
+                        wobble_low = candle_row[low_column]
+                        did_cross = wobble_low < boundary < wobble_high
+                        if not did_cross:
+                            continue
+                        fill_price = boundary
+                    else:
+                        fill_price = open_price + price_speed * (decision_lag / 1000)
 
-                if did_cross:
-                    would_trade_happen = True
-                    role = "taker"
-                    fill_price = boundary
-                    fill_margin = command["margin"]
-                    if fill_margin < 0:
-                        is_margin_negative = True
-                    if math.isnan(fill_margin):
-                        is_margin_nan = True
-                    amount_shift = fill_margin / fill_price
-                    chunk_virtual_state["placements"][symbol].pop("later_up_buy")
-
-            if "later_down_buy" in chunk_virtual_state["placements"][symbol]:
-                command = chunk_virtual_state["placements"][symbol]["later_down_buy"]
-                boundary = command["boundary"]
-
-                wobble_high = candle_data_ar[cycle][str((symbol, "High"))]
-                wobble_low = candle_data_ar[cycle][str((symbol, "Low"))]
-                did_cross = wobble_low < boundary < wobble_high
-
-                if did_cross:
-                    would_trade_happen = True
-                    role = "taker"
-                    fill_price = boundary
-                    fill_margin = command["margin"]
-                    if fill_margin < 0:
-                        is_margin_negative = True
-                    if math.isnan(fill_margin):
-                        is_margin_nan = True
-                    amount_shift = fill_margin / fill_price
-                    chunk_virtual_state["placements"][symbol].pop("later_down_buy")
-
-            if "later_up_sell" in chunk_virtual_state["placements"][symbol]:
-                command = chunk_virtual_state["placements"][symbol]["later_up_sell"]
-                boundary = command["boundary"]
-
-                wobble_high = candle_data_ar[cycle][str((symbol, "High"))]
-                wobble_low = candle_data_ar[cycle][str((symbol, "Low"))]
-                did_cross = wobble_low < boundary < wobble_high
-
-                if did_cross:
-                    would_trade_happen = True
-                    role = "taker"
-                    fill_price = boundary
-                    fill_margin = command["margin"]
-                    if fill_margin < 0:
-                        is_margin_negative = True
-                    if math.isnan(fill_margin):
-                        is_margin_nan = True
-                    amount_shift = -fill_margin / fill_price
-                    chunk_virtual_state["placements"][symbol].pop("later_up_sell")
-
-            if "later_down_sell" in chunk_virtual_state["placements"][symbol]:
-                command = chunk_virtual_state["placements"][symbol]["later_down_sell"]
-                boundary = command["boundary"]
-
-                wobble_high = candle_data_ar[cycle][str((symbol, "High"))]
-                wobble_low = candle_data_ar[cycle][str((symbol, "Low"))]
-                did_cross = wobble_low < boundary < wobble_high
-
-                if did_cross:
-                    would_trade_happen = True
-                    role = "taker"
-                    fill_price = boundary
-                    fill_margin = command["margin"]
-                    if fill_margin < 0:
-                        is_margin_negative = True
-                    if math.isnan(fill_margin):
-                        is_margin_nan = True
-                    amount_shift = -fill_margin / fill_price
-                    chunk_virtual_state["placements"][symbol].pop("later_down_sell")
-
-            if "book_buy" in chunk_virtual_state["placements"][symbol]:
-                command = chunk_virtual_state["placements"][symbol]["book_buy"]
-                boundary = command["boundary"]
-
-                wobble_high = candle_data_ar[cycle][str((symbol, "High"))]
-                wobble_low = candle_data_ar[cycle][str((symbol, "Low"))]
-                did_cross = wobble_low < boundary < wobble_high
-
-                if did_cross:
-                    would_trade_happen = True
-                    role = "maker"
-                    fill_price = boundary
-                    fill_margin = command["margin"]
-                    if fill_margin < 0:
-                        is_margin_negative = True
-                    if math.isnan(fill_margin):
-                        is_margin_nan = True
-                    amount_shift = fill_margin / fill_price
-                    chunk_virtual_state["placements"][symbol].pop("book_buy")
-
-            if "book_sell" in chunk_virtual_state["placements"][symbol]:
-                command = chunk_virtual_state["placements"][symbol]["book_sell"]
-                boundary = command["boundary"]
-
-                wobble_high = candle_data_ar[cycle][str((symbol, "High"))]
-                wobble_low = candle_data_ar[cycle][str((symbol, "Low"))]
-                did_cross = wobble_low < boundary < wobble_high
-
-                if did_cross:
                     would_trade_happen = True
-                    role = "maker"
-                    fill_price = boundary
-                    fill_margin = command["margin"]
-                    if fill_margin < 0:
-                        is_margin_negative = True
-                    if math.isnan(fill_margin):
-                        is_margin_nan = True
-                    amount_shift = -fill_margin / fill_price
-                    chunk_virtual_state["placements"][symbol].pop("book_sell")
+                    role = placement_role
+                    if direction == 0:
+                        amount_shift = -symbol_location["amount"]
+                    else:
+                        fill_margin = command.margin
+                        if fill_margin is None or math.isnan(fill_margin):
+                            is_margin_nan = True
+                            fill_margin = math.nan
+                        elif fill_margin < 0:
+                            is_margin_negative = True
+                        if direction > 0:
+                            amount_shift = fill_margin / fill_price
+                        else:
+                            amount_shift = -fill_margin / fill_price
+                    symbol_placements.remove(slot)
 
             # check if situation is okay
             if is_margin_negative:
@@ -437,55 +504,9 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
             # ■■■■■ mimic the real world phenomenon ■■■■■
 
             if would_trade_happen:
-                symbol_location = chunk_virtual_state["locations"][symbol]
-                before_entry_price = symbol_location["entry_price"]
-                before_amount = symbol_location["amount"]
-
-                symbol_location["amount"] += amount_shift
-                current_amount = symbol_location["amount"]
-
-                # case when the position is created from 0
-                if before_amount == 0 and current_amount != 0:
-                    symbol_location["entry_price"] = fill_price
-                    invested_margin = abs(current_amount) * fill_price
-                    chunk_virtual_state["available_balance"] -= invested_margin
-                # case when the position is closed from something
-                elif before_amount != 0 and current_amount == 0:
-                    symbol_location["entry_price"] = 0
-                    price_difference = fill_price - before_entry_price
-                    realized_profit = price_difference * before_amount
-                    returned_margin = abs(before_amount) * before_entry_price
-                    chunk_virtual_state["available_balance"] += returned_margin
-                    chunk_virtual_state["available_balance"] += realized_profit
-                # case when the position direction is flipped
-                elif before_amount * current_amount < 0:
-                    symbol_location["entry_price"] = fill_price
-                    price_difference = fill_price - before_entry_price
-                    realized_profit = price_difference * before_amount
-                    returned_margin = abs(before_amount) * before_entry_price
-                    invested_margin = abs(current_amount) * fill_price
-                    chunk_virtual_state["available_balance"] += returned_margin
-                    chunk_virtual_state["available_balance"] -= invested_margin
-                    chunk_virtual_state["available_balance"] += realized_profit
-                # case when the position size is increased one the same direction
-                elif abs(current_amount) > abs(before_amount):
-                    before_numerator = before_entry_price * before_amount
-                    new_numerator = fill_price * amount_shift
-                    current_numerator = before_numerator + new_numerator
-                    new_entry_price = current_numerator / current_amount
-                    symbol_location["entry_price"] = new_entry_price
-                    realized_profit = 0
-                    invested_margin = abs(amount_shift) * fill_price
-                    chunk_virtual_state["available_balance"] -= invested_margin
-                    chunk_virtual_state["available_balance"] += realized_profit
-                # case when the position size is decreased one the same direction
-                else:
-                    symbol_location["entry_price"] = before_entry_price
-                    price_difference = fill_price - before_entry_price
-                    realized_profit = price_difference * (-amount_shift)
-                    returned_margin = abs(amount_shift) * before_entry_price
-                    chunk_virtual_state["available_balance"] += returned_margin
-                    chunk_virtual_state["available_balance"] += realized_profit
+                shift_location(
+                    chunk_virtual_state, symbol_location, amount_shift, fill_price
+                )
 
                 is_new_trade_found = True
 
@@ -499,37 +520,31 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
             # ■■■■■ update the account state (symbol dependent) ■■■■■
 
             # locations
-            current_entry_price = chunk_virtual_state["locations"][symbol][
-                "entry_price"
-            ]
-            current_entry_price = float(current_entry_price)
-            current_amount = chunk_virtual_state["locations"][symbol]["amount"]
-            current_margin = abs(current_amount) * current_entry_price
-            current_margin = float(current_margin)
+            current_entry_price = float(symbol_location["entry_price"])
+            current_amount = symbol_location["amount"]
+            current_margin = float(abs(current_amount) * current_entry_price)
             symbol_position = {}
             symbol_position["entry_price"] = current_entry_price
             symbol_position["margin"] = current_margin
-            if chunk_virtual_state["locations"][symbol]["amount"] > 0:
+            if current_amount > 0:
                 symbol_position["direction"] = "long"
-            if chunk_virtual_state["locations"][symbol]["amount"] < 0:
+            if current_amount < 0:
                 symbol_position["direction"] = "short"
-            if chunk_virtual_state["locations"][symbol]["amount"] == 0:
+            if current_amount == 0:
                 symbol_position["direction"] = "none"
             chunk_account_state["positions"][symbol] = symbol_position
 
             # placements
-            symbol_placements = chunk_virtual_state["placements"][symbol]
             symbol_open_orders = {}
-            for command_name, placement in symbol_placements.items():
-                order_id = placement["order_id"]
-                boundary = float(placement["boundary"])
-                if "margin" in placement.keys():
-                    left_margin = float(placement["margin"])
+            for slot in symbol_placements.placed_slots:
+                placement: PlacementCommand = placement_commands[slot]  # type:ignore
+                if placement.margin is not None:
+                    left_margin = float(placement.margin)
                 else:
                     left_margin = None
-                symbol_open_orders[order_id] = {
-                    "command_name": command_name,
-                    "boundary": boundary,
+                symbol_open_orders[placement.order_id] = {
+                    "command_name": PLACEMENT_NAMES[slot],
+                    "boundary": float(placement.boundary),  # type:ignore
                     "left_margin": left_margin,
                 }
             chunk_account_state["open_orders"][symbol] = symbol_open_orders
@@ -538,16 +553,14 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
 
             if is_new_trade_found:
                 fill_time = before_moment + timedelta(milliseconds=decision_lag)
+                fill_time = fill_time_allocator.allocate(fill_time)
                 fill_time = np.datetime64(fill_time)
-                while fill_time in asset_record_ar["index"]:
-                    fill_time += np.timedelta64(1, "ms")
 
                 wallet_balance = chunk_virtual_state["available_balance"]
-                for symbol_key, location in chunk_virtual_state["locations"].items():
+                for symbol_key, location in all_locations.items():
                     if location["amount"] == 0:
                         continue
-                    column_key = str((symbol_key, "Close"))
-                    symbol_price = candle_data_ar[cycle][column_key]
+                    symbol_price = candle_row[price_columns[symbol_key][3]]
                     if math.isnan(symbol_price):
                         continue
                     current_margin = abs(location["amount"]) * location["entry_price"]
@@ -570,17 +583,18 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
                 if fill_price == 0:
                     raise ValueError("The fill price cannot be zero")
 
-                original_size = asset_record_ar.shape[0]
-                asset_record_ar.resize(original_size + 1)
-                asset_record_ar[-1]["index"] = fill_time
-                asset_record_ar[-1]["Cause"] = "auto_trade"
-                asset_record_ar[-1]["Symbol"] = symbol
-                asset_record_ar[-1]["Side"] = side
-                asset_record_ar[-1]["Fill Price"] = fill_price
-                asset_record_ar[-1]["Role"] = role
-                asset_record_ar[-1]["Margin Ratio"] = margin_ratio
-                asset_record_ar[-1]["Order ID"] = order_id
-                asset_record_ar[-1]["Result Asset"] = wallet_balance
+                if asset_record_size == asset_record_ar.shape[0]:
+                    asset_record_ar.resize(max(asset_record_size * 2, 1024))
+                asset_record_ar[asset_record_size]["index"] = fill_time
+                asset_record_ar[asset_record_size]["Cause"] = "auto_trade"
+                asset_record_ar[asset_record_size]["Symbol"] = symbol
+                asset_record_ar[asset_record_size]["Side"] = side
+                asset_record_ar[asset_record_size]["Fill Price"] = fill_price
+                asset_record_ar[asset_record_size]["Role"] = role
+                asset_record_ar[asset_record_size]["Margin Ratio"] = margin_ratio
+                asset_record_ar[asset_record_size]["Order ID"] = order_id
+                asset_record_ar[asset_record_size]["Result Asset"] = wallet_balance
+                asset_record_size += 1
 
                 update_time = fill_time.astype(datetime).replace(tzinfo=timezone.utc)
                 chunk_account_state["positions"][symbol]["update_time"] = update_time
@@ -589,24 +603,27 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
 
         wallet_balance = chunk_virtual_state["available_balance"]
         unrealized_profit = 0
-        for symbol_key, location in chunk_virtual_state["locations"].items():
+        for symbol_key, location in all_locations.items():
             if location["amount"] == 0:
                 continue
-            symbol_price = candle_data_ar[cycle][str((symbol_key, "Close"))]
+            open_column, high_column, low_column, close_column = price_columns[
+                symbol_key
+            ]
+            symbol_price = candle_row[close_column]
             if math.isnan(symbol_price):
                 continue
             current_margin = abs(location["amount"]) * location["entry_price"]
             wallet_balance += current_margin
             # assume that mark price doesn't wobble more than 5%
-            key_open_price = candle_data_ar[cycle][str((symbol_key, "Open"))]
-            key_close_price = candle_data_ar[cycle][str((symbol_key, "Close"))]
+            key_open_price = candle_row[open_column]
+            key_close_price = candle_row[close_column]
             if location["amount"] < 0:
                 basic_price = max(key_open_price, key_close_price) * 1.05
-                key_high_price = candle_data_ar[cycle][str((symbol_key, "High"))]
+                key_high_price = candle_row[high_column]
                 extreme_price = min(basic_price, key_high_price)
             else:
                 basic_price = min(key_open_price, key_close_price) * 0.95
-                key_low_price = candle_data_ar[cycle][str((symbol_key, "Low"))]
+                key_low_price = candle_row[low_column]
                 extreme_price = max(basic_price, key_low_price)
             price_difference = extreme_price - location["entry_price"]
             unrealized_profit += price_difference * location["amount"]
@@ -619,10 +636,9 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
 
         # ■■■■■ record (symbol independent) ■■■■■
 
-        original_size = chunk_unrealized_changes_ar.shape[0]
-        chunk_unrealized_changes_ar.resize(original_size + 1)
-        chunk_unrealized_changes_ar[-1]["index"] = before_moment
-        chunk_unrealized_changes_ar[-1]["0"] = unrealized_change
+        chunk_unrealized_changes_ar[unrealized_changes_size]["index"] = before_moment
+        chunk_unrealized_changes_ar[unrealized_changes_size]["0"] = unrealized_change
+        unrealized_changes_size += 1
 
         # ■■■■■ make decision and place order ■■■■■
 
@@ -635,13 +651,14 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
             current_indicators=current_indicators,
             account_state=chunk_account_state.copy(),
             scribbles=chunk_scribbles,
-            decision_script=decision_script_compiled,
+            decision_script=decision_script,
         )
 
         for symbol_key, symbol_decision in decision.items():
-            for each_decision in symbol_decision.values():
-                each_decision["order_id"] = random.randint(10**18, 10**19 - 1)
-            chunk_virtual_state["placements"][symbol_key].update(decision[symbol_key])
+            symbol_placements = all_placements[symbol_key]
+            for placement_name, command in symbol_decision.items():
+                order_id = random.randint(10**18, 10**19 - 1)
+                symbol_placements.place(placement_name, command, order_id)
 
         # ■■■■■ report the progress in seconds ■■■■■
 
@@ -651,8 +668,15 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
             # Do NOT report the progress too often for the sake of performance
             progress_list[target_progress] = max(progress_in_seconds, 0)
 
+    # ■■■■■ convert back placements to the virtual state ■■■■■
+
+    for symbol, symbol_placements in all_placements.items():
+        chunk_virtual_state["placements"][symbol] = symbol_placements.to_dict()
+
     # ■■■■■ convert back numpy objects to pandas objects ■■■■■
 
+    asset_record_ar = asset_record_ar[:asset_record_size]
+
     chunk_asset_record = pd.DataFrame(asset_record_ar)
     chunk_asset_record = chunk_asset_record.set_index("index")
     chunk_asset_record.index.name = None
@@ -676,3 +700,417 @@ def simulate_chunk(calculation_input: CalculationInput) -> CalculationOutput:
         chunk_virtual_state=chunk_virtual_state,
     )
     return calculation_output
+
+
+# Placements that signals can make, in the order of being checked.
+SIGNAL_PLACEMENTS = ("now_close", "now_buy", "now_sell")
+
+
+def make_target_positions(
+    target_symbols: list[str],
+    candle_data: pd.DataFrame,
+    indicators: pd.DataFrame,
+    signals_script: str,
+) -> dict[str, np.ndarray]:
+    """
+    Runs a signals script and returns target positions of each symbol
+    over the whole index, as margin ratios to the wallet balance.
+    Positive means long, negative means short and zero means no position,
+    while NaN means that there's no new target at that moment.
+    """
+
+    target_positions = {}
+    namespace = {
+        "pd": pd,
+        "np": np,
+        "target_symbols": target_symbols,
+        "candle_data": candle_data,
+        "indicators": indicators,
+        "target_positions": target_positions,
+    }
+    exec(signals_script, namespace)
+
+    index_length = len(candle_data)
+    target_position_ars: dict[str, np.ndarray] = {}
+    for symbol in target_symbols:
+        target_position = target_positions.get(symbol, np.nan)
+        if isinstance(target_position, pd.Series):
+            target_position = target_position.reindex(candle_data.index)
+        target_position_ar = np.asarray(target_position, dtype=np.float64)
+        if target_position_ar.ndim == 0:
+            target_position_ar = np.full(index_length, target_position_ar)
+        if target_position_ar.shape != (index_length,):
+            text = f"Target positions of {symbol} don't match the candle data"
+            raise SimulationError(text)
+        target_position_ars[symbol] = target_position_ar
+
+    return target_position_ars
+
+
+def can_simulate_signals(calculation_input: CalculationInput) -> bool:
+    """
+    Tells whether a chunk can be simulated from signals.
+    Placements waiting for a price boundary depend on the path of prices,
+    so those are left to the per-bar simulation with the decision script.
+    """
+
+    if calculation_input.signals_script.strip() == "":
+        return False
+
+    all_placements = calculation_input.chunk_virtual_state["placements"]
+    for symbol_placements in all_placements.values():
+        for placement_name in symbol_placements.keys():
+            if placement_name not in SIGNAL_PLACEMENTS:
+                return False
+
+    return True
+
+
+def simulate_signals(calculation_input: CalculationInput) -> CalculationOutput:
+    """
+    Simulates a chunk from target positions made by the signals script.
+    A target is decided at the end of the candle where it changes
+    and is filled in the next candle with prices, just like `now_` orders.
+    The order keeps the margin sized at the decision while it waits,
+    unlike decision scripts that size a new order on every candle.
+    Only candles with decisions or fills are visited one by one,
+    while unrealized changes are calculated over the whole index at once.
+    """
+
+    # ■■■■■ get data ■■■■■
+
+    progress_list = calculation_input.progress_list
+    target_progress = calculation_input.target_progress
+    target_symbols = calculation_input.target_symbols
+    calculation_index = calculation_input.calculation_index
+    chunk_candle_data = calculation_input.chunk_candle_data
+    chunk_indicators = calculation_input.chunk_indicators
+    chunk_asset_record = calculation_input.chunk_asset_record
+    chunk_unrealized_changes = calculation_input.chunk_unrealized_changes
+    chunk_scribbles = calculation_input.chunk_scribbles
+    chunk_account_state = calculation_input.chunk_account_state
+    chunk_virtual_state = calculation_input.chunk_virtual_state
+    signals_script = calculation_input.signals_script
+
+    # ■■■■■ basic values ■■■■■
+
+    decision_lag = 3000  # milliseconds
+
+    # ■■■■■ prepare arrays ■■■■■
+
+    calculation_index_ar = calculation_index.to_numpy()  # inside are datetime objects
+    index_length = len(calculation_index_ar)
+    bar_numbers = np.arange(index_length)
+
+    target_position_ars = make_target_positions(
+        target_symbols=target_symbols,
+        candle_data=chunk_candle_data,
+        indicators=chunk_indicators,
+        signals_script=signals_script,
+    )
+
+    candle_values = chunk_candle_data.to_numpy(dtype=np.float64)
+    price_columns = find_price_columns(chunk_candle_data.columns)
+    open_ars: dict[str, np.ndarray] = {}
+    high_ars: dict[str, np.ndarray] = {}
+    low_ars: dict[str, np.ndarray] = {}
+    close_ars: dict[str, np.ndarray] = {}
+    tradable_bars: dict[str, np.ndarray] = {}
+    next_tradable_ars: dict[str, np.ndarray] = {}
+    is_decided_ars: dict[str, np.ndarray] = {}
+    is_any_decided_ar = np.zeros(index_length, dtype=np.bool_)
+
+    # Last targets are remembered, so that calculation can continue later.
+    last_targets: dict[str, float] = chunk_virtual_state.get("target_positions", {})
+
+    for symbol in target_symbols:
+        open_column, high_column, low_column, close_column = price_columns[symbol]
+        open_ars[symbol] = candle_values[:, open_column]
+        high_ars[symbol] = candle_values[:, high_column]
+        low_ars[symbol] = candle_values[:, low_column]
+        close_ars[symbol] = candle_values[:, close_column]
+
+        # Orders are filled only in candles with both open and close prices.
+        is_tradable_ar = ~np.isnan(open_ars[symbol]) & ~np.isnan(close_ars[symbol])
+        tradable_bars[symbol] = np.flatnonzero(is_tradable_ar)
+        tradable_ar = np.where(is_tradable_ar, bar_numbers, index_length)
+        next_tradable_ar = np.minimum.accumulate(tradable_ar[::-1])[::-1]
+        next_tradable_ars[symbol] = np.append(next_tradable_ar, index_length)
+
+        # Targets are acted on only when they change.
+        target_position_ar = target_position_ars[symbol]
+        last_target = last_targets.get(symbol, np.nan)
+        previous_target_ar = np.append(last_target, target_position_ar)
+        previous_target_ar = pd.Series(previous_target_ar).ffill().to_numpy()
+        is_decided_ar = ~np.isnan(target_position_ar)
+        is_decided_ar &= target_position_ar != previous_target_ar[:-1]
+        if not math.isnan(previous_target_ar[-1]):
+            last_targets[symbol] = float(previous_target_ar[-1])
+        is_decided_ars[symbol] = is_decided_ar
+        is_any_decided_ar |= is_decided_ar
+
+    decision_bars = np.flatnonzero(is_any_decided_ar)
+
+    # ■■■■■ take over the virtual state ■■■■■
+
+    all_placements = chunk_virtual_state["placements"]
+    all_locations = chunk_virtual_state["locations"]
+
+    initial_balance = chunk_virtual_state["available_balance"]
+    initial_locations = {
+        symbol: (location["amount"], location["entry_price"])
+        for symbol, location in all_locations.items()
+    }
+
+    # Orders waiting to be filled, with the candle they would be filled in.
+    pending_orders: dict[str, tuple[int, str, dict]] = {}
+    for symbol in target_symbols:
+        symbol_placements = all_placements[symbol]
+        for placement_name in SIGNAL_PLACEMENTS:
+            if placement_name in symbol_placements:
+                fill_bar = int(next_tradable_ars[symbol][0])
+                command = symbol_placements[placement_name]
+                pending_orders[symbol] = (fill_bar, placement_name, command)
+        symbol_placements.clear()
+
+    def measure_wallet_balance(bar: int) -> float:
+        wallet_balance = chunk_virtual_state["available_balance"]
+        for symbol_key, location in all_locations.items():
+            if location["amount"] == 0:
+                continue
+            if math.isnan(close_ars[symbol_key][bar]):
+                continue
+            wallet_balance += abs(location["amount"]) * location["entry_price"]
+        return wallet_balance
+
+    # ■■■■■ visit candles with decisions or fills ■■■■■
+
+    if len(chunk_asset_record) > 0:
+        fill_time_allocator = RecordKeyAllocator(chunk_asset_record.index.max())
+    else:
+        fill_time_allocator = RecordKeyAllocator()
+
+    balance_changes: list[tuple[int, float]] = []
+    amount_changes: dict[str, list[tuple[int, float]]] = {}
+    entry_price_changes: dict[str, list[tuple[int, float]]] = {}
+    for symbol in target_symbols:
+        amount_changes[symbol] = []
+        entry_price_changes[symbol] = []
+    last_fills: dict[str, tuple[int, datetime]] = {}
+    fill_times: list[datetime] = []
+    new_records: list[dict] = []
+
+    decision_cursor = 0
+    while True:
+        if decision_cursor < len(decision_bars):
+            decision_bar = int(decision_bars[decision_cursor])
+        else:
+            decision_bar = index_length
+        fill_bar = min(
+            (pending_order[0] for pending_order in pending_orders.values()),
+            default=index_length,
+        )
+        bar = min(decision_bar, fill_bar)
+        if bar >= index_length:
+            break
+
+        before_moment = calculation_index_ar[bar]
+        current_moment = before_moment + timedelta(seconds=10)
+
+        # fill orders
+        for symbol in target_symbols:
+            if symbol not in pending_orders or pending_orders[symbol][0] != bar:
+                continue
+            _, placement_name, command = pending_orders.pop(symbol)
+            symbol_location = all_locations[symbol]
+
+            open_price = open_ars[symbol][bar]
+            close_price = close_ars[symbol][bar]
+            price_speed = (close_price - open_price) / 10
+            fill_price = open_price + price_speed * (decision_lag / 1000)
+
+            if placement_name == "now_close":
+                amount_shift = -symbol_location["amount"]
+            elif placement_name == "now_buy":
+                amount_shift = command["margin"] / fill_price
+            else:
+                amount_shift = -command["margin"] / fill_price
+            if amount_shift == 0:
+                continue
+
+            shift_location(
+                chunk_virtual_state, symbol_location, amount_shift, fill_price
+            )
+
+            if chunk_virtual_state["available_balance"] < 0:
+                text = ""
+                text += "Available balance went below zero"
+                text += f" while calculating {symbol} market"
+                text += f" at {current_moment}"
+                raise SimulationError(text)
+
+            balance_changes.append((bar, chunk_virtual_state["available_balance"]))
+            amount_changes[symbol].append((bar, symbol_location["amount"]))
+            entry_price_changes[symbol].append((bar, symbol_location["entry_price"]))
+
+            fill_time = before_moment + timedelta(milliseconds=decision_lag)
+            fill_time = fill_time_allocator.allocate(fill_time)
+            wallet_balance = measure_wallet_balance(bar)
+            fill_times.append(fill_time)
+            new_records.append(
+                {
+                    "Cause": "auto_trade",
+                    "Symbol": symbol,
+                    "Side": "buy" if amount_shift > 0 else "sell",
+                    "Fill Price": fill_price,
+                    "Role": "taker",
+                    "Margin Ratio": abs(amount_shift) * open_price / wallet_balance,
+                    "Order ID": random.randint(10**18, 10**19 - 1),
+                    "Result Asset": wallet_balance,
+                }
+            )
+            last_fills[symbol] = (bar, fill_time)
+
+        # decide orders
+        if bar == decision_bar:
+            decision_cursor += 1
+            wallet_balance = measure_wallet_balance(bar)
+            for symbol in target_symbols:
+                if not is_decided_ars[symbol][bar]:
+                    continue
+                pending_orders.pop(symbol, None)
+                symbol_location = all_locations[symbol]
+
+                # Margins are signed here, to be compared with targets.
+                current_amount = symbol_location["amount"]
+                current_margin = current_amount * symbol_location["entry_price"]
+                target_margin = target_position_ars[symbol][bar] * wallet_balance
+                order_id = random.randint(10**18, 10**19 - 1)
+                if target_margin == 0:
+                    if current_amount == 0:
+                        continue
+                    placement_name = "now_close"
+                    command = {"order_id": order_id}
+                elif target_margin > current_margin:
+                    placement_name = "now_buy"
+                    margin = target_margin - current_margin
+                    command = {"margin": margin, "order_id": order_id}
+                elif target_margin < current_margin:
+                    placement_name = "now_sell"
+                    margin = current_margin - target_margin
+                    command = {"margin": margin, "order_id": order_id}
+                else:
+                    continue
+
+                fill_bar = int(next_tradable_ars[symbol][bar + 1])
+                pending_orders[symbol] = (fill_bar, placement_name, command)
+
+    # Orders not filled yet are left for the next calculation.
+    for symbol, (_, placement_name, command) in pending_orders.items():
+        all_placements[symbol][placement_name] = command
+    chunk_virtual_state["target_positions"] = last_targets
+
+    # ■■■■■ calculate unrealized changes over the whole index ■■■■■
+
+    def spread_changes(
+        initial_value: float, changes: list[tuple[int, float]]
+    ) -> np.ndarray:
+        # Each value lasts from its candle until the next change.
+        change_bars = np.array([change[0] for change in changes], dtype=np.int64)
+        values = np.array(
+            [initial_value] + [change[1] for change in changes],
+            dtype=np.float64,
+        )
+        return values[np.searchsorted(change_bars, bar_numbers, side="right")]
+
+    wallet_balance_ar = spread_changes(initial_balance, balance_changes)
+    unrealized_profit_ar = np.zeros(index_length, dtype=np.float64)
+    for symbol in target_symbols:
+        initial_amount, initial_entry_price = initial_locations[symbol]
+        amount_ar = spread_changes(initial_amount, amount_changes[symbol])
+        entry_price_ar = spread_changes(
+            initial_entry_price, entry_price_changes[symbol]
+        )
+
+        open_ar = open_ars[symbol]
+        close_ar = close_ars[symbol]
+        is_held_ar = (amount_ar != 0) & ~np.isnan(close_ar)
+        current_margin_ar = np.abs(amount_ar) * entry_price_ar
+        wallet_balance_ar += np.where(is_held_ar, current_margin_ar, 0)
+
+        # assume that mark price doesn't wobble more than 5%
+        short_extreme_ar = np.minimum(
+            np.maximum(open_ar, close_ar) * 1.05, high_ars[symbol]
+        )
+        long_extreme_ar = np.maximum(
+            np.minimum(open_ar, close_ar) * 0.95, low_ars[symbol]
+        )
+        extreme_price_ar = np.where(amount_ar < 0, short_extreme_ar, long_extreme_ar)
+        unrealized_profit_ar += np.where(
+            is_held_ar, (extreme_price_ar - entry_price_ar) * amount_ar, 0
+        )
+
+    unrealized_change_ar = unrealized_profit_ar / wallet_balance_ar
+
+    # ■■■■■ update the account state ■■■■■
+
+    for symbol in target_symbols:
+        if len(tradable_bars[symbol]) == 0:
+            continue
+        symbol_location = all_locations[symbol]
+        current_entry_price = float(symbol_location["entry_price"])
+        current_amount = symbol_location["amount"]
+        symbol_position = {}
+        symbol_position["entry_price"] = current_entry_price
+        symbol_position["margin"] = float(abs(current_amount) * current_entry_price)
+        if current_amount > 0:
+            symbol_position["direction"] = "long"
+        if current_amount < 0:
+            symbol_position["direction"] = "short"
+        if current_amount == 0:
+            symbol_position["direction"] = "none"
+        if symbol in last_fills:
+            last_fill_bar, last_fill_time = last_fills[symbol]
+            if last_fill_bar == tradable_bars[symbol][-1]:
+                update_time = pd.Timestamp(last_fill_time).to_pydatetime()
+                symbol_position["update_time"] = update_time
+        chunk_account_state["positions"][symbol] = symbol_position
+        chunk_account_state["open_orders"][symbol] = {}
+
+    last_moment = calculation_index_ar[-1] + timedelta(seconds=10)
+    chunk_account_state["observed_until"] = last_moment
+    chunk_account_state["wallet_balance"] = float(wallet_balance_ar[-1])
+
+    progress_list[target_progress] = index_length * 10
+
+    # ■■■■■ make pandas objects ■■■■■
+
+    if len(new_records) > 0:
+        new_asset_record = pd.DataFrame(
+            new_records,
+            index=pd.to_datetime(fill_times, utc=True),
+            columns=chunk_asset_record.columns,
+        )
+        # Column types follow the given record, as in the per-bar simulation.
+        new_asset_record = new_asset_record.astype(chunk_asset_record.dtypes)
+        chunk_asset_record = pd.concat([chunk_asset_record, new_asset_record])
+
+    new_unrealized_changes = pd.Series(
+        unrealized_change_ar,
+        index=calculation_index,
+        dtype=chunk_unrealized_changes.dtype,
+    )
+    chunk_unrealized_changes = pd.concat(
+        [chunk_unrealized_changes, new_unrealized_changes]
+    )
+
+    # ■■■■■ return calculated data ■■■■■
+
+    calculation_output = CalculationOutput(
+        chunk_asset_record=chunk_asset_record,
+        chunk_unrealized_changes=chunk_unrealized_changes,
+        chunk_scribbles=chunk_scribbles,
+        chunk_account_state=chunk_account_state,
+        chunk_virtual_state=chunk_virtual_state,
+    )
+    return calculation_output
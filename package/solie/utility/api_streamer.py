@@ -1,36 +1,194 @@
 import asyncio
 import json
 import logging
-from typing import Callable, Coroutine
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Container, Coroutine, Hashable
 
 from aiohttp import ClientError, ClientSession, WSMsgType
 
+from .structs import AggregateTrade, BookTicker, MarkPrice
+from .timing import add_task_duration
+
 logger = logging.getLogger(__name__)
 
+# Use the fastest JSON library available.
+try:
+    import orjson
+
+    JSON_BACKEND = "orjson"
+    decode_json = orjson.loads
+except ImportError:
+    try:
+        import ujson
+
+        JSON_BACKEND = "ujson"
+        decode_json = ujson.loads
+    except ImportError:
+        JSON_BACKEND = "json"
+        decode_json = json.loads
+
+
+def decode_book_ticker(data: dict) -> BookTicker:
+    return BookTicker(
+        timestamp=data["E"],
+        symbol=data["s"],
+        best_bid_price=float(data["b"]),
+        best_ask_price=float(data["a"]),
+    )
+
+
+def decode_aggregate_trade(data: dict) -> AggregateTrade:
+    return AggregateTrade(
+        timestamp=data["T"],
+        symbol=data["s"],
+        price=float(data["p"]),
+        volume=float(data["q"]),
+    )
+
+
+def decode_mark_prices(
+    data: list, symbols: Container[str] | None = None
+) -> list[MarkPrice]:
+    # The stream covers the whole exchange,
+    # so only the given symbols are converted if there are any.
+    if len(data) == 0:
+        return []
+    event_time = data[0]["E"]
+    return [
+        MarkPrice(
+            timestamp=event_time,
+            symbol=about_mark_price["s"],
+            mark_price=float(about_mark_price["p"]),
+        )
+        for about_mark_price in data
+        if symbols is None or about_mark_price["s"] in symbols
+    ]
+
 
 class ApiStreamError(Exception):
-    def __init__(self, received: dict | list):
-        formatted = json.dumps(received, indent=2)
-        super().__init__(formatted)
+    def __init__(self, received: str):
+        # Raw text is kept because decoded content might not be JSON-compatible.
+        super().__init__(received)
+
+
+OVERFLOW_POLICIES = (
+    "block",  # Stop reading the websocket until there's space in the queue
+    "drop_oldest",  # Discard the oldest message in the queue
+    "coalesce",  # Keep only the latest message of each coalescing key
+)
+
+
+class MessageQueue:
+    """
+    Bounded queue of websocket messages that are taken out in batches.
+
+    With the `coalesce` policy, a message whose `coalesce_key` is not `None`
+    replaces the queued message with the same key,
+    which suits streams like book tickers where only the latest one matters.
+    Messages without a key are never coalesced and block on overflow.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        overflow_policy: str = "block",
+        coalesce_key: Callable[[Any], Hashable | None] | None = None,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError("This overflow policy is not supported")
+        self._max_size = max_size
+        self._overflow_policy = overflow_policy
+        self._coalesce_key = coalesce_key
+        self._items: OrderedDict[Hashable, Any] = OrderedDict()
+        self._sequence = 0
+        self._has_items = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self.dropped_count = 0
+        self.coalesced_count = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def put(self, item: Any):
+        key = None
+        if self._overflow_policy == "coalesce" and self._coalesce_key is not None:
+            key = self._coalesce_key(item)
+        if key is not None and ("key", key) in self._items:
+            self._items[("key", key)] = item
+            self.coalesced_count += 1
+            return
+
+        while len(self._items) >= self._max_size:
+            if self._overflow_policy == "drop_oldest":
+                self._items.popitem(last=False)
+                self.dropped_count += 1
+            else:
+                self._has_space.clear()
+                await self._has_space.wait()
+
+        if key is None:
+            self._sequence += 1
+            self._items[("sequence", self._sequence)] = item
+        else:
+            self._items[("key", key)] = item
+        self._has_items.set()
+
+    async def get_batch(self) -> list:
+        await self._has_items.wait()
+        batch = list(self._items.values())
+        self._items.clear()
+        self._has_items.clear()
+        self._has_space.set()
+        return batch
 
 
 class ApiStreamer:
+    """
+    Keeps a websocket connection alive and passes received messages to the handler.
+
+    By default, the handler gets called with each message in its own task.
+    When `batched` is true, messages are put in a bounded `MessageQueue`
+    and the handler gets called with a list of messages instead,
+    one batch at a time.
+
+    Raw text of each message is turned into the handler's input by `decoder`,
+    and the time it takes is recorded as a task duration.
+    """
+
     def __init__(
         self,
         url: str,
         handler: Callable[[dict], Coroutine] | Callable[[list], Coroutine],
+        batched: bool = False,
+        queue_size: int = 2**12,
+        overflow_policy: str = "block",
+        coalesce_key: Callable[[Any], Hashable | None] | None = None,
+        decoder: Callable[[str], Any] = decode_json,
     ):
         self._url = url
         self._handler = handler
+        self._decoder = decoder
         self._session = ClientSession()
         self._is_open = True
 
+        self._queue: MessageQueue | None = None
+        self._dispatching_task: asyncio.Task | None = None
+        if batched:
+            self._queue = MessageQueue(queue_size, overflow_policy, coalesce_key)
+            self._dispatching_task = asyncio.create_task(self._keep_dispatching())
+
         asyncio.create_task(self._keep_connecting())
 
     @property
     def url(self) -> str:
         return self._url
 
+    @property
+    def queue(self) -> MessageQueue | None:
+        return self._queue
+
     async def _keep_connecting(self):
         while self._is_open:
             try:
@@ -48,18 +206,135 @@ class ApiStreamer:
                     url = self._url
                     parsed = json.dumps(message.json(), indent=2)
                     logger.warning(f"Websocket got an error message\n{url}\n{parsed}")
+                elif self._queue is not None:
+                    content = self._decode(message.data)
+                    # Waiting here when the queue is full
+                    # stops reading from the socket, which applies backpressure.
+                    await self._queue.put(content)
                 else:
-                    content = message.json()
+                    content = self._decode(message.data)
 
-                    def done_callback(task: asyncio.Task, content=content):
+                    def done_callback(task: asyncio.Task, raw=message.data):
                         error = task.exception()
                         if error:
-                            raise ApiStreamError(content) from error
+                            raise ApiStreamError(raw) from error
 
                     task = asyncio.create_task(self._handler(content))
                     task.add_done_callback(done_callback)
             logger.info(f"Websocket disconnected\n{self._url}")
 
+    def _decode(self, raw: str) -> Any:
+        start_time = time.perf_counter()
+        content = self._decoder(raw)
+        duration = time.perf_counter() - start_time
+        add_task_duration("decode_stream_messages", duration)
+        return content
+
+    async def _keep_dispatching(self):
+        queue = self._queue
+        if queue is None:
+            return
+        while self._is_open:
+            batch = await queue.get_batch()
+            try:
+                await self._handler(batch)
+            except Exception:
+                logger.exception(
+                    f"Websocket handler failed with {len(batch)} messages\n{self._url}"
+                )
+
     async def close(self):
         self._is_open = False
+        if self._dispatching_task is not None:
+            self._dispatching_task.cancel()
         await self._session.close()
+
+
+class ApiMultiStreamer:
+    """
+    Listens to many streams over as few websocket connections as possible
+    by using combined stream URLs of Binance,
+    routing each message to the handler of its stream name.
+    Streams are split into multiple connections
+    only when they exceed the stream limit of a single connection.
+
+    When `batched` is true, each handler gets called with a list
+    of the messages of its stream that were taken out in the same batch.
+    The coalescing key, if given, receives the whole combined message
+    including the stream name.
+
+    Payloads of streams that have an entry in `decoders`
+    are converted to typed records right after JSON parsing,
+    so that handlers don't have to deal with raw dictionaries.
+
+    - https://binance-docs.github.io/apidocs/futures/en/#websocket-market-streams
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        handlers: dict[str, Callable[[Any], Coroutine]],
+        max_streams: int = 200,
+        batched: bool = False,
+        queue_size: int = 2**12,
+        overflow_policy: str = "block",
+        coalesce_key: Callable[[Any], Hashable | None] | None = None,
+        decoders: dict[str, Callable[[Any], Any]] | None = None,
+    ):
+        self._handlers = handlers
+        self._decoders = decoders or {}
+        self._streamers: list[ApiStreamer] = []
+
+        stream_names = list(handlers.keys())
+        for start in range(0, len(stream_names), max_streams):
+            joined_names = "/".join(stream_names[start : start + max_streams])
+            url = f"{base_url}/stream?streams={joined_names}"
+            if batched:
+                streamer = ApiStreamer(
+                    url,
+                    self._route_batch,
+                    batched=True,
+                    queue_size=queue_size,
+                    overflow_policy=overflow_policy,
+                    coalesce_key=coalesce_key,
+                    decoder=self._decode,
+                )
+            else:
+                streamer = ApiStreamer(url, self._route, decoder=self._decode)
+            self._streamers.append(streamer)
+
+    @property
+    def urls(self) -> list[str]:
+        return [s.url for s in self._streamers]
+
+    def _decode(self, raw: str) -> dict:
+        combined_message = decode_json(raw)
+        decoder = self._decoders.get(combined_message["stream"])
+        if decoder is not None:
+            combined_message["data"] = decoder(combined_message["data"])
+        return combined_message
+
+    async def _route(self, received: dict):
+        handler = self._handlers[received["stream"]]
+        await handler(received["data"])
+
+    async def _route_batch(self, received: list[dict]):
+        grouped: dict[str, list] = {}
+        for combined_message in received:
+            stream_name = combined_message["stream"]
+            if stream_name not in grouped:
+                grouped[stream_name] = []
+            grouped[stream_name].append(combined_message["data"])
+        # A failing handler shouldn't drop the messages of other streams.
+        for stream_name, stream_messages in grouped.items():
+            try:
+                await self._handlers[stream_name](stream_messages)
+            except Exception:
+                logger.exception(
+                    f"Websocket handler failed with {len(stream_messages)} messages"
+                    f"\n{stream_name}"
+                )
+
+    async def close(self):
+        for streamer in self._streamers:
+            await streamer.close()
@@ -1,12 +1,46 @@
 import json
+import logging
+from datetime import timedelta
 from pathlib import Path
 
 import aiofiles
 import aiofiles.os
+import numpy as np
 import pandas as pd
 
 from solie.common import go
 
+from .candle_store import CandleStore
+
+logger = logging.getLogger(__name__)
+
+
+def move_candle_data_to_store(filepath: Path, candle_store: CandleStore):
+    """
+    Writes candle data of a legacy pickle file into the store,
+    then reads it back to make sure that every value has arrived.
+    """
+
+    candle_data: pd.DataFrame = pd.read_pickle(filepath)
+    candle_store.write(candle_data)
+
+    if len(candle_data) == 0:
+        return
+
+    index: pd.DatetimeIndex = candle_data.index  # type:ignore
+    symbols = list(candle_data.columns.get_level_values(0).unique())
+    stored_data = candle_store.read(
+        symbols,
+        index.min(),
+        index.max() + timedelta(seconds=10),
+    )
+    stored_data = stored_data.reindex(index=index, columns=candle_data.columns)
+    expected_values = candle_data.to_numpy(dtype=np.float32)
+    stored_values = stored_data.to_numpy(dtype=np.float32)
+    is_written = ~np.isnan(expected_values)
+    if np.isnan(stored_values[is_written]).any():
+        raise ValueError(f"Candle data is missing from the store\n{filepath}")
+
 
 async def examine_data_files(datapath: Path):
     # 5.0: Data settings
@@ -89,3 +123,21 @@ async def examine_data_files(datapath: Path):
             await file.write(content)
     except Exception:
         pass
+
+    # 8.8: Candle data is stored in monthly partitions of each symbol
+    # instead of yearly pickle files
+    # Each file is removed only after its values are found in the store,
+    # while files that failed are kept to be moved on the next launch.
+    collector_path = datapath / "collector"
+    candle_store = CandleStore(collector_path / "candle_store")
+    # Older files go first so that the values in the latest files take priority.
+    filepaths = sorted(collector_path.glob("candle_data_*.pickle.backup"))
+    filepaths += sorted(collector_path.glob("candle_data_*.pickle"))
+    filepaths += sorted(collector_path.glob("candle_data_*.pickle.new"))
+    for filepath in filepaths:
+        try:
+            await go(move_candle_data_to_store, filepath, candle_store)
+        except Exception:
+            logger.exception(f"Failed to move candle data to the store\n{filepath}")
+            continue
+        await aiofiles.os.remove(filepath)
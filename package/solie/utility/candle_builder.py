@@ -0,0 +1,77 @@
+from .structs import Candle
+
+MOMENT_MILLISECONDS = 10 * 1000
+
+
+class CandleBuilder:
+    """
+    Builds 10-second candles incrementally from aggregate trades as they arrive.
+    Each symbol keeps a running candle of its latest moment,
+    which is sealed when a trade of a later moment comes in
+    or when `seal` is called at the moment boundary.
+    Trades that arrive after their moment has been sealed are ignored.
+    """
+
+    def __init__(self, target_symbols: list[str]):
+        self._first_timestamp: int | None = None
+        self._open_candles: dict[str, Candle | None] = {}
+        self._sealed_candles: dict[str, Candle | None] = {}
+        for symbol in target_symbols:
+            self._open_candles[symbol] = None
+            self._sealed_candles[symbol] = None
+
+    @property
+    def first_timestamp(self) -> int | None:
+        """
+        Time of the first trade ever received, in milliseconds.
+        """
+        return self._first_timestamp
+
+    def add_trade(self, symbol: str, timestamp: int, price: float, volume: float):
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+
+        moment_timestamp = timestamp - timestamp % MOMENT_MILLISECONDS
+        candle = self._open_candles[symbol]
+
+        if candle is None or candle.timestamp < moment_timestamp:
+            if candle is not None:
+                self._sealed_candles[symbol] = candle
+            sealed = self._sealed_candles[symbol]
+            if sealed is not None and sealed.timestamp >= moment_timestamp:
+                # The moment of this trade is already sealed.
+                return
+            self._open_candles[symbol] = Candle(
+                timestamp=moment_timestamp,
+                open_price=price,
+                high_price=price,
+                low_price=price,
+                close_price=price,
+                volume=volume,
+                trade_count=1,
+            )
+        elif candle.timestamp == moment_timestamp:
+            if price > candle.high_price:
+                candle.high_price = price
+            elif price < candle.low_price:
+                candle.low_price = price
+            candle.close_price = price
+            candle.volume += volume
+            candle.trade_count += 1
+
+    def seal(self, moment_timestamp: int) -> dict[str, Candle | None]:
+        """
+        Seals and returns the candles of the given moment.
+        The value is `None` for symbols that had no trades during the moment.
+        """
+        sealed_candles: dict[str, Candle | None] = {}
+        for symbol, candle in self._open_candles.items():
+            if candle is not None and candle.timestamp <= moment_timestamp:
+                self._sealed_candles[symbol] = candle
+                self._open_candles[symbol] = None
+            sealed = self._sealed_candles[symbol]
+            if sealed is not None and sealed.timestamp == moment_timestamp:
+                sealed_candles[symbol] = sealed
+            else:
+                sealed_candles[symbol] = None
+        return sealed_candles
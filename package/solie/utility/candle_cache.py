@@ -0,0 +1,72 @@
+from collections import OrderedDict
+
+import pandas as pd
+
+from .candle_pyramid import CandlePyramid
+
+
+def _measure_memory(candle_data: pd.DataFrame | CandlePyramid) -> int:
+    if isinstance(candle_data, CandlePyramid):
+        return candle_data.memory_usage
+    return int(candle_data.memory_usage().sum())
+
+
+class CandleCache:
+    """
+    Least-recently-used cache of candle data read from the disk,
+    or candle pyramids built from it,
+    bounded by their total memory size.
+
+    Keys are tuples that start with the year,
+    followed by whatever tells the file content apart,
+    such as modification times and sizes,
+    so that outdated entries are simply never hit again.
+    Cached entries are shared, so they should not be modified in place.
+    """
+
+    def __init__(self, memory_budget: int):
+        self.memory_budget = memory_budget  # In bytes
+        self.hit_count = 0
+        self.miss_count = 0
+        self._entries = OrderedDict[tuple, pd.DataFrame | CandlePyramid]()
+        self._memory_usage = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def memory_usage(self) -> int:
+        return self._memory_usage
+
+    def get(self, key: tuple) -> pd.DataFrame | CandlePyramid | None:
+        candle_data = self._entries.get(key)
+        if candle_data is None:
+            self.miss_count += 1
+            return None
+        self.hit_count += 1
+        self._entries.move_to_end(key)
+        return candle_data
+
+    def put(self, key: tuple, candle_data: pd.DataFrame | CandlePyramid):
+        size = _measure_memory(candle_data)
+        if size > self.memory_budget:
+            return
+        self._remove(key)
+        self._entries[key] = candle_data
+        self._memory_usage += size
+        while self._memory_usage > self.memory_budget:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+
+    def invalidate(self, year: int | None = None):
+        """
+        Removes entries of the given year, or all entries if no year is given.
+        """
+
+        for key in [k for k in self._entries if year is None or k[0] == year]:
+            self._remove(key)
+
+    def _remove(self, key: tuple):
+        candle_data = self._entries.pop(key, None)
+        if candle_data is not None:
+            self._memory_usage -= _measure_memory(candle_data)
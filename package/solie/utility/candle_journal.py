@@ -0,0 +1,103 @@
+import time
+from datetime import datetime
+from pathlib import Path
+
+import aiofiles
+import numpy as np
+import pandas as pd
+
+from .candle_store import CANDLE_FIELDS, CandleStore
+from .standardize import create_empty_candle_data
+
+
+class CandleJournal:
+    """
+    Append-only file of sealed 10-second candles.
+    Each record is a timestamp in seconds followed by
+    the values of all target symbols, in the column order of candle data.
+
+    The active file is only appended to.
+    Sealing renames it so that it can be folded into the candle store
+    while new candles go to a fresh file.
+    A record cut off by a crash at the end of a file is ignored when reading.
+
+    This object only holds paths and symbols,
+    so it can be passed to other processes.
+    """
+
+    def __init__(self, directory: Path, target_symbols: list[str]):
+        self._directory = directory
+        self._target_symbols = target_symbols
+        self._record_type = np.dtype(
+            [
+                ("timestamp", "<i8"),
+                ("values", "<f4", (len(target_symbols) * len(CANDLE_FIELDS),)),
+            ]
+        )
+
+    @property
+    def active_path(self) -> Path:
+        return self._directory / "candle_journal.bin"
+
+    def sealed_paths(self) -> list[Path]:
+        # Names include the time of sealing, so sorting puts them in order.
+        return sorted(self._directory.glob("candle_journal_*.bin"))
+
+    async def append(self, moment: datetime, values: list[float]):
+        record = np.array(
+            [(int(moment.timestamp()), values)],
+            dtype=self._record_type,
+        )
+        async with aiofiles.open(self.active_path, "ab") as file:
+            await file.write(record.tobytes())
+
+    def seal(self) -> list[Path]:
+        """
+        Returns all sealed files, including the ones left by a previous session.
+        """
+
+        if self.active_path.is_file():
+            sealed_path = self._directory / f"candle_journal_{time.time_ns()}.bin"
+            self.active_path.rename(sealed_path)
+        return self.sealed_paths()
+
+    def _read_file(self, filepath: Path) -> pd.DataFrame:
+        content = filepath.read_bytes()
+        record_count = len(content) // self._record_type.itemsize
+        records = np.frombuffer(
+            content,
+            dtype=self._record_type,
+            count=record_count,
+        ).copy()
+        index = pd.to_datetime(records["timestamp"], unit="s", utc=True)
+        candle_data = create_empty_candle_data(self._target_symbols)
+        return pd.DataFrame(
+            records["values"],
+            index=index,
+            columns=candle_data.columns,
+        )
+
+    def read(self) -> pd.DataFrame:
+        """
+        Returns candle data from all journal files.
+        Later records take priority over earlier ones of the same moment.
+        """
+
+        filepaths = self.sealed_paths()
+        if self.active_path.is_file():
+            filepaths.append(self.active_path)
+        if len(filepaths) == 0:
+            return create_empty_candle_data(self._target_symbols)
+        candle_data = pd.concat([self._read_file(p) for p in filepaths])
+        candle_data = candle_data[~candle_data.index.duplicated(keep="last")]
+        candle_data = candle_data.sort_index()
+        return candle_data
+
+    def compact(self, filepath: Path, candle_store: CandleStore):
+        """
+        Folds a sealed journal file into the candle store and removes it.
+        """
+
+        candle_data = self._read_file(filepath)
+        candle_store.write(candle_data)
+        filepath.unlink()
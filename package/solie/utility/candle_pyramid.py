@@ -0,0 +1,217 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .candle_store import CANDLE_FIELDS
+
+# Level name and its candle length in seconds, from the finest to the coarsest
+PYRAMID_LEVELS = {
+    "1m": 60,
+    "5m": 300,
+    "1h": 3600,
+    "1d": 86400,
+}
+
+
+class _PyramidLevel:
+    # Growable arrays of candles, sorted by time.
+    # Timestamps are in seconds, at the start of each candle.
+
+    def __init__(self, column_count: int):
+        self.timestamps = np.zeros(0, dtype=np.int64)
+        self.values = np.zeros((0, column_count), dtype=np.float32)
+        self.size = 0
+
+    def reserve(self, size: int):
+        if len(self.timestamps) >= size:
+            return
+        capacity = max(size, len(self.timestamps) * 2, 1024)
+        timestamps = np.zeros(capacity, dtype=np.int64)
+        values = np.full((capacity, self.values.shape[1]), np.nan, dtype=np.float32)
+        timestamps[: self.size] = self.timestamps[: self.size]
+        values[: self.size] = self.values[: self.size]
+        self.timestamps = timestamps
+        self.values = values
+
+    def truncate(self, timestamp: int):
+        # Removes candles starting at or after the timestamp.
+        timestamps = self.timestamps[: self.size]
+        self.size = int(np.searchsorted(timestamps, timestamp, side="left"))
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray):
+        self.reserve(self.size + len(timestamps))
+        self.timestamps[self.size : self.size + len(timestamps)] = timestamps
+        self.values[self.size : self.size + len(timestamps)] = values
+        self.size += len(timestamps)
+
+
+def aggregate_candle_data(candle_data: pd.DataFrame, seconds: int) -> pd.DataFrame:
+    """
+    Aggregates candle data into longer candles,
+    ignoring missing values as resampling does.
+    """
+
+    index: pd.DatetimeIndex = candle_data.index  # type:ignore
+    buckets = index.asi8 // 10**9 // seconds * seconds
+    grouped = candle_data.groupby(buckets, sort=True)
+
+    fields = candle_data.columns.get_level_values(1)
+    aggregated = pd.DataFrame(
+        index=pd.Index(np.unique(buckets)),
+        columns=candle_data.columns,
+        dtype=np.float32,
+    )
+    for field, method in (
+        ("Open", "first"),
+        ("High", "max"),
+        ("Low", "min"),
+        ("Close", "last"),
+        ("Volume", "sum"),
+    ):
+        columns = candle_data.columns[fields == field]
+        aggregated[columns] = grouped[list(columns)].agg(method)
+
+    return aggregated
+
+
+def choose_pyramid_level(start: datetime, end: datetime, pixel_width: int) -> str:
+    """
+    Returns the coarsest level that still has a candle for every pixel,
+    or `"10s"` when even the finest level is too coarse.
+    """
+
+    span = (end - start).total_seconds()
+    chosen = "10s"
+    for name, seconds in PYRAMID_LEVELS.items():
+        if span / seconds >= pixel_width:
+            chosen = name
+    return chosen
+
+
+class CandlePyramid:
+    """
+    Keeps candle data aggregated into coarser levels of `PYRAMID_LEVELS`.
+    Each new 10-second candle updates the last candle of every level,
+    so that zoomed-out charts can be drawn from far fewer rows.
+    """
+
+    def __init__(self, target_symbols: list[str]):
+        self._target_symbols = target_symbols
+        self._columns = pd.MultiIndex.from_product(
+            [target_symbols, list(CANDLE_FIELDS)]
+        )
+        fields = np.array(self._columns.get_level_values(1))
+        self._is_open = fields == "Open"
+        self._is_high = fields == "High"
+        self._is_low = fields == "Low"
+        self._is_close = fields == "Close"
+        self._is_volume = fields == "Volume"
+        self._levels = {
+            name: _PyramidLevel(len(self._columns)) for name in PYRAMID_LEVELS
+        }
+
+    @property
+    def memory_usage(self) -> int:
+        # In bytes
+        return sum(
+            level.timestamps.nbytes + level.values.nbytes
+            for level in self._levels.values()
+        )
+
+    def rebuild(self, candle_data: pd.DataFrame, since: datetime | None = None):
+        """
+        Aggregates the given candle data again, from the candles that contain
+        the `since` moment, or entirely if it's not given.
+        """
+
+        if since is not None:
+            # The coarsest level reaches back the furthest.
+            coarsest_seconds = max(PYRAMID_LEVELS.values())
+            since_timestamp = int(since.timestamp())
+            rebuild_from = since_timestamp // coarsest_seconds * coarsest_seconds
+            index: pd.DatetimeIndex = candle_data.index  # type:ignore
+            candle_data = candle_data[index.asi8 // 10**9 >= rebuild_from]
+        candle_data = candle_data.reindex(columns=self._columns)
+        index: pd.DatetimeIndex = candle_data.index  # type:ignore
+        timestamps = index.asi8 // 10**9
+        for name, seconds in PYRAMID_LEVELS.items():
+            level = self._levels[name]
+            if since is None:
+                level.size = 0
+                level_data = candle_data
+            else:
+                level_start = int(since.timestamp()) // seconds * seconds
+                level.truncate(level_start)
+                level_data = candle_data[timestamps >= level_start]
+            aggregated = aggregate_candle_data(level_data, seconds)
+            level.extend(
+                aggregated.index.to_numpy(dtype=np.int64),
+                aggregated.to_numpy(dtype=np.float32),
+            )
+
+    def add(self, moment: datetime, values: list[float]):
+        """
+        Merges a new 10-second candle, in the column order of candle data.
+        """
+
+        new_values = np.array(values, dtype=np.float32)
+        timestamp = int(moment.timestamp())
+        for name, seconds in PYRAMID_LEVELS.items():
+            level = self._levels[name]
+            bucket = timestamp // seconds * seconds
+            if level.size > 0 and level.timestamps[level.size - 1] == bucket:
+                old_values = level.values[level.size - 1]
+                merged = old_values.copy()
+                is_missing = np.isnan(old_values)
+                merged[self._is_open & is_missing] = new_values[
+                    self._is_open & is_missing
+                ]
+                merged[self._is_high] = np.fmax(
+                    old_values[self._is_high], new_values[self._is_high]
+                )
+                merged[self._is_low] = np.fmin(
+                    old_values[self._is_low], new_values[self._is_low]
+                )
+                has_close = self._is_close & ~np.isnan(new_values)
+                merged[has_close] = new_values[has_close]
+                merged[self._is_volume] = np.nansum(
+                    [old_values[self._is_volume], new_values[self._is_volume]],
+                    axis=0,
+                )
+                level.values[level.size - 1] = merged
+            elif level.size == 0 or level.timestamps[level.size - 1] < bucket:
+                new_row = new_values.copy()
+                new_row[self._is_volume] = np.nan_to_num(new_row[self._is_volume])
+                level.extend(np.array([bucket]), new_row[np.newaxis])
+            # Candles older than the last one are only changed by rebuilding.
+
+    def query(
+        self,
+        level_name: str,
+        start: datetime,
+        end: datetime,
+        symbols: list[str] | None = None,
+    ) -> pd.DataFrame:
+        """
+        Returns candles of a level that start in the half-open range of
+        `[start, end)`, in the same form as candle data.
+        """
+
+        level = self._levels[level_name]
+        timestamps = level.timestamps[: level.size]
+        from_row = int(np.searchsorted(timestamps, start.timestamp(), side="left"))
+        until_row = int(np.searchsorted(timestamps, end.timestamp(), side="left"))
+
+        if symbols is None:
+            column_mask = np.ones(len(self._columns), dtype=np.bool_)
+        else:
+            column_mask = np.isin(self._columns.get_level_values(0), symbols)
+
+        candle_data = pd.DataFrame(
+            level.values[from_row:until_row][:, column_mask],
+            index=pd.to_datetime(timestamps[from_row:until_row], unit="s", utc=True),
+            columns=self._columns[column_mask],
+        )
+
+        return candle_data
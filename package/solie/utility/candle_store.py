@@ -0,0 +1,350 @@
+import re
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CANDLE_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+MOMENT_SECONDS = 10
+
+PARTITION_NAME = re.compile(r"^(\d{4})-(\d{2})\.npy$")
+
+
+def _month_start(year: int, month: int) -> int:
+    # In seconds
+    return int(datetime(year, month, 1, tzinfo=timezone.utc).timestamp())
+
+
+def _next_month(year: int, month: int) -> tuple[int, int]:
+    if month == 12:
+        return year + 1, 1
+    else:
+        return year, month + 1
+
+
+def _month_moments(year: int, month: int) -> int:
+    next_year, next_month = _next_month(year, month)
+    seconds = _month_start(next_year, next_month) - _month_start(year, month)
+    return seconds // MOMENT_SECONDS
+
+
+class CandleStore:
+    """
+    On-disk storage of 10-second candles, partitioned by symbol and month.
+    Each partition is a `.npy` file of `float32` values,
+    holding a row for every moment in that month and a column for each field.
+    Rows that were never written are filled with NaN.
+
+    Because a row's position is fixed by its timestamp,
+    new candles are written in place without rewriting other rows,
+    and reads only touch the partitions in the requested range.
+    Partitions are memory-mapped rather than loaded as a whole,
+    so reading them doesn't involve any deserialization.
+
+    This object only holds the directory path,
+    so it can be passed to other processes
+    which then map the same pages on their own.
+    """
+
+    def __init__(self, directory: Path):
+        self._directory = directory
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def _partition_path(self, symbol: str, year: int, month: int) -> Path:
+        return self._directory / symbol / f"{year:04d}-{month:02d}.npy"
+
+    def _open_partition(
+        self, symbol: str, year: int, month: int, writable: bool
+    ) -> np.memmap | None:
+        filepath = self._partition_path(symbol, year, month)
+        if not filepath.is_file():
+            if not writable:
+                return None
+            # Build the partition beside the final path
+            # so that a half-made file is never visible.
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+            filepath_new = filepath.with_suffix(".npy.new")
+            partition = np.lib.format.open_memmap(
+                filepath_new,
+                mode="w+",
+                dtype=np.float32,
+                shape=(_month_moments(year, month), len(CANDLE_FIELDS)),
+            )
+            partition[:] = np.nan
+            partition.flush()
+            del partition
+            filepath_new.replace(filepath)
+        mmap_mode = "r+" if writable else "r"
+        return np.load(filepath, mmap_mode=mmap_mode)
+
+    def view(self, symbol: str, year: int, month: int) -> np.memmap | None:
+        """
+        Returns a read-only memory map of a partition,
+        with rows of moments and columns of `CANDLE_FIELDS`.
+        """
+
+        return self._open_partition(symbol, year, month, False)
+
+    def write(self, candle_data: pd.DataFrame):
+        """
+        Writes rows of candle data into the partitions.
+        Values that are NaN in the given data
+        don't overwrite the values that were already written.
+        """
+
+        if len(candle_data) == 0:
+            return
+
+        index: pd.DatetimeIndex = candle_data.index  # type:ignore
+        timestamps = index.asi8 // 10**9  # In seconds
+        timestamps -= timestamps % MOMENT_SECONDS
+        month_keys = index.year * 12 + index.month - 1  # type:ignore
+        month_keys = np.asarray(month_keys)
+
+        months: list[tuple[int, int, np.ndarray, np.ndarray]] = []
+        for month_key in np.unique(month_keys):
+            year, month = divmod(int(month_key), 12)
+            month += 1
+            is_included = month_keys == month_key
+            positions = timestamps[is_included] - _month_start(year, month)
+            positions //= MOMENT_SECONDS
+            months.append((year, month, is_included, positions))
+
+        symbols = candle_data.columns.get_level_values(0).unique()
+        for symbol in symbols:
+            symbol_values = (
+                candle_data[symbol]
+                .reindex(columns=list(CANDLE_FIELDS))
+                .to_numpy(dtype=np.float32)
+            )
+            for year, month, is_included, positions in months:
+                new_values = symbol_values[is_included]
+                if np.isnan(new_values).all():
+                    continue
+                partition = self._open_partition(symbol, year, month, True)
+                if partition is None:
+                    continue
+                old_values = partition[positions]
+                is_missing = np.isnan(new_values)
+                partition[positions] = np.where(is_missing, old_values, new_values)
+                partition.flush()
+                del partition
+
+    def read(
+        self,
+        symbols: list[str],
+        start: datetime,
+        end: datetime,
+        fields: tuple[str, ...] = CANDLE_FIELDS,
+    ) -> pd.DataFrame:
+        """
+        Returns candle data of the moments in the half-open range of `[start, end)`,
+        in the same form as the candle data held in memory.
+        Leading and trailing moments without any data are left out.
+
+        Values are copied once from the memory maps into the returned data,
+        because it joins partitions of several months and symbols.
+        """
+
+        field_positions = [CANDLE_FIELDS.index(f) for f in fields]
+        field_count = len(fields)
+        columns = pd.MultiIndex.from_product([symbols, list(fields)])
+
+        start_timestamp = -(-int(start.timestamp()) // MOMENT_SECONDS)
+        start_timestamp *= MOMENT_SECONDS
+        end_timestamp = -(-int(end.timestamp()) // MOMENT_SECONDS)
+        end_timestamp *= MOMENT_SECONDS
+        row_count = max(0, (end_timestamp - start_timestamp) // MOMENT_SECONDS)
+
+        values = np.full(
+            (row_count, len(symbols) * field_count),
+            np.nan,
+            dtype=np.float32,
+        )
+        has_data = np.zeros(row_count, dtype=np.bool_)
+
+        start_moment = datetime.fromtimestamp(start_timestamp, tz=timezone.utc)
+        year, month = start_moment.year, start_moment.month
+        while row_count > 0:
+            month_from = _month_start(year, month)
+            next_year, next_month = _next_month(year, month)
+            month_until = _month_start(next_year, next_month)
+            if month_from >= end_timestamp:
+                break
+            from_timestamp = max(start_timestamp, month_from)
+            until_timestamp = min(end_timestamp, month_until)
+            from_row = (from_timestamp - start_timestamp) // MOMENT_SECONDS
+            until_row = (until_timestamp - start_timestamp) // MOMENT_SECONDS
+            from_position = (from_timestamp - month_from) // MOMENT_SECONDS
+            until_position = (until_timestamp - month_from) // MOMENT_SECONDS
+            for turn, symbol in enumerate(symbols):
+                partition = self.view(symbol, year, month)
+                if partition is None:
+                    continue
+                block = partition[from_position:until_position, field_positions]
+                from_column = turn * field_count
+                until_column = from_column + field_count
+                values[from_row:until_row, from_column:until_column] = block
+                has_data[from_row:until_row] |= ~np.isnan(block).all(axis=1)
+                del partition
+            year, month = next_year, next_month
+
+        filled_rows = np.flatnonzero(has_data)
+        if len(filled_rows) == 0:
+            first_row, last_row = 0, -1
+        else:
+            first_row, last_row = int(filled_rows[0]), int(filled_rows[-1])
+
+        index = pd.date_range(
+            start=start_moment + pd.Timedelta(seconds=first_row * MOMENT_SECONDS),
+            periods=last_row - first_row + 1,
+            freq="10S",
+            tz="UTC",
+        )
+        candle_data = pd.DataFrame(
+            values[first_row : last_row + 1],
+            index=index,
+            columns=columns,
+        )
+
+        return candle_data
+
+    def signature(self, symbols: list[str], year: int) -> tuple:
+        """
+        Returns modification times and sizes of the partitions of a year,
+        which change whenever the partitions are written.
+        """
+
+        signature = []
+        for symbol in symbols:
+            for month in range(1, 12 + 1):
+                filepath = self._partition_path(symbol, year, month)
+                if filepath.is_file():
+                    stat = filepath.stat()
+                    signature.append((symbol, month, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def symbols(self) -> list[str]:
+        if not self._directory.is_dir():
+            return []
+        return sorted(p.name for p in self._directory.iterdir() if p.is_dir())
+
+    def months(self, symbol: str) -> list[tuple[int, int]]:
+        symbol_directory = self._directory / symbol
+        if not symbol_directory.is_dir():
+            return []
+        months: list[tuple[int, int]] = []
+        for filepath in symbol_directory.iterdir():
+            matched = PARTITION_NAME.match(filepath.name)
+            if matched is None:
+                continue
+            months.append((int(matched.group(1)), int(matched.group(2))))
+        months.sort()
+        return months
+
+    def complete_days(self, symbol: str) -> list[date]:
+        """
+        Returns days whose every moment has all fields filled
+        in the partitions of the symbol.
+        """
+
+        moments_per_day = 24 * 60 * 60 // MOMENT_SECONDS
+        complete_days: list[date] = []
+        for year, month in self.months(symbol):
+            partition = self.view(symbol, year, month)
+            if partition is None:
+                continue
+            is_filled = ~np.isnan(partition).any(axis=1)
+            del partition
+            filled_counts = is_filled.reshape(-1, moments_per_day).sum(axis=1)
+            for day_index in np.flatnonzero(filled_counts == moments_per_day):
+                complete_days.append(date(year, month, int(day_index) + 1))
+        return complete_days
+
+    def years(self) -> list[int]:
+        years: set[int] = set()
+        for symbol in self.symbols():
+            years.update(y for y, _ in self.months(symbol))
+        return sorted(years)
+
+
+class CandleAssembler:
+    """
+    Collects blocks of candle data, such as a month of a symbol,
+    into a preallocated array that has a row for every moment in a range.
+    Blocks are written in place as they come,
+    and the data frame is made only once at the end.
+    """
+
+    def __init__(self, target_symbols: list[str], start: datetime, end: datetime):
+        self._target_symbols = target_symbols
+        self._start = int(start.timestamp()) // MOMENT_SECONDS * MOMENT_SECONDS
+        row_count = -(-(int(end.timestamp()) - self._start) // MOMENT_SECONDS)
+        self._values = np.full(
+            (max(0, row_count), len(target_symbols) * len(CANDLE_FIELDS)),
+            np.nan,
+            dtype=np.float32,
+        )
+        self._has_data = np.zeros(max(0, row_count), dtype=np.bool_)
+
+    def add(self, candle_data: pd.DataFrame):
+        """
+        Writes a block of candle data in place.
+        Values that are NaN in the block don't overwrite the values already added.
+        """
+
+        index: pd.DatetimeIndex = candle_data.index  # type:ignore
+        positions = (index.asi8 // 10**9 - self._start) // MOMENT_SECONDS
+        is_inside = (positions >= 0) & (positions < len(self._has_data))
+        positions = positions[is_inside]
+
+        field_count = len(CANDLE_FIELDS)
+        for symbol in candle_data.columns.get_level_values(0).unique():
+            if symbol not in self._target_symbols:
+                continue
+            from_column = self._target_symbols.index(symbol) * field_count
+            until_column = from_column + field_count
+            new_values = (
+                candle_data[symbol]
+                .reindex(columns=list(CANDLE_FIELDS))
+                .to_numpy(dtype=np.float32)[is_inside]
+            )
+            old_values = self._values[positions, from_column:until_column]
+            is_missing = np.isnan(new_values)
+            self._values[positions, from_column:until_column] = np.where(
+                is_missing, old_values, new_values
+            )
+            self._has_data[positions] |= ~is_missing.all(axis=1)
+
+    def build(self) -> pd.DataFrame:
+        """
+        Returns candle data from the first to the last moment with any data.
+        """
+
+        columns = pd.MultiIndex.from_product(
+            [self._target_symbols, list(CANDLE_FIELDS)]
+        )
+        filled_rows = np.flatnonzero(self._has_data)
+        if len(filled_rows) == 0:
+            first_row, last_row = 0, -1
+        else:
+            first_row, last_row = int(filled_rows[0]), int(filled_rows[-1])
+
+        start_moment = datetime.fromtimestamp(self._start, tz=timezone.utc)
+        index = pd.date_range(
+            start=start_moment + pd.Timedelta(seconds=first_row * MOMENT_SECONDS),
+            periods=last_row - first_row + 1,
+            freq="10S",
+            tz="UTC",
+        )
+        candle_data = pd.DataFrame(
+            self._values[first_row : last_row + 1].copy(),
+            index=index,
+            columns=columns,
+        )
+
+        return candle_data
@@ -0,0 +1,102 @@
+import numpy as np
+
+
+def decimate_points(
+    data_x: np.ndarray,
+    data_y: np.ndarray,
+    range_start: float,
+    range_end: float,
+    pixel_width: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reduces a line to the minimum and maximum of each horizontal pixel
+    inside the visible range, keeping one more point on each side
+    so that the line reaches the edges.
+    Points are returned as they are when there are few enough of them.
+    `data_x` should be sorted.
+    """
+
+    from_index = int(np.searchsorted(data_x, range_start, side="left"))
+    until_index = int(np.searchsorted(data_x, range_end, side="right"))
+    from_index = max(from_index - 1, 0)
+    until_index = min(until_index + 1, len(data_x))
+    data_x = data_x[from_index:until_index]
+    data_y = data_y[from_index:until_index]
+
+    pixel_width = max(pixel_width, 1)
+    if len(data_x) <= pixel_width * 2:
+        return data_x, data_y
+
+    # Buckets are made from the view, not from the data,
+    # so that they stay still while the data grows.
+    pixel_span = (range_end - range_start) / pixel_width
+    buckets = np.floor((data_x - range_start) / pixel_span).astype(np.int64)
+    bucket_starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+
+    # NaN is kept only when the whole bucket is NaN, leaving a gap in the line.
+    mins = np.fmin.reduceat(data_y, bucket_starts)
+    maxs = np.fmax.reduceat(data_y, bucket_starts)
+    decimated_x = np.repeat(data_x[bucket_starts], 2)
+    decimated_y = np.stack([mins, maxs], axis=1).reshape(-1)
+
+    return decimated_x, decimated_y
+
+
+def make_candle_points(
+    index_ar: np.ndarray,
+    open_ar: np.ndarray,
+    high_ar: np.ndarray,
+    low_ar: np.ndarray,
+    close_ar: np.ndarray,
+    candle_seconds: float = 10,
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """
+    Makes points of candlesticks to be drawn with `connect="finite"`,
+    separated into `"rise"`, `"fall"` and `"stay"` lines.
+    Each candle takes nine points,
+    for the opening tick, the closing tick and the wick.
+    """
+
+    left = candle_seconds * 0.2
+    middle = candle_seconds * 0.5
+    right = candle_seconds * 0.8
+
+    candle_points: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+    for name, mask in (
+        ("rise", close_ar > open_ar),
+        ("fall", close_ar < open_ar),
+        ("stay", close_ar == open_ar),
+    ):
+        x = index_ar[mask]
+        nan_ar = np.full(len(x), np.nan)
+        data_x = np.stack(
+            [
+                x + left,
+                x + middle,
+                x,
+                x + middle,
+                x + right,
+                x,
+                x + middle,
+                x + middle,
+                x,
+            ],
+            axis=1,
+        ).reshape(-1)
+        data_y = np.stack(
+            [
+                open_ar[mask],
+                open_ar[mask],
+                nan_ar,
+                close_ar[mask],
+                close_ar[mask],
+                nan_ar,
+                high_ar[mask],
+                low_ar[mask],
+                nan_ar,
+            ],
+            axis=1,
+        ).reshape(-1)
+        candle_points[name] = (data_x, data_y)
+
+    return candle_points
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+MOMENT_SECONDS = 10
+
+
+def find_coverage_origin(current_time: datetime) -> datetime:
+    """
+    Returns the origin of a bitmap for candle data of the current year,
+    reaching back at least two days so that recent moments
+    are never regarded as missing right after the year changes.
+    """
+
+    year_start = datetime(current_time.year, 1, 1, tzinfo=timezone.utc)
+    recent_start = current_time.astimezone(timezone.utc) - timedelta(days=2)
+    recent_start = recent_start.replace(hour=0, minute=0, second=0, microsecond=0)
+    return min(year_start, recent_start)
+
+
+class CoverageBitmap:
+    """
+    Records which 10-second moments have complete candles, for each symbol.
+    Every moment takes a single bit, counted from the origin moment.
+    Moments before the origin are always regarded as missing,
+    while the bitmap grows as later moments are marked.
+
+    Ranges in queries are half-open, as in `[start, end)`.
+    """
+
+    def __init__(self, target_symbols: list[str], origin: datetime):
+        self._target_symbols = target_symbols
+        self._origin = int(origin.timestamp()) // MOMENT_SECONDS
+        self._bits: dict[str, np.ndarray] = {}
+        for symbol in target_symbols:
+            self._bits[symbol] = np.zeros(0, dtype=np.uint8)
+
+    def _position(self, moment: datetime) -> int:
+        return int(moment.timestamp()) // MOMENT_SECONDS - self._origin
+
+    def _moment(self, position: int) -> datetime:
+        timestamp = (self._origin + position) * MOMENT_SECONDS
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+    def _ensure(self, symbol: str, byte_count: int):
+        bits = self._bits[symbol]
+        if len(bits) >= byte_count:
+            return
+        new_bits = np.zeros(max(byte_count, len(bits) * 2), dtype=np.uint8)
+        new_bits[: len(bits)] = bits
+        self._bits[symbol] = new_bits
+
+    def _unpack(self, symbol: str, start: int, end: int) -> np.ndarray:
+        # Positions outside the bitmap are regarded as missing.
+        covered = np.zeros(max(0, end - start), dtype=np.bool_)
+        bits = self._bits[symbol]
+        from_position = max(start, 0)
+        until_position = min(end, len(bits) * 8)
+        if from_position >= until_position:
+            return covered
+        from_byte = from_position // 8
+        until_byte = -(-until_position // 8)
+        unpacked = np.unpackbits(bits[from_byte:until_byte], bitorder="little")
+        offset = from_byte * 8
+        covered[from_position - start : until_position - start] = unpacked[
+            from_position - offset : until_position - offset
+        ]
+        return covered
+
+    def mark(self, symbol: str, moment: datetime, is_covered: bool = True):
+        position = self._position(moment)
+        if position < 0:
+            return
+        self._ensure(symbol, position // 8 + 1)
+        mask = np.uint8(1 << (position % 8))
+        if is_covered:
+            self._bits[symbol][position // 8] |= mask
+        else:
+            self._bits[symbol][position // 8] &= ~mask
+
+    def update(self, candle_data: pd.DataFrame):
+        """
+        Sets the bits of all moments in the given candle data,
+        regarding a moment as covered when all fields of a symbol are filled.
+        """
+
+        index: pd.DatetimeIndex = candle_data.index  # type:ignore
+        if len(index) == 0:
+            return
+        positions = index.asi8 // 10**9 // MOMENT_SECONDS - self._origin
+        is_inside = positions >= 0
+        positions = positions[is_inside]
+        if len(positions) == 0:
+            return
+        byte_indices = positions // 8
+        masks = (1 << (positions % 8)).astype(np.uint8)
+        symbols = candle_data.columns.get_level_values(0).unique()
+        for symbol in symbols:
+            if symbol not in self._bits:
+                continue
+            self._ensure(symbol, int(byte_indices.max()) + 1)
+            bits = self._bits[symbol]
+            is_covered = candle_data[symbol].notna().all(axis=1).to_numpy()
+            is_covered = is_covered[is_inside]
+            np.bitwise_and.at(bits, byte_indices[~is_covered], ~masks[~is_covered])
+            np.bitwise_or.at(bits, byte_indices[is_covered], masks[is_covered])
+
+    def rebuild(self, candle_data: pd.DataFrame):
+        for symbol in self._target_symbols:
+            self._bits[symbol] = np.zeros(0, dtype=np.uint8)
+        self.update(candle_data)
+
+    def covered_count(
+        self, start: datetime, end: datetime, symbols: list[str] | None = None
+    ) -> int:
+        """
+        Returns the number of moments covered by all given symbols,
+        or by all target symbols if none are given.
+        """
+
+        if symbols is None:
+            symbols = self._target_symbols
+        start_position = self._position(start)
+        end_position = self._position(end)
+        covered = np.ones(max(0, end_position - start_position), dtype=np.bool_)
+        for symbol in symbols:
+            covered &= self._unpack(symbol, start_position, end_position)
+        return int(np.count_nonzero(covered))
+
+    def cumulation_rate(self, start: datetime, end: datetime) -> float:
+        moment_count = self._position(end) - self._position(start)
+        if moment_count <= 0:
+            return 0.0
+        return self.covered_count(start, end) / moment_count
+
+    def first_missing(
+        self, symbol: str, start: datetime, end: datetime
+    ) -> datetime | None:
+        start_position = self._position(start)
+        end_position = self._position(end)
+        covered = self._unpack(symbol, start_position, end_position)
+        missing_positions = np.flatnonzero(~covered)
+        if len(missing_positions) == 0:
+            return None
+        return self._moment(start_position + int(missing_positions[0]))
+
+    def gaps(
+        self, symbol: str, start: datetime, end: datetime
+    ) -> list[tuple[datetime, datetime]]:
+        """
+        Returns ranges of missing moments, each in the form of `(start, end)`.
+        """
+
+        start_position = self._position(start)
+        end_position = self._position(end)
+        covered = self._unpack(symbol, start_position, end_position)
+        padded = np.concatenate([[True], covered, [True]]).astype(np.int8)
+        changes = np.diff(padded)
+        gap_starts = np.flatnonzero(changes == -1)
+        gap_ends = np.flatnonzero(changes == 1)
+        gaps: list[tuple[datetime, datetime]] = []
+        for gap_start, gap_end in zip(gap_starts, gap_ends):
+            gaps.append(
+                (
+                    self._moment(start_position + int(gap_start)),
+                    self._moment(start_position + int(gap_end)),
+                )
+            )
+        return gaps
@@ -0,0 +1,63 @@
+import calendar
+from dataclasses import dataclass, field
+from datetime import date
+
+import pandas as pd
+from dataclasses_json import DataClassJsonMixin
+
+COVERAGE_SOURCES = (
+    "daily_archive",
+    "monthly_archive",
+    "partial_archive",  # The archive itself has missing moments
+    "realtime",
+    "store",  # Found in the candle store before the manifest existed
+)
+
+
+@dataclass
+class CoverageManifest(DataClassJsonMixin):
+    """
+    Records the days of candle data that don't need to be filled again,
+    for each symbol. Those are fully populated days
+    and days that are as populated as the archives can make them.
+    Keys are symbols and then ISO dates,
+    while values are one of `COVERAGE_SOURCES`.
+    """
+
+    days: dict[str, dict[str, str]] = field(default_factory=dict)
+
+    def mark(self, symbol: str, day: date, source: str):
+        self.days.setdefault(symbol, {})[day.isoformat()] = source
+
+    def is_complete(self, symbol: str, day: date) -> bool:
+        return day.isoformat() in self.days.get(symbol, {})
+
+    def is_month_complete(self, symbol: str, year: int, month: int) -> bool:
+        _, day_count = calendar.monthrange(year, month)
+        symbol_days = self.days.get(symbol, {})
+        return all(
+            date(year, month, day).isoformat() in symbol_days
+            for day in range(1, day_count + 1)
+        )
+
+
+def check_day_completeness(
+    candle_data: pd.DataFrame,
+) -> list[tuple[str, date, bool]]:
+    """
+    Returns each symbol and day within the given candle data,
+    along with whether its every 10-second moment is populated.
+    """
+
+    moments_per_day = 6 * 60 * 24
+    days = pd.DatetimeIndex(candle_data.index).floor("D")
+
+    day_completeness: list[tuple[str, date, bool]] = []
+    for symbol in candle_data.columns.get_level_values(0).unique():
+        is_populated = candle_data[(symbol, "Close")].notna()
+        populated_counts = is_populated.groupby(days).sum()
+        for day, populated_count in populated_counts.items():
+            is_complete = bool(populated_count == moments_per_day)
+            day_completeness.append((str(symbol), day.date(), is_complete))
+
+    return day_completeness
@@ -1,13 +1,23 @@
-import io
+import asyncio
+import hashlib
+import zipfile
 from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
-from urllib.request import urlopen
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO
 
+import aiofiles
+import aiofiles.os
 import numpy as np
 import pandas as pd
+from aiohttp import ClientSession
+
+from solie.common import go
 
 from .timing import to_moment
 
+BINANCE_DATA_URL = "https://data.binance.vision"
+
 
 @dataclass
 class DownloadPreset:
@@ -18,7 +28,7 @@ class DownloadPreset:
     day: int = 0  # Valid only when `unit_size` is "daily"
 
 
-def download_aggtrade_data(download_target: DownloadPreset) -> pd.DataFrame | None:
+def make_archive_path(download_target: DownloadPreset) -> str:
     symbol = download_target.symbol
     unit_size = download_target.unit_size
 
@@ -26,118 +36,276 @@ def download_aggtrade_data(download_target: DownloadPreset) -> pd.DataFrame | No
         year_string = format(download_target.year, "04")
         month_string = format(download_target.month, "02")
         day_string = format(download_target.day, "02")
-        url = (
-            "https://data.binance.vision/data/futures/um/daily/aggTrades"
+        archive_path = (
+            "data/futures/um/daily/aggTrades"
             + f"/{symbol}/{symbol}-aggTrades"
             + f"-{year_string}-{month_string}-{day_string}.zip"
         )
     elif unit_size == "monthly":
         year_string = format(download_target.year, "04")
         month_string = format(download_target.month, "02")
-        url = (
-            "https://data.binance.vision/data/futures/um/monthly/aggTrades"
+        archive_path = (
+            "data/futures/um/monthly/aggTrades"
             + f"/{symbol}/{symbol}-aggTrades"
             + f"-{year_string}-{month_string}.zip"
         )
     else:
         raise ValueError("This download type is not supported")
 
-    zipped_csv_data = None
-    for _ in range(5):
-        try:
-            zipped_csv_data = io.BytesIO(urlopen(url).read())
-            break
-        except Exception:
-            pass
-
-    if zipped_csv_data is None:
-        return
-
-    try:
-        df: pd.DataFrame = pd.concat(
-            pd.read_csv(
-                zipped_csv_data,
-                compression="zip",
+    return archive_path
+
+
+def calculate_sha256(filepath: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        while block := file.read(2**20):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class ArchiveDownloader:
+    """
+    Downloads archives of Binance public data into a local cache,
+    where files are placed under the same paths as in their URLs.
+    Archives never change once published, so cached ones are used as they are.
+
+    Each archive is verified against the `.CHECKSUM` file published beside it.
+    Partial downloads are kept as `.part` files
+    and resumed with HTTP range requests.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        base_url: str = BINANCE_DATA_URL,
+        concurrency: int = 8,
+        retry_count: int = 5,
+    ):
+        self._directory = directory
+        self._base_url = base_url.rstrip("/")
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._retry_count = retry_count
+        self._session = ClientSession()
+
+    def __del__(self):
+        asyncio.create_task(self._session.close())
+
+    def cached_path(self, download_target: DownloadPreset) -> Path:
+        return self._directory / make_archive_path(download_target)
+
+    async def fetch(
+        self, download_target: DownloadPreset, offline: bool = False
+    ) -> Path | None:
+        """
+        Returns the path of the verified archive in the cache,
+        or `None` if it's not available.
+        When `offline` is true, only the cache is looked up.
+        """
+
+        filepath = self.cached_path(download_target)
+        if await aiofiles.os.path.isfile(filepath):
+            return filepath
+        if offline:
+            return None
+
+        archive_path = make_archive_path(download_target)
+        async with self._semaphore:
+            for _ in range(self._retry_count):
+                try:
+                    return await self._download(archive_path, filepath)
+                except Exception:
+                    await asyncio.sleep(1)
+
+        return None
+
+    async def _download(self, archive_path: str, filepath: Path) -> Path | None:
+        url = f"{self._base_url}/{archive_path}"
+
+        async with self._session.get(f"{url}.CHECKSUM") as response:
+            if response.status == 404:
+                # When the archive is not published
+                return None
+            response.raise_for_status()
+            expected_hash = (await response.text()).split()[0].lower()
+
+        await aiofiles.os.makedirs(filepath.parent, exist_ok=True)
+        part_path = filepath.with_name(filepath.name + ".part")
+        if await aiofiles.os.path.isfile(part_path):
+            part_size = await aiofiles.os.path.getsize(part_path)
+        else:
+            part_size = 0
+
+        headers = {}
+        if part_size > 0:
+            headers["Range"] = f"bytes={part_size}-"
+        async with self._session.get(url, headers=headers) as response:
+            if response.status == 404:
+                return None
+            if response.status != 416:
+                # Status 416 means that the partial file is already complete.
+                response.raise_for_status()
+                # The server might ignore the range and send the whole file.
+                file_mode = "ab" if response.status == 206 else "wb"
+                async with aiofiles.open(part_path, file_mode) as file:
+                    async for block in response.content.iter_chunked(2**20):
+                        await file.write(block)
+
+        actual_hash = await go(calculate_sha256, part_path)
+        if actual_hash != expected_hash:
+            await aiofiles.os.remove(part_path)
+            raise ValueError(f"Checksum of {archive_path} doesn't match")
+
+        await aiofiles.os.replace(part_path, filepath)
+        return filepath
+
+
+def convert_aggtrade_archive(
+    symbol: str, zipped_csv_file: Path | BinaryIO, chunk_size: int = 10**6
+) -> pd.DataFrame | None:
+    """
+    Converts a zipped CSV file of aggregate trades into 10-second candle data.
+    Trades are read in chunks of `chunk_size` rows and folded into candles,
+    so that no more than one chunk of raw trades is held in the memory.
+    """
+
+    # ■■■■■ fold each chunk into candles ■■■■■
+
+    chunk_bins: list[np.ndarray] = []
+    chunk_opens: list[np.ndarray] = []
+    chunk_highs: list[np.ndarray] = []
+    chunk_lows: list[np.ndarray] = []
+    chunk_closes: list[np.ndarray] = []
+    chunk_volumes: list[np.ndarray] = []
+
+    with zipfile.ZipFile(zipped_csv_file) as zipped:
+        csv_name = zipped.namelist()[0]
+
+        # From august 2022, header is included from binance.
+        with zipped.open(csv_name) as csv_file:
+            first_line = csv_file.readline()
+        has_header = not first_line[:1].isdigit()
+
+        with zipped.open(csv_name) as csv_file:
+            chunks = pd.read_csv(
+                csv_file,
                 header=None,
+                skiprows=1 if has_header else 0,
                 usecols=[1, 2, 5],
                 dtype={1: np.float32, 2: np.float32, 5: np.int64},
-                chunksize=10**6,
+                chunksize=chunk_size,
             )
-        )
-    except ValueError:
-        # when there is a header line in start of the file
-        # from august 2022, header is included from binance
-        df: pd.DataFrame = pd.concat(
-            pd.read_csv(
-                zipped_csv_data,
-                compression="zip",
-                header=0,
-                usecols=[1, 2, 5],
-                dtype={1: np.float32, 2: np.float32, 5: np.int64},
-                chunksize=10**6,
-            )
-        )
-        df = df.rename(columns={"price": 1, "quantity": 2, "transact_time": 5})
-
-    df = df.set_index(5)
-    df.index.name = None
-    df.index = pd.to_datetime(df.index, unit="ms", utc=True)
-
-    # fill index holes that's smaller than 10 minutes
-    temp_sr = pd.Series(0, index=df.index, dtype=np.float32)
-    temp_sr = temp_sr.groupby(temp_sr.index).first()
-    temp_sr = temp_sr.resample("10s").agg("mean")
-    temp_sr = temp_sr.interpolate(limit=60, limit_direction="forward")
-    temp_sr = temp_sr.replace(np.nan, 1)
-    temp_sr = temp_sr.replace(0, np.nan)
-    temp_sr = temp_sr.interpolate(limit=60, limit_direction="backward")
-    temp_sr = temp_sr.replace(np.nan, 0)
-    temp_sr = temp_sr.replace(1, np.nan)
-    temp_sr = temp_sr.dropna()
-    valid_index = temp_sr.index
-
-    del temp_sr
-
-    # process data
-
-    close_sr: pd.Series = df[1].resample("10s").agg("last")  # type:ignore
-    close_sr = close_sr.reindex(valid_index)
-    close_sr = close_sr.ffill()
-    close_sr = close_sr.astype(np.float32)
-    close_sr.name = (symbol, "Close")
-
-    open_sr: pd.Series = df[1].resample("10s").agg("first")  # type:ignore
-    open_sr = open_sr.reindex(valid_index)
-    open_sr = open_sr.fillna(value=close_sr)
-    open_sr = open_sr.astype(np.float32)
-    open_sr.name = (symbol, "Open")
-
-    high_sr: pd.Series = df[1].resample("10s").agg("max")  # type:ignore
-    high_sr = high_sr.reindex(valid_index)
-    high_sr = high_sr.fillna(value=close_sr)
-    high_sr = high_sr.astype(np.float32)
-    high_sr.name = (symbol, "High")
-
-    low_sr: pd.Series = df[1].resample("10s").agg("min")  # type:ignore
-    low_sr = low_sr.reindex(valid_index)
-    low_sr = low_sr.fillna(value=close_sr)
-    low_sr = low_sr.astype(np.float32)
-    low_sr.name = (symbol, "Low")
-
-    volume_sr: pd.Series = df[2].resample("10s").agg("sum")  # type:ignore
-    volume_sr = volume_sr.reindex(valid_index)
-    volume_sr = volume_sr.fillna(value=0)
-    volume_sr = volume_sr.astype(np.float32)
-    volume_sr.name = (symbol, "Volume")
-
-    del df
-
-    series_list = [open_sr, high_sr, low_sr, close_sr, volume_sr]
-    new_df = pd.concat(series_list, axis="columns")
+            for chunk in chunks:
+                candles = _fold_trades(
+                    chunk[5].to_numpy(),
+                    chunk[1].to_numpy(),
+                    chunk[2].to_numpy(),
+                )
+                del chunk
+                if candles is None:
+                    continue
+                chunk_bins.append(candles[0])
+                chunk_opens.append(candles[1])
+                chunk_highs.append(candles[2])
+                chunk_lows.append(candles[3])
+                chunk_closes.append(candles[4])
+                chunk_volumes.append(candles[5])
+
+    if len(chunk_bins) == 0:
+        return
+
+    # ■■■■■ merge candles that span chunk boundaries ■■■■■
+
+    bins = np.concatenate(chunk_bins)
+    order = np.argsort(bins, kind="stable")
+    bins = bins[order]
+    unique_bins, first_positions, counts = np.unique(
+        bins,
+        return_index=True,
+        return_counts=True,
+    )
+    last_positions = first_positions + counts - 1
+    open_ar = np.concatenate(chunk_opens)[order][first_positions]
+    high_ar = np.maximum.reduceat(np.concatenate(chunk_highs)[order], first_positions)
+    low_ar = np.minimum.reduceat(np.concatenate(chunk_lows)[order], first_positions)
+    close_ar = np.concatenate(chunk_closes)[order][last_positions]
+    volume_ar = np.add.reduceat(np.concatenate(chunk_volumes)[order], first_positions)
+
+    # ■■■■■ fill index holes that's smaller than 10 minutes ■■■■■
+
+    first_bin = int(unique_bins[0])
+    span = int(unique_bins[-1]) - first_bin + 1
+    positions = unique_bins - first_bin
+
+    has_trades = np.zeros(span, dtype=np.bool_)
+    has_trades[positions] = True
+    is_valid = np.ones(span, dtype=np.bool_)
+    hole_lengths = np.diff(positions) - 1
+    for hole_index in np.flatnonzero(hole_lengths > 60):
+        hole_start = positions[hole_index] + 1
+        hole_end = positions[hole_index + 1]
+        is_valid[hole_start:hole_end] = False
+
+    # Moments without trades take the close price of the last moment with trades.
+    last_trade_positions = np.where(has_trades, np.arange(span), 0)
+    last_trade_positions = np.maximum.accumulate(last_trade_positions)
+    last_trade_indices = np.searchsorted(positions, last_trade_positions)
+
+    full_close_ar = close_ar[last_trade_indices]
+    full_open_ar = np.where(has_trades, open_ar[last_trade_indices], full_close_ar)
+    full_high_ar = np.where(has_trades, high_ar[last_trade_indices], full_close_ar)
+    full_low_ar = np.where(has_trades, low_ar[last_trade_indices], full_close_ar)
+    full_volume_ar = np.where(has_trades, volume_ar[last_trade_indices], 0)
+
+    # ■■■■■ make candle data ■■■■■
+
+    timestamps = (np.arange(span, dtype=np.int64) + first_bin)[is_valid] * 10
+    new_df = pd.DataFrame(
+        np.stack(
+            [
+                full_open_ar[is_valid],
+                full_high_ar[is_valid],
+                full_low_ar[is_valid],
+                full_close_ar[is_valid],
+                full_volume_ar[is_valid],
+            ],
+            axis=1,
+        ).astype(np.float32),
+        index=pd.to_datetime(timestamps, unit="s", utc=True),
+        columns=pd.MultiIndex.from_product(
+            [[symbol], ["Open", "High", "Low", "Close", "Volume"]]
+        ),
+    )
 
     return new_df
 
 
+def _fold_trades(
+    times: np.ndarray, prices: np.ndarray, volumes: np.ndarray
+) -> tuple[np.ndarray, ...] | None:
+    # Returns moment numbers and OHLCV of the moments with trades.
+    if len(times) == 0:
+        return None
+    bins = times // 10000  # From milliseconds
+    order = np.argsort(bins, kind="stable")
+    bins = bins[order]
+    prices = prices[order]
+    volumes = volumes[order].astype(np.float64)
+    unique_bins, first_positions, counts = np.unique(
+        bins,
+        return_index=True,
+        return_counts=True,
+    )
+    last_positions = first_positions + counts - 1
+    return (
+        unique_bins,
+        prices[first_positions],
+        np.maximum.reduceat(prices, first_positions),
+        np.minimum.reduceat(prices, first_positions),
+        prices[last_positions],
+        np.add.reduceat(volumes, first_positions),
+    )
+
+
 def fill_holes_with_aggtrades(
     symbol: str,
     recent_candle_data: pd.DataFrame,
@@ -145,65 +313,102 @@ def fill_holes_with_aggtrades(
     moment_to_fill_from: datetime,
     last_fetched_time: datetime,
 ) -> pd.DataFrame:
-    fill_moment = moment_to_fill_from
-
-    last_fetched_moment = to_moment(last_fetched_time)
-    while fill_moment < last_fetched_moment:
-        block_start = fill_moment
-        block_end = fill_moment + timedelta(seconds=10)
-
-        aggtrade_prices: list[float] = []
-        aggtrade_volumes: list[float] = []
-        for _, aggtrade in sorted(aggtrades.items()):
-            # sorted by time
-            aggtrade_time = datetime.fromtimestamp(
-                int(aggtrade["T"]) / 1000, tz=timezone.utc
-            )
-            if block_start <= aggtrade_time < block_end:
-                aggtrade_prices.append(float(aggtrade["p"]))
-                aggtrade_volumes.append(float(aggtrade["q"]))
-
-        can_write = True
-
-        if len(aggtrade_prices) == 0:
-            # when there are no trades
-            inspect_sr = recent_candle_data[(symbol, "Close")]
-            inspect_sr = inspect_sr.sort_index()
-            last_prices = inspect_sr[:fill_moment].dropna()
-            if len(last_prices) == 0:
-                # when there are no previous data
-                # because new data folder was created
-                can_write = False
-                last_price = 0
-            else:
-                last_price = last_prices.iloc[-1]
-            open_price = last_price
-            high_price = last_price
-            low_price = last_price
-            close_price = last_price
-            sum_volume = 0
-        else:
-            open_price = aggtrade_prices[0]
-            high_price = max(aggtrade_prices)
-            low_price = min(aggtrade_prices)
-            close_price = aggtrade_prices[-1]
-            sum_volume = sum(aggtrade_volumes)
-
-        if can_write:
-            column = (symbol, "Open")
-            recent_candle_data.loc[fill_moment, column] = open_price
-            column = (symbol, "High")
-            recent_candle_data.loc[fill_moment, column] = high_price
-            column = (symbol, "Low")
-            recent_candle_data.loc[fill_moment, column] = low_price
-            column = (symbol, "Close")
-            recent_candle_data.loc[fill_moment, column] = close_price
-            column = (symbol, "Volume")
-            recent_candle_data.loc[fill_moment, column] = sum_volume
-
-        fill_moment += timedelta(seconds=10)
-
     recent_candle_data = recent_candle_data.sort_index(axis="index")
+
+    fill_from = int(moment_to_fill_from.timestamp()) * 1000
+    fill_until = int(to_moment(last_fetched_time).timestamp()) * 1000
+    moment_count = max(0, -(-(fill_until - fill_from) // 10000))
+    if moment_count == 0:
+        return recent_candle_data.sort_index(axis="columns")
+
+    # ■■■■■ bin trades into moments ■■■■■
+
+    # Trades are ordered by their IDs, which is the order of execution.
+    sorted_trades = [aggtrades[k] for k in sorted(aggtrades.keys())]
+    trade_times = np.array([int(t["T"]) for t in sorted_trades], dtype=np.int64)
+    trade_prices = np.array([float(t["p"]) for t in sorted_trades], dtype=np.float64)
+    trade_volumes = np.array([float(t["q"]) for t in sorted_trades], dtype=np.float64)
+
+    trade_bins = (trade_times - fill_from) // 10000
+    is_inside = (trade_bins >= 0) & (trade_bins < moment_count)
+    trade_bins = trade_bins[is_inside]
+    trade_prices = trade_prices[is_inside]
+    trade_volumes = trade_volumes[is_inside]
+
+    # Stable sorting keeps the order of execution inside each bin.
+    order = np.argsort(trade_bins, kind="stable")
+    trade_bins = trade_bins[order]
+    trade_prices = trade_prices[order]
+    trade_volumes = trade_volumes[order]
+
+    # ■■■■■ calculate OHLCV of bins with trades ■■■■■
+
+    open_ar = np.full(moment_count, np.nan)
+    high_ar = np.full(moment_count, np.nan)
+    low_ar = np.full(moment_count, np.nan)
+    close_ar = np.full(moment_count, np.nan)
+    volume_ar = np.zeros(moment_count)
+    has_trades = np.zeros(moment_count, dtype=np.bool_)
+
+    if len(trade_bins) > 0:
+        filled_bins, first_positions, counts = np.unique(
+            trade_bins,
+            return_index=True,
+            return_counts=True,
+        )
+        last_positions = first_positions + counts - 1
+        open_ar[filled_bins] = trade_prices[first_positions]
+        high_ar[filled_bins] = np.maximum.reduceat(trade_prices, first_positions)
+        low_ar[filled_bins] = np.minimum.reduceat(trade_prices, first_positions)
+        close_ar[filled_bins] = trade_prices[last_positions]
+        volume_ar[filled_bins] = np.add.reduceat(trade_volumes, first_positions)
+        has_trades[filled_bins] = True
+
+    # ■■■■■ carry the last price over bins without trades ■■■■■
+
+    fill_index = pd.date_range(
+        start=pd.Timestamp(fill_from, unit="ms", tz="UTC"),
+        periods=moment_count,
+        freq="10S",
+    )
+    close_sr = recent_candle_data[(symbol, "Close")]
+    existing_close_ar = close_sr.reindex(fill_index).to_numpy(dtype=np.float64)
+    last_price_sr = pd.Series(np.where(has_trades, close_ar, existing_close_ar))
+    last_price_sr = last_price_sr.ffill()
+    previous_prices = close_sr[close_sr.index < fill_index[0]].dropna()
+    if len(previous_prices) > 0:
+        last_price_sr = last_price_sr.fillna(previous_prices.iloc[-1])
+    last_price_ar = last_price_sr.to_numpy()
+
+    is_empty = ~has_trades
+    open_ar[is_empty] = last_price_ar[is_empty]
+    high_ar[is_empty] = last_price_ar[is_empty]
+    low_ar[is_empty] = last_price_ar[is_empty]
+    close_ar[is_empty] = last_price_ar[is_empty]
+
+    # ■■■■■ write all rows at once ■■■■■
+
+    # Without any previous data because new data folder was created,
+    # bins before the first trade cannot be written.
+    can_write = ~np.isnan(close_ar)
+    write_index = fill_index[can_write]
+    write_values = np.stack(
+        [open_ar, high_ar, low_ar, close_ar, volume_ar],
+        axis=1,
+    )[can_write]
+
+    if len(write_index) > 0:
+        new_index = recent_candle_data.index.union(write_index)
+        recent_candle_data = recent_candle_data.reindex(new_index)
+        columns = [
+            (symbol, "Open"),
+            (symbol, "High"),
+            (symbol, "Low"),
+            (symbol, "Close"),
+            (symbol, "Volume"),
+        ]
+        recent_candle_data.loc[write_index, columns] = write_values.astype(np.float32)
+
     recent_candle_data = recent_candle_data.sort_index(axis="columns")
 
     return recent_candle_data
@@ -0,0 +1,53 @@
+import numpy as np
+
+
+class LineBuffer:
+    """
+    Growable storage of points of a chart line.
+    Spare capacity is kept at the end,
+    so that appending doesn't copy the points that are already there.
+
+    `data_x` and `data_y` are views of the filled part,
+    which can be handed to plot items as they are.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._x = np.zeros(capacity, dtype=np.float64)
+        self._y = np.zeros(capacity, dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def data_x(self) -> np.ndarray:
+        return self._x[: self._size]
+
+    @property
+    def data_y(self) -> np.ndarray:
+        return self._y[: self._size]
+
+    def _reserve(self, size: int):
+        if len(self._x) >= size:
+            return
+        capacity = max(size, len(self._x) * 2)
+        new_x = np.zeros(capacity, dtype=np.float64)
+        new_y = np.zeros(capacity, dtype=np.float32)
+        new_x[: self._size] = self._x[: self._size]
+        new_y[: self._size] = self._y[: self._size]
+        self._x = new_x
+        self._y = new_y
+
+    def append(self, data_x: np.ndarray, data_y: np.ndarray):
+        count = len(data_x)
+        self._reserve(self._size + count)
+        self._x[self._size : self._size + count] = data_x
+        self._y[self._size : self._size + count] = data_y
+        self._size += count
+
+    def replace(self, data_x: np.ndarray, data_y: np.ndarray):
+        self._size = 0
+        self.append(data_x, data_y)
+
+    def truncate(self, size: int):
+        self._size = min(max(size, 0), self._size)
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+
+class RecordKeyAllocator:
+    """
+    Issues unique and strictly increasing timestamps for a stream of records.
+    A desired timestamp is used as it is when it's later than the last key,
+    otherwise it's pushed to a millisecond after the last key.
+
+    Keys written by others can be told to the allocator with `observe`,
+    so that nothing is ever looked up in the record itself.
+    """
+
+    def __init__(self, last_key: datetime | None = None):
+        self._last_key = last_key
+        self._step = timedelta(milliseconds=1)
+
+    @property
+    def last_key(self) -> datetime | None:
+        return self._last_key
+
+    def observe(self, key: datetime):
+        if self._last_key is None or key > self._last_key:
+            self._last_key = key
+
+    def allocate(self, desired: datetime) -> datetime:
+        if self._last_key is not None and desired <= self._last_key:
+            desired = self._last_key + self._step
+        self._last_key = desired
+        return desired
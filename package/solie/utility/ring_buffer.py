@@ -0,0 +1,95 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity columnar storage of timestamped values.
+    Timestamps are held in an `int64` array and each field in a `float64` array.
+
+    Every record is written twice, at the cursor and at the cursor plus capacity,
+    so that the latest records are always laid out contiguously in memory.
+    This lets slicing methods return NumPy views instead of copies.
+    Returned views are only valid until the next append,
+    so they should be used or copied right away.
+
+    Timestamps are expected to be appended in non-decreasing order,
+    which is required for binary search in `between`.
+    """
+
+    def __init__(self, capacity: int, fields: tuple[str, ...]):
+        self._capacity = capacity
+        self._fields = fields
+        self._timestamps = np.zeros(capacity * 2, dtype=np.int64)
+        self._columns = [np.zeros(capacity * 2, dtype=np.float64) for _ in fields]
+        self._cursor = 0  # Position where the next record is written
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def fields(self) -> tuple[str, ...]:
+        return self._fields
+
+    def append(self, timestamp: int, *values: float):
+        cursor = self._cursor
+        mirror = cursor + self._capacity
+        self._timestamps[cursor] = timestamp
+        self._timestamps[mirror] = timestamp
+        for column, value in zip(self._columns, values):
+            column[cursor] = value
+            column[mirror] = value
+        self._cursor = (cursor + 1) % self._capacity
+        if self._size < self._capacity:
+            self._size += 1
+
+    def clear(self):
+        self._cursor = 0
+        self._size = 0
+
+    def _window(self) -> tuple[int, int]:
+        # Records inside this range are sorted from the oldest to the newest.
+        end = self._cursor + self._capacity
+        start = end - self._size
+        return start, end
+
+    def _view(self, start: int, end: int) -> dict[str, np.ndarray]:
+        sliced = {"timestamp": self._timestamps[start:end]}
+        for field, column in zip(self._fields, self._columns):
+            sliced[field] = column[start:end]
+        return sliced
+
+    def first_timestamp(self) -> int | None:
+        if self._size == 0:
+            return None
+        start, _ = self._window()
+        return int(self._timestamps[start])
+
+    def last_timestamp(self) -> int | None:
+        if self._size == 0:
+            return None
+        _, end = self._window()
+        return int(self._timestamps[end - 1])
+
+    def latest(self, count: int) -> dict[str, np.ndarray]:
+        """
+        Returns views of the latest `count` records, oldest first.
+        """
+        start, end = self._window()
+        start = max(start, end - count)
+        return self._view(start, end)
+
+    def between(self, from_timestamp: int, to_timestamp: int) -> dict[str, np.ndarray]:
+        """
+        Returns views of the records whose timestamps are
+        in the half-open range of `[from_timestamp, to_timestamp)`.
+        """
+        start, end = self._window()
+        timestamps = self._timestamps[start:end]
+        left = int(np.searchsorted(timestamps, from_timestamp, side="left"))
+        right = int(np.searchsorted(timestamps, to_timestamp, side="left"))
+        return self._view(start + left, start + max(left, right))
@@ -14,6 +14,7 @@ class Strategy(DataClassJsonMixin):
     chunk_division: int = 30
     indicators_script: str = "pass"
     decision_script: str = "pass"
+    signals_script: str = ""  # Optional, makes only simulation run on arrays
 
 
 @dataclass
@@ -60,7 +61,7 @@ class ManagementSettings(DataClassJsonMixin):
     lock_board: str = "NEVER"  # One of `BOARD_LOCK_OPTIONS`
 
 
-@dataclass
+@dataclass(slots=True)
 class BookTicker:
     timestamp: int  # In milliseconds
     symbol: str
@@ -68,16 +69,39 @@ class BookTicker:
     best_ask_price: float
 
 
-@dataclass
+@dataclass(slots=True)
 class MarkPrice:
     timestamp: int  # In milliseconds
     symbol: str
     mark_price: float
 
 
-@dataclass
+@dataclass(slots=True)
 class AggregateTrade:
     timestamp: int  # In milliseconds
     symbol: str
     price: float
     volume: float
+
+
+@dataclass(slots=True)
+class LatestPrices:
+    # Times are in milliseconds, staying zero until the first update
+    trade_time: int = 0
+    last_price: float = 0.0
+    book_ticker_time: int = 0
+    best_bid_price: float = 0.0
+    best_ask_price: float = 0.0
+    mark_price_time: int = 0
+    mark_price: float = 0.0
+
+
+@dataclass
+class Candle:
+    timestamp: int  # Start of the moment in milliseconds
+    open_price: float
+    high_price: float
+    low_price: float
+    close_price: float
+    volume: float
+    trade_count: int
@@ -6,6 +6,7 @@ task_durations: dict[str, deque[float]] = {
     "add_book_tickers": deque(maxlen=1280),
     "add_mark_price": deque(maxlen=10),
     "add_aggregate_trades": deque(maxlen=1280),
+    "decode_stream_messages": deque(maxlen=1280),
     "collector_organize_data": deque(maxlen=60),
     "perform_transaction": deque(maxlen=360),
     "display_transaction_lines": deque(maxlen=20),
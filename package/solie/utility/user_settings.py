@@ -34,6 +34,7 @@ async def save_datapath(datapath: Path | None):
 class DataSettings(DataClassJsonMixin):
     asset_token: str
     target_symbols: list[str]
+    candle_cache_budget: int = 2**31  # In bytes, for candle data of saved years
 
 
 async def read_data_settings(datapath: Path) -> DataSettings | None:
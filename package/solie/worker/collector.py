@@ -1,14 +1,13 @@
 import asyncio
+import functools
 import logging
 import math
 import random
 import time
 import webbrowser
-from collections import deque
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 
 import aiofiles.os
-import numpy as np
 import pandas as pd
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from PySide6 import QtWidgets
@@ -17,22 +16,36 @@ from solie.common import go, outsource
 from solie.overlay import DonationGuide, DownloadFillOption
 from solie.utility import (
     AggregateTrade,
+    ApiMultiStreamer,
     ApiRequester,
-    ApiStreamer,
+    ArchiveDownloader,
     BookTicker,
+    CandleAssembler,
+    CandleBuilder,
+    CandleCache,
+    CandleJournal,
+    CandlePyramid,
+    CandleStore,
+    CoverageBitmap,
+    CoverageManifest,
     DownloadPreset,
+    LatestPrices,
     MarkPrice,
+    RingBuffer,
     RWLock,
     add_task_duration,
+    check_day_completeness,
     combine_candle_data,
+    convert_aggtrade_archive,
     create_empty_candle_data,
-    download_aggtrade_data,
+    decode_aggregate_trade,
+    decode_book_ticker,
+    decode_mark_prices,
     fill_holes_with_aggtrades,
+    find_coverage_origin,
     find_stop_flag,
-    format_numeric,
     internet_connected,
     make_stop_flag,
-    slice_deque,
     sort_data_frame,
     to_moment,
     when_internet_disconnected,
@@ -45,6 +58,14 @@ from .united import team
 logger = logging.getLogger(__name__)
 
 
+def find_book_ticker_stream(received: dict) -> str | None:
+    stream_name: str = received["stream"]
+    if stream_name.endswith("@bookTicker"):
+        return stream_name
+    else:
+        return None
+
+
 class Collector:
     def __init__(self, window: Window, scheduler: AsyncIOScheduler):
         # ■■■■■ for data management ■■■■■
@@ -61,6 +82,7 @@ class Collector:
         # ■■■■■ remember and display ■■■■■
 
         self.api_requester = ApiRequester()
+        self.archive_downloader = ArchiveDownloader(self.workerpath / "archives")
 
         self.aggtrade_candle_sizes: dict[str, int] = {}
         for symbol in window.data_settings.target_symbols:
@@ -73,9 +95,70 @@ class Collector:
             create_empty_candle_data(window.data_settings.target_symbols)
         )
 
-        # Realtime data
-        self.realtime_data = deque[BookTicker | MarkPrice]([], 2 ** (10 + 10 + 2))
-        self.aggregate_trades = deque[AggregateTrade]([], 2 ** (10 + 10))
+        # Which moments of candle data are filled, for each symbol.
+        # It's kept in sync whenever candle data is written.
+        self.candle_coverage = CoverageBitmap(
+            window.data_settings.target_symbols,
+            find_coverage_origin(datetime.now(timezone.utc)),
+        )
+
+        # Candle data aggregated into coarser levels for drawing.
+        self.candle_pyramid = CandlePyramid(window.data_settings.target_symbols)
+
+        # Candle data on the disk, partitioned by symbol and month.
+        # Each new candle is appended to the journal right away,
+        # and the journal is folded into the store when saving.
+        # Rows changed by other tasks are written from `unsaved_from`.
+        self.candle_store = CandleStore(self.workerpath / "candle_store")
+        self.candle_store_lock = asyncio.Lock()
+        self.candle_journal = CandleJournal(
+            self.workerpath,
+            window.data_settings.target_symbols,
+        )
+        self.candle_journal_lock = asyncio.Lock()
+        self.unsaved_from: datetime | None = None
+
+        # Days of candle data that are fully populated, for each symbol.
+        self.coverage_manifest = CoverageManifest()
+
+        # Candle data of saved years, kept after being read from the disk.
+        self.candle_cache = CandleCache(window.data_settings.candle_cache_budget)
+
+        # Ring buffers allocate all of their rows in advance,
+        # so each one holds only as many as its retention window needs,
+        # which is the message rate times the window length in seconds.
+        book_ticker_capacity = 10 * 60 * 60  # Coalesced, 10 per second for an hour
+        mark_price_capacity = 1 * 60 * 60 * 12  # 1 per second for 12 hours
+        aggregate_trade_capacity = 8 * 60 * 60  # 8 per second for an hour
+
+        # Book tickers and mark prices, stored separately by symbol.
+        self.book_tickers: dict[str, RingBuffer] = {}
+        self.mark_prices: dict[str, RingBuffer] = {}
+        for symbol in window.data_settings.target_symbols:
+            self.book_tickers[symbol] = RingBuffer(
+                book_ticker_capacity,
+                ("best_bid_price", "best_ask_price"),
+            )
+            self.mark_prices[symbol] = RingBuffer(
+                mark_price_capacity,
+                ("mark_price",),
+            )
+
+        # Aggregate trades, stored separately by symbol.
+        self.aggregate_trades: dict[str, RingBuffer] = {}
+        for symbol in window.data_settings.target_symbols:
+            self.aggregate_trades[symbol] = RingBuffer(
+                aggregate_trade_capacity,
+                ("price", "volume"),
+            )
+
+        # Latest prices of each symbol, updated as data arrives.
+        self.latest_prices: dict[str, LatestPrices] = {}
+        for symbol in window.data_settings.target_symbols:
+            self.latest_prices[symbol] = LatestPrices()
+
+        # Candles being built from the incoming aggregate trades.
+        self.candle_builder = CandleBuilder(window.data_settings.target_symbols)
 
         # ■■■■■ repetitive schedules ■■■■■
 
@@ -112,25 +195,32 @@ class Collector:
 
         # ■■■■■ websocket streamings ■■■■■
 
-        self.mark_price_streamer = ApiStreamer(
-            "wss://fstream.binance.com/ws/!markPrice@arr@1s",
-            self.add_mark_price,
+        # All market streams share as few connections as possible.
+        # Messages are handled in batches, keeping only the latest book ticker
+        # of each symbol when they pile up faster than they are handled.
+        market_stream_handlers = {}
+        market_stream_decoders = {}
+        stream_name = "!markPrice@arr@1s"
+        market_stream_handlers[stream_name] = self.add_mark_price
+        market_stream_decoders[stream_name] = functools.partial(
+            decode_mark_prices,
+            symbols=set(self.window.data_settings.target_symbols),
+        )
+        for symbol in self.window.data_settings.target_symbols:
+            stream_name = f"{symbol.lower()}@bookTicker"
+            market_stream_handlers[stream_name] = self.add_book_tickers
+            market_stream_decoders[stream_name] = decode_book_ticker
+            stream_name = f"{symbol.lower()}@aggTrade"
+            market_stream_handlers[stream_name] = self.add_aggregate_trades
+            market_stream_decoders[stream_name] = decode_aggregate_trade
+        self.market_streamer = ApiMultiStreamer(
+            "wss://fstream.binance.com",
+            market_stream_handlers,
+            batched=True,
+            overflow_policy="coalesce",
+            coalesce_key=find_book_ticker_stream,
+            decoders=market_stream_decoders,
         )
-
-        self.book_ticker_streamers = [
-            ApiStreamer(
-                f"wss://fstream.binance.com/ws/{s.lower()}@bookTicker",
-                self.add_book_tickers,
-            )
-            for s in self.window.data_settings.target_symbols
-        ]
-        self.aggtrade_streamers = [
-            ApiStreamer(
-                f"wss://fstream.binance.com/ws/{s.lower()}@aggTrade",
-                self.add_aggregate_trades,
-            )
-            for s in self.window.data_settings.target_symbols
-        ]
 
         # ■■■■■ invoked by the internet connection status change ■■■■■
 
@@ -150,6 +240,10 @@ class Collector:
         job = self.open_binance_data_page
         new_action = action_menu.addAction(text)
         outsource(new_action.triggered, job)
+        text = "Fill candle data only with downloaded archives"
+        job = self.refill_candle_data_offline
+        new_action = action_menu.addAction(text)
+        outsource(new_action.triggered, job)
         text = "Stop filling candle data"
         job = self.stop_filling_candle_data
         new_action = action_menu.addAction(text)
@@ -158,15 +252,56 @@ class Collector:
     async def load(self):
         await aiofiles.os.makedirs(self.workerpath, exist_ok=True)
 
+        # coverage manifest
+        filepath = self.workerpath / "coverage_manifest.json"
+        if await aiofiles.os.path.isfile(filepath):
+            async with aiofiles.open(filepath, "r", encoding="utf8") as file:
+                content = await file.read()
+                self.coverage_manifest = CoverageManifest.from_json(content)
+        else:
+            # Days already in the store are recorded once,
+            # so that they're not downloaded again.
+            for symbol in self.window.data_settings.target_symbols:
+                stored_days = await go(self.candle_store.complete_days, symbol)
+                for stored_day in stored_days:
+                    self.coverage_manifest.mark(symbol, stored_day, "store")
+            await self.save_coverage_manifest()
+
         # candle data
-        current_year = datetime.now(timezone.utc).year
+        current_time = datetime.now(timezone.utc)
+        current_year = current_time.year
+        year_start = datetime(current_year, 1, 1, tzinfo=timezone.utc)
         async with self.candle_data.write_lock as cell:
-            filepath = self.workerpath / f"candle_data_{current_year}.pickle"
-            if await aiofiles.os.path.isfile(filepath):
-                df: pd.DataFrame = await go(pd.read_pickle, filepath)
-                if not df.index.is_monotonic_increasing:
-                    df = await go(sort_data_frame, df)
+            df = await go(
+                self.candle_store.read,
+                self.window.data_settings.target_symbols,
+                year_start,
+                datetime(current_year + 1, 1, 1, tzinfo=timezone.utc),
+            )
+            # Replay the candles that were not folded into the store yet.
+            journal_df: pd.DataFrame = await go(self.candle_journal.read)
+            year_mask = journal_df.index.year == current_year  # type:ignore
+            if year_mask.sum() > 0:
+                df = await go(combine_candle_data, journal_df[year_mask], df)
+            if len(df) > 0:
                 cell.data = df
+            self.candle_coverage.rebuild(cell.data)
+            # Moments of the last year that the bitmap covers
+            # are only marked, without being kept in memory.
+            coverage_origin = find_coverage_origin(current_time)
+            if coverage_origin < year_start:
+                earlier_df = await go(
+                    self.candle_store.read,
+                    self.window.data_settings.target_symbols,
+                    coverage_origin,
+                    year_start,
+                )
+                if (~year_mask).sum() > 0:
+                    earlier_df = await go(
+                        combine_candle_data, journal_df[~year_mask], earlier_df
+                    )
+                self.candle_coverage.update(earlier_df)
+            await asyncio.to_thread(self.candle_pyramid.rebuild, cell.data)
 
     async def organize_data(self):
         start_time = time.perf_counter()
@@ -182,30 +317,79 @@ class Collector:
         duration = time.perf_counter() - start_time
         add_task_duration("collector_organize_data", duration)
 
+    def mark_unsaved(self, moment: datetime):
+        if self.unsaved_from is None or moment < self.unsaved_from:
+            self.unsaved_from = moment
+
     async def save_candle_data(self):
-        # ■■■■■ default values ■■■■■
+        # ■■■■■ fold the journal into the store ■■■■■
 
-        current_year = datetime.now(timezone.utc).year
-        filepath = self.workerpath / f"candle_data_{current_year}.pickle"
-        filepath_new = self.workerpath / f"candle_data_{current_year}.pickle.new"
-        filepath_backup = self.workerpath / f"candle_data_{current_year}.pickle.backup"
+        async with self.candle_journal_lock:
+            sealed_paths = self.candle_journal.seal()
 
-        async with self.candle_data.read_lock as cell:
-            mask = cell.data.index.year == current_year  # type:ignore
-            year_df: pd.DataFrame = cell.data[mask].copy()
+        async with self.candle_store_lock:
+            for sealed_path in sealed_paths:
+                await go(self.candle_journal.compact, sealed_path, self.candle_store)
 
-        # ■■■■■ make a new file ■■■■■
+        # ■■■■■ pick the rows changed after the last save ■■■■■
 
-        await go(year_df.to_pickle, filepath_new)
+        async with self.candle_data.read_lock as cell:
+            unsaved_from = self.unsaved_from
+            if unsaved_from is None:
+                unsaved_df = None
+            else:
+                mask = cell.data.index >= unsaved_from
+                unsaved_df = cell.data[mask].copy()
+                self.unsaved_from = None
+
+        # ■■■■■ write them in place ■■■■■
+
+        if unsaved_df is not None and unsaved_from is not None:
+            try:
+                async with self.candle_store_lock:
+                    await go(self.candle_store.write, unsaved_df)
+            except Exception:
+                # The rows are written again on the next save.
+                self.mark_unsaved(unsaved_from)
+                raise
+
+        # Writes through memory maps don't always update modification times.
+        current_year = datetime.now(timezone.utc).year
+        self.candle_cache.invalidate(current_year)
 
-        # ■■■■■ safely replace the existing file ■■■■■
+        # ■■■■■ record days fully populated in realtime ■■■■■
 
-        if await aiofiles.os.path.isfile(filepath_backup):
-            await aiofiles.os.remove(filepath_backup)
-        if await aiofiles.os.path.isfile(filepath):
-            await aiofiles.os.rename(filepath, filepath_backup)
-        if await aiofiles.os.path.isfile(filepath_new):
-            await aiofiles.os.rename(filepath_new, filepath)
+        today = to_moment(datetime.now(timezone.utc))
+        today = today.replace(hour=0, minute=0, second=0)
+        for days_ago in (1, 2):
+            day_start = today - timedelta(days=days_ago)
+            day_end = day_start + timedelta(days=1)
+            for symbol in self.window.data_settings.target_symbols:
+                if self.coverage_manifest.is_complete(symbol, day_start.date()):
+                    continue
+                covered_count = self.candle_coverage.covered_count(
+                    day_start,
+                    day_end,
+                    [symbol],
+                )
+                if covered_count == 6 * 60 * 24:
+                    self.coverage_manifest.mark(symbol, day_start.date(), "realtime")
+        await self.save_coverage_manifest()
+
+    async def save_coverage_manifest(self):
+        filepath = self.workerpath / "coverage_manifest.json"
+        async with aiofiles.open(filepath, "w", encoding="utf8") as file:
+            await file.write(self.coverage_manifest.to_json(indent=2))
+
+    def check_preset_covered(self, download_preset: DownloadPreset) -> bool:
+        symbol = download_preset.symbol
+        year = download_preset.year
+        month = download_preset.month
+        if download_preset.unit_size == "monthly":
+            return self.coverage_manifest.is_month_complete(symbol, year, month)
+        else:
+            day = date(year, month, download_preset.day)
+            return self.coverage_manifest.is_complete(symbol, day)
 
     async def get_exchange_information(self):
         if not internet_connected():
@@ -255,7 +439,6 @@ class Collector:
         did_fill = False
 
         target_symbols = self.window.data_settings.target_symbols
-        needed_moments = int((86400 - 60) / 10) + 1
         while len(full_symbols) < len(target_symbols) and request_count < 10:
             for symbol in target_symbols:
                 if symbol in full_symbols:
@@ -264,27 +447,17 @@ class Collector:
                 from_moment = current_moment - timedelta(hours=24)
                 until_moment = current_moment - timedelta(minutes=1)
 
-                inspect_df: pd.DataFrame = recent_candle_data[symbol][
-                    from_moment:until_moment
-                ]  # type:ignore
-                base_index = inspect_df.dropna().index
-                temp_sr = pd.Series(0, index=base_index)
-                written_moments = len(temp_sr)
+                moment_to_fill_from = self.candle_coverage.first_missing(
+                    symbol,
+                    from_moment,
+                    until_moment + timedelta(seconds=10),
+                )
 
-                if written_moments == needed_moments:
+                if moment_to_fill_from is None:
                     # case when there are no holes
                     full_symbols.add(symbol)
                     continue
 
-                if from_moment not in temp_sr.index:
-                    temp_sr[from_moment] = np.nan
-                if until_moment not in temp_sr.index:
-                    temp_sr[until_moment] = np.nan
-                temp_sr = await go(temp_sr.asfreq, "10S")
-                isnan_sr = await go(temp_sr.isna)
-                nan_index = isnan_sr[isnan_sr == 1].index  # type:ignore
-                moment_to_fill_from: datetime = nan_index[0]  # type:ignore
-
                 # request historical aggtrade data
                 aggtrades = {}
                 last_fetched_time = moment_to_fill_from
@@ -320,6 +493,9 @@ class Collector:
                     moment_to_fill_from,
                     last_fetched_time,
                 )
+                filled_candle_data = recent_candle_data[[symbol]]
+                filled_mask = filled_candle_data.index >= moment_to_fill_from
+                self.candle_coverage.update(filled_candle_data[filled_mask])
                 did_fill = True
 
         if not did_fill:
@@ -339,6 +515,11 @@ class Collector:
                 )
             candle_data = pd.concat([original_candle_data, recent_candle_data])
             cell.data = candle_data
+            self.candle_coverage.update(recent_candle_data)
+            await asyncio.to_thread(
+                self.candle_pyramid.rebuild, cell.data, split_moment
+            )
+            self.mark_unsaved(split_moment)
 
     async def display_status_information(self):
         async with self.candle_data.read_lock as cell:
@@ -352,16 +533,12 @@ class Collector:
 
         # price
         price_precisions = self.price_precisions
-        recent_aggregate_trades = slice_deque(self.aggregate_trades, 2 ** (10 + 6))
         for symbol in self.window.data_settings.target_symbols:
-            latest_price: float | None = None
-            for aggregate_trade in reversed(recent_aggregate_trades):
-                if aggregate_trade.symbol == symbol:
-                    latest_price = aggregate_trade.price
-                    break
-            if latest_price is None:
+            latest_prices = self.latest_prices[symbol]
+            if latest_prices.trade_time == 0:
                 text = "Unavailable"
             else:
+                latest_price = latest_prices.last_price
                 price_precision = price_precisions[symbol]
                 text = f"＄{latest_price:.{price_precision}f}"
             self.window.price_labels[symbol].setText(text)
@@ -371,13 +548,16 @@ class Collector:
             cumulation_rate = await self.check_candle_data_cumulation_rate()
             first_written_time = None
             last_written_time = None
-            realtime_data = self.realtime_data
-            if len(realtime_data) > 0:
-                if first_written_time is None:
-                    first_record = realtime_data[0]
-                    first_written_time = first_record.timestamp
-                last_record = realtime_data[-1]
-                last_written_time = last_record.timestamp
+            for book_tickers in self.book_tickers.values():
+                first_timestamp = book_tickers.first_timestamp()
+                last_timestamp = book_tickers.last_timestamp()
+                if first_timestamp is None or last_timestamp is None:
+                    continue
+                if first_written_time is None or first_timestamp < first_written_time:
+                    first_written_time = first_timestamp
+                if last_written_time is None or last_timestamp > last_written_time:
+                    last_written_time = last_timestamp
+            if first_written_time is not None and last_written_time is not None:
                 written_seconds = (last_written_time - first_written_time) / 10**3
             else:
                 written_seconds = 0.0
@@ -407,20 +587,17 @@ class Collector:
         count_end_moment = current_moment - timedelta(seconds=10)
         count_start_moment = count_end_moment - timedelta(hours=24)
 
-        # Pandas dataframe slicing uses inclusive end.
-        count_end_moment -= timedelta(seconds=1)
-
-        async with self.candle_data.read_lock as cell:
-            cumulated = len(cell.data[count_start_moment:count_end_moment].dropna())
-        needed_moments = 6 * 60 * 24
-        cumulation_rate = cumulated / needed_moments
+        cumulation_rate = self.candle_coverage.cumulation_rate(
+            count_start_moment,
+            count_end_moment,
+        )
 
         return cumulation_rate
 
     async def open_binance_data_page(self):
         await go(webbrowser.open, "https://www.binance.com/en/landing/data")
 
-    async def download_fill_candle_data(self):
+    async def download_fill_candle_data(self, offline: bool = False):
         # ■■■■■ ask filling type ■■■■■
 
         overlay_widget = await overlay(
@@ -503,6 +680,18 @@ class Collector:
                     ),
                 )
 
+        # Skip periods that are already fully populated,
+        # unless cached archives are meant to be converted again.
+        if not offline:
+            download_presets = [
+                p for p in download_presets if not self.check_preset_covered(p)
+            ]
+
+        if len(download_presets) == 0:
+            text = "Candle data is already complete in the chosen range"
+            logger.info(text)
+            return
+
         random.shuffle(download_presets)
 
         total_steps = len(download_presets)
@@ -548,49 +737,80 @@ class Collector:
             classified_download_presets[download_preset.year].append(download_preset)
 
         for preset_year, download_presets in classified_download_presets.items():
-            # Make an empty dataframe, but of same types with that of candle data.
-            async with self.candle_data.read_lock as cell:
-                combined_df = RWLock(cell.data.iloc[0:0].copy())
+            # Data of previous years goes straight into the preallocated partitions
+            # of the candle store, while data of current year is assembled
+            # into a preallocated array and made into a data frame only once.
+            if preset_year < current_year:
+                candle_assembler = None
+            else:
+                candle_assembler = CandleAssembler(
+                    target_symbols,
+                    datetime(preset_year, 1, 1, tzinfo=timezone.utc),
+                    datetime.now(timezone.utc),
+                )
+            # Days are recorded from what the archives actually contain.
+            archived_days: list[tuple[str, date, str]] = []
 
             async def download_fill(download_preset: DownloadPreset) -> None:
                 nonlocal done_steps
-                nonlocal combined_df
 
                 if find_stop_flag("download_fill_candle_data", task_id):
                     return
 
-                returned = await go(download_aggtrade_data, download_preset)
-                if returned is not None:
-                    new_df = returned
-                    async with combined_df.write_lock as cell:
-                        new = await go(combine_candle_data, new_df, cell.data)
-                        cell.data = new
+                archive_path = await self.archive_downloader.fetch(
+                    download_preset,
+                    offline,
+                )
+                if archive_path is not None:
+                    new_df = await go(
+                        convert_aggtrade_archive,
+                        download_preset.symbol,
+                        archive_path,
+                    )
+                else:
+                    new_df = None
+                if new_df is not None:
+                    if download_preset.unit_size == "monthly":
+                        archive_source = "monthly_archive"
+                    else:
+                        archive_source = "daily_archive"
+                    # Days with gaps in the archive won't get any better
+                    # by downloading it again.
+                    for symbol, day, is_complete in check_day_completeness(new_df):
+                        source = archive_source if is_complete else "partial_archive"
+                        archived_days.append((symbol, day, source))
+                    if candle_assembler is None:
+                        async with self.candle_store_lock:
+                            await go(self.candle_store.write, new_df)
+                    else:
+                        candle_assembler.add(new_df)
 
                 done_steps += 1
 
             tasks = [asyncio.create_task(download_fill(p)) for p in download_presets]
             await asyncio.wait(tasks)
 
-            if preset_year < current_year:
-                # For data of previous years,
-                # save them in the disk.
-                async with combined_df.read_lock as cell:
-                    await go(
-                        cell.data.to_pickle,
-                        self.workerpath / f"candle_data_{preset_year}.pickle",
-                    )
+            if candle_assembler is None:
+                self.candle_cache.invalidate(preset_year)
             else:
                 # For data of current year, pass it to this collector worker
                 # and store them in the memory.
-                async with combined_df.read_lock as cell:
-                    async with self.candle_data.write_lock as cell_worker:
-                        cell_worker.data = await go(
-                            combine_candle_data,
-                            cell.data,
-                            cell_worker.data,
+                year_df = candle_assembler.build()
+                async with self.candle_data.write_lock as cell:
+                    cell.data = await go(combine_candle_data, year_df, cell.data)
+                    self.candle_coverage.rebuild(cell.data)
+                    if len(year_df) > 0:
+                        await asyncio.to_thread(
+                            self.candle_pyramid.rebuild, cell.data, year_df.index[0]
                         )
+                        self.mark_unsaved(year_df.index[0])
                 await self.save_candle_data()
 
+            # Record the days only after their data is stored.
+            for symbol, day, source in archived_days:
+                self.coverage_manifest.mark(symbol, day, source)
+            await self.save_coverage_manifest()
+
         # ■■■■■ add to log ■■■■■
 
         text = "Filled the candle data with the history data downloaded from Binance"
@@ -602,61 +822,67 @@ class Collector:
         asyncio.create_task(team.simulator.display_lines())
         asyncio.create_task(team.simulator.display_available_years())
 
-    async def add_book_tickers(self, received: dict):
+    async def add_book_tickers(self, received: list[BookTicker]):
         start_time = time.perf_counter()
-        symbol = received["s"]
-        best_bid = float(received["b"])
-        best_ask = float(received["a"])
-        event_time = received["E"]  # In milliseconds
-
-        book_ticker = BookTicker(
-            timestamp=event_time,
-            symbol=symbol,
-            best_bid_price=best_bid,
-            best_ask_price=best_ask,
-        )
-        self.realtime_data.append(book_ticker)
-
+        for book_ticker in received:
+            symbol = book_ticker.symbol
+            if symbol not in self.book_tickers:
+                continue
+            self.book_tickers[symbol].append(
+                book_ticker.timestamp,
+                book_ticker.best_bid_price,
+                book_ticker.best_ask_price,
+            )
+            latest_prices = self.latest_prices[symbol]
+            if book_ticker.timestamp >= latest_prices.book_ticker_time:
+                latest_prices.book_ticker_time = book_ticker.timestamp
+                latest_prices.best_bid_price = book_ticker.best_bid_price
+                latest_prices.best_ask_price = book_ticker.best_ask_price
         duration = time.perf_counter() - start_time
         add_task_duration("add_book_tickers", duration)
 
-    async def add_mark_price(self, received: list):
+    async def add_mark_price(self, received: list[list[MarkPrice]]):
         start_time = time.perf_counter()
-        target_symbols = self.window.data_settings.target_symbols
-        event_time = received[0]["E"]  # In milliseconds
-        for about_mark_price in received:
-            symbol = about_mark_price["s"]
-            if symbol in target_symbols:
-                mark_price = float(about_mark_price["p"])
-                mark_price = MarkPrice(
-                    timestamp=event_time,
-                    symbol=symbol,
-                    mark_price=mark_price,
+        for mark_prices in received:
+            for mark_price in mark_prices:
+                symbol = mark_price.symbol
+                if symbol not in self.mark_prices:
+                    continue
+                self.mark_prices[symbol].append(
+                    mark_price.timestamp,
+                    mark_price.mark_price,
                 )
-                self.realtime_data.append(mark_price)
+                latest_prices = self.latest_prices[symbol]
+                if mark_price.timestamp >= latest_prices.mark_price_time:
+                    latest_prices.mark_price_time = mark_price.timestamp
+                    latest_prices.mark_price = mark_price.mark_price
         duration = time.perf_counter() - start_time
         add_task_duration("add_mark_price", duration)
 
-    async def add_aggregate_trades(self, received: dict):
+    async def add_aggregate_trades(self, received: list[AggregateTrade]):
         start_time = time.perf_counter()
-        symbol = received["s"]
-        price = float(received["p"])
-        volume = float(received["q"])
-        trade_time = received["T"]  # In milliseconds
-
-        aggregate_trade = AggregateTrade(
-            timestamp=trade_time,
-            symbol=symbol,
-            price=price,
-            volume=volume,
-        )
-        self.aggregate_trades.append(aggregate_trade)
+        for aggregate_trade in received:
+            symbol = aggregate_trade.symbol
+            trade_time = aggregate_trade.timestamp  # In milliseconds
+            price = aggregate_trade.price
+            volume = aggregate_trade.volume
+
+            self.aggregate_trades[symbol].append(trade_time, price, volume)
+            self.candle_builder.add_trade(symbol, trade_time, price, volume)
+
+            latest_prices = self.latest_prices[symbol]
+            if trade_time >= latest_prices.trade_time:
+                latest_prices.trade_time = trade_time
+                latest_prices.last_price = price
 
         duration = time.perf_counter() - start_time
         add_task_duration("add_aggregate_trades", duration)
 
     async def clear_aggregate_trades(self):
-        self.realtime_data.clear()
+        for book_tickers in self.book_tickers.values():
+            book_tickers.clear()
+        for mark_prices in self.mark_prices.values():
+            mark_prices.clear()
 
     async def add_candle_data(self):
         start_time = time.perf_counter()
@@ -665,49 +891,35 @@ class Collector:
         current_moment = to_moment(datetime.now(timezone.utc))
         before_moment = current_moment - timedelta(seconds=10.0)
         collect_from = int(before_moment.timestamp()) * 1000
-        collect_to = int(current_moment.timestamp()) * 1000
-        aggregate_trades = self.aggregate_trades
 
         # Ensure that the data have been watched for long enough.
-        first_received_index = aggregate_trades[0].timestamp
-        if collect_from <= first_received_index:
+        first_received_index = self.candle_builder.first_timestamp
+        if first_received_index is None or collect_from <= first_received_index:
             return
 
-        # Collect trades that should be included in the candle.
-        collected_aggregate_trades: list[AggregateTrade] = []
-        for aggregate_trade in reversed(aggregate_trades):
-            if aggregate_trade.timestamp < collect_from - 1000:
-                # Go additional 1000 millliseconds backward.
-                break
-            collected_aggregate_trades.append(aggregate_trade)
-        if len(collected_aggregate_trades) == 0:
+        # Seal the candles that were built while trades were coming in.
+        sealed_candles = self.candle_builder.seal(collect_from)
+        if all(c is None for c in sealed_candles.values()):
             return
-        collected_aggregate_trades.reverse()  # Sort by time
-        collected_aggregate_trades = [
-            t
-            for t in collected_aggregate_trades
-            if collect_from < t.timestamp < collect_to
-        ]
 
         new_values = {}
         for symbol in self.window.data_settings.target_symbols:
-            symbol_aggregate_trades = [
-                t for t in collected_aggregate_trades if t.symbol == symbol
-            ]
-            self.aggtrade_candle_sizes[symbol] = len(symbol_aggregate_trades)
-
-            if len(symbol_aggregate_trades) > 0:
-                open_price = symbol_aggregate_trades[0].price
-                high_price = max([t.price for t in symbol_aggregate_trades])
-                low_price = min([t.price for t in symbol_aggregate_trades])
-                close_price = symbol_aggregate_trades[-1].price
-                sum_volume = sum([t.volume for t in symbol_aggregate_trades])
+            candle = sealed_candles[symbol]
+
+            if candle is not None:
+                self.aggtrade_candle_sizes[symbol] = candle.trade_count
+                open_price = candle.open_price
+                high_price = candle.high_price
+                low_price = candle.low_price
+                close_price = candle.close_price
+                sum_volume = candle.volume
             else:
                 async with self.candle_data.read_lock as cell:
                     inspect_sr = cell.data.iloc[-60:][(symbol, "Close")].copy()
                 inspect_sr = inspect_sr.dropna()
                 if len(inspect_sr) == 0:
                     return
+                self.aggtrade_candle_sizes[symbol] = 0
                 last_price = inspect_sr.tolist()[-1]
                 open_price = last_price
                 high_price = last_price
@@ -722,14 +934,24 @@ class Collector:
             new_values[(symbol, "Volume")] = sum_volume
 
         async with self.candle_data.write_lock as cell:
-            for column_name, new_data_value in new_values.items():
-                cell.data.loc[before_moment, column_name] = new_data_value
+            column_names = list(new_values.keys())
+            cell.data.loc[before_moment, column_names] = list(new_values.values())
             if not cell.data.index.is_monotonic_increasing:
                 cell.data = await go(sort_data_frame, cell.data)
+            for symbol in self.window.data_settings.target_symbols:
+                self.candle_coverage.mark(symbol, before_moment)
+            self.candle_pyramid.add(before_moment, list(new_values.values()))
+
+        async with self.candle_journal_lock:
+            await self.candle_journal.append(before_moment, list(new_values.values()))
 
         duration = time.perf_counter() - start_time
         add_task_duration("add_candle_data", duration)
 
+    async def refill_candle_data_offline(self):
+        # Archives downloaded before are converted again without the internet.
+        await self.download_fill_candle_data(offline=True)
+
     async def stop_filling_candle_data(self):
         make_stop_flag("download_fill_candle_data")
 
@@ -740,14 +962,64 @@ class Collector:
         )
 
     async def check_saved_years(self) -> list[int]:
-        years = [
-            int(format_numeric(filename))
-            for filename in await aiofiles.os.listdir(self.workerpath)
-            if filename.startswith("candle_data_") and filename.endswith(".pickle")
-        ]
+        years: list[int] = await go(self.candle_store.years)
         return years
 
-    async def read_saved_candle_data(self, year: int) -> pd.DataFrame:
-        filepath = self.workerpath / f"candle_data_{year}.pickle"
-        candle_data: pd.DataFrame = await go(pd.read_pickle, filepath)
+    async def read_saved_candle_data(
+        self, year: int, symbols: list[str] | None = None
+    ) -> pd.DataFrame:
+        # Partitions are memory-mapped in this process,
+        # so the data doesn't go through the process pool's pipe.
+        # A thread is used only to keep the event loop responsive.
+        if symbols is None:
+            symbols = self.window.data_settings.target_symbols
+
+        signature = await asyncio.to_thread(
+            self.candle_store.signature,
+            symbols,
+            year,
+        )
+        cache_key = (year, tuple(symbols), signature)
+        candle_data = self.candle_cache.get(cache_key)
+        if isinstance(candle_data, pd.DataFrame):
+            return candle_data
+
+        candle_data = await asyncio.to_thread(
+            self.candle_store.read,
+            symbols,
+            datetime(year, 1, 1, tzinfo=timezone.utc),
+            datetime(year + 1, 1, 1, tzinfo=timezone.utc),
+        )
+        self.candle_cache.put(cache_key, candle_data)
         return candle_data
+
+    async def read_candle_pyramid(
+        self, year: int, symbols: list[str] | None = None
+    ) -> CandlePyramid:
+        """
+        Returns candle data of the year aggregated into coarser levels.
+        The pyramid of the current year is the one kept up to date here,
+        which should be queried while holding the read lock of candle data.
+        """
+
+        if symbols is None:
+            symbols = self.window.data_settings.target_symbols
+
+        if year == datetime.now(timezone.utc).year:
+            return self.candle_pyramid
+
+        signature = await asyncio.to_thread(
+            self.candle_store.signature,
+            symbols,
+            year,
+        )
+        cache_key = (year, tuple(symbols), signature, "pyramid")
+        candle_pyramid = self.candle_cache.get(cache_key)
+        if isinstance(candle_pyramid, CandlePyramid):
+            return candle_pyramid
+
+        candle_data = await self.read_saved_candle_data(year, symbols)
+        candle_pyramid = CandlePyramid(symbols)
+        await asyncio.to_thread(candle_pyramid.rebuild, candle_data)
+        self.candle_cache.put(cache_key, candle_pyramid)
+        return candle_pyramid
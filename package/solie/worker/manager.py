@@ -195,8 +195,19 @@ class Manager:
             async with team.collector.candle_data.read_lock as cell:
                 candle_data_len = len(cell.data)
             texts.append(f"candle_data {candle_data_len}")
-            texts.append(f"realtime_data {len(team.collector.realtime_data)}")
-            texts.append(f"aggregate_trades {len(team.collector.aggregate_trades)}")
+            book_tickers_len = sum(len(b) for b in team.collector.book_tickers.values())
+            texts.append(f"book_tickers {book_tickers_len}")
+            mark_prices_len = sum(len(b) for b in team.collector.mark_prices.values())
+            texts.append(f"mark_prices {mark_prices_len}")
+            aggregate_trades_len = sum(
+                len(b) for b in team.collector.aggregate_trades.values()
+            )
+            texts.append(f"aggregate_trades {aggregate_trades_len}")
+            candle_cache = team.collector.candle_cache
+            text = f"candle_cache {len(candle_cache)}"
+            text += f" ({candle_cache.memory_usage / 2**20:.1f}MB)"
+            text += f" hit {candle_cache.hit_count} miss {candle_cache.miss_count}"
+            texts.append(text)
             text = "\n".join(texts)
             self.window.label_34.setText(text)
 
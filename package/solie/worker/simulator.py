@@ -14,20 +14,23 @@ from scipy.signal import find_peaks
 
 from solie.common import get_sync_manager, go, outsource
 from solie.utility import (
-    BookTicker,
+    PYRAMID_LEVELS,
     CalculationInput,
-    MarkPrice,
+    CandlePyramid,
     RWLock,
     SimulationSettings,
     SimulationSummary,
+    choose_pyramid_level,
     create_empty_account_state,
     create_empty_asset_record,
+    create_empty_candle_data,
     create_empty_unrealized_changes,
+    decimate_points,
     find_stop_flag,
+    make_candle_points,
     make_indicators,
     make_stop_flag,
     simulate_chunk,
-    slice_deque,
     sort_data_frame,
     sort_series,
     to_moment,
@@ -48,6 +51,13 @@ class Simulator:
 
         # ■■■■■ internal memory ■■■■■
 
+        # Full points of the last drawing,
+        # reduced to the visible range whenever the view changes
+        self.drawn_symbol = window.data_settings.target_symbols[0]
+        self.drawn_candle_data = create_empty_candle_data([self.drawn_symbol])
+        self.candle_pyramids: list[CandlePyramid] = []
+        self.heavy_points: dict[str, list[tuple[np.ndarray, np.ndarray]]] = {}
+
         # ■■■■■ remember and display ■■■■■
 
         self.viewing_symbol = window.data_settings.target_symbols[0]
@@ -96,6 +106,8 @@ class Simulator:
         outsource(window.plot_widget_2.sigRangeChanged, job)
         job = self.set_minimum_view_range
         outsource(window.plot_widget_2.sigRangeChanged, job)
+        job = self.display_visible_lines
+        outsource(window.plot_widget_2.sigRangeChanged, job)
         job = self.update_calculation_settings
         outsource(window.comboBox.currentIndexChanged, job)
         job = self.calculate
@@ -225,19 +237,19 @@ class Simulator:
 
         # ■■■■■ get light data ■■■■■
 
-        realtime_data = slice_deque(team.collector.realtime_data, 2 ** (10 + 6))
-        aggregate_trades = slice_deque(team.collector.aggregate_trades, 2 ** (10 + 6))
+        book_ticker_buffer = team.collector.book_tickers[symbol]
+        book_tickers = book_ticker_buffer.latest(book_ticker_buffer.capacity)
+        mark_price_buffer = team.collector.mark_prices[symbol]
+        mark_prices = mark_price_buffer.latest(mark_price_buffer.capacity)
+        aggregate_trades = team.collector.aggregate_trades[symbol]
+        recent_trades = aggregate_trades.latest(aggregate_trades.capacity)
 
         # ■■■■■ draw light lines ■■■■■
 
         # mark price
-        mark_prices = [
-            d
-            for d in realtime_data
-            if isinstance(d, MarkPrice) and d.symbol == symbol and d.mark_price > 0.0
-        ]
-        data_y = [d.mark_price for d in mark_prices]
-        data_x = [d.timestamp / 10**3 for d in mark_prices]
+        mask = mark_prices["mark_price"] > 0.0
+        data_y = mark_prices["mark_price"][mask]
+        data_x = mark_prices["timestamp"][mask] / 10**3
         widget = self.window.simulation_lines["mark_price"][0]
         widget.setData(data_x, data_y)
         if find_stop_flag(task_name, task_id):
@@ -245,11 +257,10 @@ class Simulator:
         await asyncio.sleep(0)
 
         # last price and volume
-        filtered = [t for t in aggregate_trades if t.symbol == symbol]
-        timestamps = [t.timestamp / 10**3 for t in filtered]
+        timestamps = recent_trades["timestamp"] / 10**3
 
         data_x = timestamps.copy()
-        data_y = [t.price for t in filtered]
+        data_y = recent_trades["price"].copy()
         widget = self.window.simulation_lines["last_price"][0]
         widget.setData(data_x, data_y)
         if find_stop_flag(task_name, task_id):
@@ -257,8 +268,8 @@ class Simulator:
         await asyncio.sleep(0)
 
         # last trade volume
-        index_ar = np.array(timestamps)
-        value_ar = np.array([t.volume for t in filtered])
+        index_ar = timestamps
+        value_ar = recent_trades["volume"].copy()
         mask = value_ar != 0
         index_ar = index_ar[mask]
         value_ar = value_ar[mask]
@@ -275,19 +286,16 @@ class Simulator:
         await asyncio.sleep(0)
 
         # book tickers
-        book_tickers = [
-            d for d in realtime_data if isinstance(d, BookTicker) and d.symbol == symbol
-        ]
-        data_x = [d.timestamp / 10**3 for d in book_tickers]
+        data_x = book_tickers["timestamp"] / 10**3
 
-        data_y = [d.best_bid_price for d in book_tickers]
+        data_y = book_tickers["best_bid_price"].copy()
         widget = self.window.simulation_lines["book_tickers"][0]
         widget.setData(data_x, data_y)
         if find_stop_flag(task_name, task_id):
             return
         await asyncio.sleep(0)
 
-        data_y = [d.best_ask_price for d in book_tickers]
+        data_y = book_tickers["best_ask_price"].copy()
         widget = self.window.simulation_lines["book_tickers"][1]
         widget.setData(data_x, data_y)
         if find_stop_flag(task_name, task_id):
@@ -338,11 +346,18 @@ class Simulator:
 
         divided_datas: list[pd.DataFrame] = []
         for year in years:
-            more_df = await team.collector.read_saved_candle_data(year)
+            more_df = await team.collector.read_saved_candle_data(year, [symbol])
             divided_datas.append(more_df)
-        candle_data_original: pd.DataFrame = await go(pd.concat, divided_datas)
+        # Years are joined in this process,
+        # so that they don't go through the process pool's pipe.
+        if len(divided_datas) == 1:
+            candle_data_original = divided_datas[0]
+        else:
+            candle_data_original = await asyncio.to_thread(pd.concat, divided_datas)
         if not candle_data_original.index.is_monotonic_increasing:
-            candle_data_original = await go(sort_data_frame, candle_data_original)
+            candle_data_original = await asyncio.to_thread(
+                sort_data_frame, candle_data_original
+            )
         async with self.unrealized_changes.read_lock as cell:
             unrealized_changes = cell.data.copy()
         async with self.asset_record.read_lock as cell:
@@ -388,150 +403,24 @@ class Simulator:
 
         # ■■■■■ draw heavy lines ■■■■■
 
-        # price movement
-        index_ar = candle_data.index.to_numpy(dtype=np.int64) / 10**9
-        open_ar = candle_data[(symbol, "Open")].to_numpy()
-        close_ar = candle_data[(symbol, "Close")].to_numpy()
-        high_ar = candle_data[(symbol, "High")].to_numpy()
-        low_ar = candle_data[(symbol, "Low")].to_numpy()
-        rise_ar = close_ar > open_ar
-        fall_ar = close_ar < open_ar
-        stay_ar = close_ar == open_ar
-        length = len(index_ar)
-        nan_ar = np.empty(length)
-        nan_ar[:] = np.nan
-
-        data_x = np.stack(
-            [
-                index_ar[rise_ar] + 2,
-                index_ar[rise_ar] + 5,
-                index_ar[rise_ar],
-                index_ar[rise_ar] + 5,
-                index_ar[rise_ar] + 8,
-                index_ar[rise_ar],
-                index_ar[rise_ar] + 5,
-                index_ar[rise_ar] + 5,
-                index_ar[rise_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        data_y = np.stack(
-            [
-                open_ar[rise_ar],
-                open_ar[rise_ar],
-                nan_ar[rise_ar],
-                close_ar[rise_ar],
-                close_ar[rise_ar],
-                nan_ar[rise_ar],
-                high_ar[rise_ar],
-                low_ar[rise_ar],
-                nan_ar[rise_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        widget = self.window.simulation_lines["price_rise"][0]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
-
-        data_x = np.stack(
-            [
-                index_ar[fall_ar] + 2,
-                index_ar[fall_ar] + 5,
-                index_ar[fall_ar],
-                index_ar[fall_ar] + 5,
-                index_ar[fall_ar] + 8,
-                index_ar[fall_ar],
-                index_ar[fall_ar] + 5,
-                index_ar[fall_ar] + 5,
-                index_ar[fall_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        data_y = np.stack(
-            [
-                open_ar[fall_ar],
-                open_ar[fall_ar],
-                nan_ar[fall_ar],
-                close_ar[fall_ar],
-                close_ar[fall_ar],
-                nan_ar[fall_ar],
-                high_ar[fall_ar],
-                low_ar[fall_ar],
-                nan_ar[fall_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        widget = self.window.simulation_lines["price_fall"][0]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
-
-        data_x = np.stack(
-            [
-                index_ar[stay_ar] + 2,
-                index_ar[stay_ar] + 5,
-                index_ar[stay_ar],
-                index_ar[stay_ar] + 5,
-                index_ar[stay_ar] + 8,
-                index_ar[stay_ar],
-                index_ar[stay_ar] + 5,
-                index_ar[stay_ar] + 5,
-                index_ar[stay_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        data_y = np.stack(
-            [
-                open_ar[stay_ar],
-                open_ar[stay_ar],
-                nan_ar[stay_ar],
-                close_ar[stay_ar],
-                close_ar[stay_ar],
-                nan_ar[stay_ar],
-                high_ar[stay_ar],
-                low_ar[stay_ar],
-                nan_ar[stay_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        widget = self.window.simulation_lines["price_stay"][0]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
-
-        # wobbles
-        sr = candle_data[(symbol, "High")]
-        data_x = sr.index.to_numpy(dtype=np.int64) / 10**9
-        data_y = sr.to_numpy(dtype=np.float32)
-        widget = self.window.simulation_lines["wobbles"][0]
-        widget.setData(data_x, data_y)
+        # price movement, wobbles and trade volume
+        # Coarser candles come from the pyramids that the collector keeps.
+        candle_pyramids: list[CandlePyramid] = []
+        for year in years:
+            candle_pyramid = await team.collector.read_candle_pyramid(year, [symbol])
+            candle_pyramids.append(candle_pyramid)
         if find_stop_flag(task_name, task_id):
             return
-        await asyncio.sleep(0)
 
-        sr = candle_data[(symbol, "Low")]
-        data_x = sr.index.to_numpy(dtype=np.int64) / 10**9
-        data_y = sr.to_numpy(dtype=np.float32)
-        widget = self.window.simulation_lines["wobbles"][1]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
+        heavy_points: dict[str, list[tuple[np.ndarray, np.ndarray]]] = {}
 
-        # trade volume
-        sr = candle_data[(symbol, "Volume")]
-        sr = sr.fillna(value=0)
-        data_x = sr.index.to_numpy(dtype=np.int64) / 10**9
-        data_y = sr.to_numpy(dtype=np.float32)
-        widget = self.window.simulation_lines["volume"][0]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
+        index_ar = candle_data.index.to_numpy(dtype=np.int64) / 10**9
+        heavy_points["wobbles"] = [
+            (index_ar, candle_data[(symbol, "High")].to_numpy(dtype=np.float32)),
+            (index_ar, candle_data[(symbol, "Low")].to_numpy(dtype=np.float32)),
+        ]
+        sr = candle_data[(symbol, "Volume")].fillna(value=0)
+        heavy_points["volume"] = [(index_ar, sr.to_numpy(dtype=np.float32))]
 
         # asset
         data_x = asset_record["Result Asset"].index.to_numpy(dtype=np.int64) / 10**9
@@ -550,11 +439,7 @@ class Simulator:
         sr = sr * (1 + unrealized_changes_sr)
         data_x = sr.index.to_numpy(dtype=np.int64) / 10**9 + 5
         data_y = sr.to_numpy(dtype=np.float32)
-        widget = self.window.simulation_lines["asset_with_unrealized_profit"][0]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
+        heavy_points["asset_with_unrealized_profit"] = [(data_x, data_y)]
 
         # buy and sell
         df = asset_record.loc[asset_record["Symbol"] == symbol]
@@ -602,7 +487,9 @@ class Simulator:
         df = indicators[symbol]["Price"]
         data_x = df.index.to_numpy(dtype=np.int64) / 10**9
         data_x += 5
-        line_list = self.window.simulation_lines["price_indicators"]
+        line_name = "price_indicators"
+        line_list = self.window.simulation_lines[line_name]
+        heavy_points[line_name] = []
         for turn, widget in enumerate(line_list):
             if turn < len(df.columns):
                 column_name = df.columns[turn]
@@ -614,10 +501,7 @@ class Simulator:
                 else:
                     color = inside_strings[0]
                 widget.setPen(color)
-                widget.setData(data_x, data_y)
-                if find_stop_flag(task_name, task_id):
-                    return
-                await asyncio.sleep(0)
+                heavy_points[line_name].append((data_x, data_y))
             else:
                 if find_stop_flag(task_name, task_id):
                     return
@@ -627,7 +511,9 @@ class Simulator:
         df = indicators[symbol]["Volume"]
         data_x = df.index.to_numpy(dtype=np.int64) / 10**9
         data_x += 5
-        line_list = self.window.simulation_lines["volume_indicators"]
+        line_name = "volume_indicators"
+        line_list = self.window.simulation_lines[line_name]
+        heavy_points[line_name] = []
         for turn, widget in enumerate(line_list):
             if turn < len(df.columns):
                 column_name = df.columns[turn]
@@ -639,10 +525,7 @@ class Simulator:
                 else:
                     color = inside_strings[0]
                 widget.setPen(color)
-                widget.setData(data_x, data_y)
-                if find_stop_flag(task_name, task_id):
-                    return
-                await asyncio.sleep(0)
+                heavy_points[line_name].append((data_x, data_y))
             else:
                 if find_stop_flag(task_name, task_id):
                     return
@@ -652,7 +535,9 @@ class Simulator:
         df = indicators[symbol]["Abstract"]
         data_x = df.index.to_numpy(dtype=np.int64) / 10**9
         data_x += 5
-        line_list = self.window.simulation_lines["abstract_indicators"]
+        line_name = "abstract_indicators"
+        line_list = self.window.simulation_lines[line_name]
+        heavy_points[line_name] = []
         for turn, widget in enumerate(line_list):
             if turn < len(df.columns):
                 column_name = df.columns[turn]
@@ -664,19 +549,97 @@ class Simulator:
                 else:
                     color = inside_strings[0]
                 widget.setPen(color)
-                widget.setData(data_x, data_y)
-                if find_stop_flag(task_name, task_id):
-                    return
-                await asyncio.sleep(0)
+                heavy_points[line_name].append((data_x, data_y))
             else:
                 if find_stop_flag(task_name, task_id):
                     return
                 widget.clear()
 
+        # ■■■■■ draw heavy lines within the view ■■■■■
+
+        self.drawn_symbol = symbol
+        self.drawn_candle_data = candle_data
+        self.candle_pyramids = candle_pyramids
+        self.heavy_points = heavy_points
+
+        await self.display_visible_lines()
+
         # ■■■■■ set minimum view range ■■■■■
 
         await self.set_minimum_view_range()
 
+    async def display_visible_lines(self):
+        task_name = "display_simulation_visible_lines"
+
+        task_id = make_stop_flag(task_name)
+
+        # ■■■■■ check the view ■■■■■
+
+        widget = self.window.plot_widget_2
+        range_start, range_end = widget.getAxis("bottom").range
+        pixel_width = int(widget.plotItem.vb.width())  # type:ignore
+        if range_end <= range_start or pixel_width <= 0:
+            return
+
+        view_start = datetime.fromtimestamp(max(range_start, 0.0), tz=timezone.utc)
+        view_end = datetime.fromtimestamp(max(range_end, 0.0), tz=timezone.utc)
+
+        # ■■■■■ draw candles ■■■■■
+
+        # Longer candles are drawn when 10-second ones can't fit in pixels.
+        symbol = self.drawn_symbol
+        level_name = choose_pyramid_level(view_start, view_end, pixel_width)
+        if level_name == "10s":
+            candle_seconds = 10
+            margin = timedelta(seconds=candle_seconds)
+            candle_data = self.drawn_candle_data[
+                view_start - margin : view_end + margin
+            ]
+        else:
+            candle_seconds = PYRAMID_LEVELS[level_name]
+            margin = timedelta(seconds=candle_seconds)
+            divided_datas: list[pd.DataFrame] = []
+            async with team.collector.candle_data.read_lock:
+                for candle_pyramid in self.candle_pyramids:
+                    more_df = candle_pyramid.query(
+                        level_name, view_start - margin, view_end + margin, [symbol]
+                    )
+                    if len(more_df) > 0:
+                        divided_datas.append(more_df)
+            if len(divided_datas) == 0:
+                candle_data = self.drawn_candle_data.iloc[:0]
+            else:
+                candle_data = pd.concat(divided_datas)
+
+        candle_points = make_candle_points(
+            candle_data.index.to_numpy(dtype=np.int64) / 10**9,
+            candle_data[(symbol, "Open")].to_numpy(),
+            candle_data[(symbol, "High")].to_numpy(),
+            candle_data[(symbol, "Low")].to_numpy(),
+            candle_data[(symbol, "Close")].to_numpy(),
+            candle_seconds,
+        )
+        for name, (data_x, data_y) in candle_points.items():
+            widget = self.window.simulation_lines[f"price_{name}"][0]
+            widget.setData(data_x, data_y)
+            if find_stop_flag(task_name, task_id):
+                return
+            await asyncio.sleep(0)
+
+        # ■■■■■ draw other heavy lines ■■■■■
+
+        # Each line is reduced to the minimum and maximum of every pixel.
+        for line_name, line_points in self.heavy_points.items():
+            line_list = self.window.simulation_lines[line_name]
+            for widget, (data_x, data_y) in zip(line_list, line_points):
+                data_x, data_y = decimate_points(
+                    data_x, data_y, range_start, range_end, pixel_width
+                )
+                widget.setData(data_x, data_y)
+                if find_stop_flag(task_name, task_id):
+                    return
+                await asyncio.sleep(0)
+
     async def erase(self):
         self.raw_account_state = create_empty_account_state(
             self.window.data_settings.target_symbols
@@ -987,6 +950,7 @@ class Simulator:
 
         if should_calculate:
             decision_script = strategy.decision_script
+            signals_script = strategy.signals_script
             indicators_script = strategy.indicators_script
 
             # a little more data for generation
@@ -1046,6 +1010,7 @@ class Simulator:
                         chunk_account_state=chunk_account_state,
                         chunk_virtual_state=chunk_virtual_state,
                         decision_script=decision_script,
+                        signals_script=signals_script,
                     )
                     calculation_inputs.append(calculation_input)
 
@@ -1063,6 +1028,7 @@ class Simulator:
                     chunk_account_state=previous_account_state,
                     chunk_virtual_state=previous_virtual_state,
                     decision_script=decision_script,
+                    signals_script=signals_script,
                 )
                 calculation_inputs.append(calculation_input)
 
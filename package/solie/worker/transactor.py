@@ -18,15 +18,17 @@ from PySide6 import QtWidgets
 from solie.common import go, outsource
 from solie.overlay import LongTextView
 from solie.utility import (
+    PYRAMID_LEVELS,
     ApiRequester,
     ApiRequestError,
     ApiStreamer,
-    BookTicker,
-    MarkPrice,
+    LineBuffer,
+    RecordKeyAllocator,
     RWLock,
     TransactionSettings,
     add_task_duration,
     ball_ceil,
+    choose_pyramid_level,
     create_empty_account_state,
     create_empty_asset_record,
     create_empty_unrealized_changes,
@@ -34,9 +36,9 @@ from solie.utility import (
     find_stop_flag,
     internet_connected,
     list_to_dict,
+    make_candle_points,
     make_indicators,
     make_stop_flag,
-    slice_deque,
     sort_data_frame,
     sort_series,
     to_moment,
@@ -69,6 +71,15 @@ class Transactor:
         self.leverages: dict[str, int] = {}  # Symbol and value
         self.is_key_restrictions_satisfied = True
 
+        # Points of heavy lines, which grow in place while watching live
+        self.line_buffers: dict[tuple[str, int], LineBuffer] = {}
+        self.drawing_key: tuple[str, int, bool, str] | None = None
+        self.drawn_from = datetime.fromtimestamp(0, tz=timezone.utc)
+        self.drawn_until: datetime | None = None
+        self.drawn_observed_until = datetime.fromtimestamp(0, tz=timezone.utc)
+        self.drawn_asset_record_length = 0
+        self.drawn_indicator_columns: list | None = None
+
         # ■■■■■ remember and display ■■■■■
 
         self.api_requester = ApiRequester()
@@ -94,6 +105,10 @@ class Transactor:
             )
         )
 
+        # New record keys are issued in order, instead of being searched.
+        self.asset_record_keys = RecordKeyAllocator()
+        self.auto_order_record_keys = RecordKeyAllocator()
+
         # ■■■■■ repetitive schedules ■■■■■
 
         self.scheduler.add_job(
@@ -554,9 +569,8 @@ class Transactor:
                         new_value = last_asset + added_revenue
                         cell.data.loc[last_index, "Result Asset"] = new_value
                     else:
-                        record_time = event_time
-                        while record_time in cell.data.index:
-                            record_time += timedelta(milliseconds=1)
+                        self.asset_record_keys.observe(last_index)
+                        record_time = self.asset_record_keys.allocate(event_time)
                         new_value = symbol
                         cell.data.loc[record_time, "Symbol"] = new_value
                         new_value = "sell" if side == "SELL" else "buy"
@@ -630,6 +644,22 @@ class Transactor:
 
         is_checked = self.window.checkBox.isChecked()
 
+        # Signals scripts are only used in simulation,
+        # so a strategy without a decision script would never transact.
+        strategy = team.strategist.strategies.all[strategy_index]
+        has_decisions = strategy.decision_script.strip() not in ("", "pass")
+        has_signals = strategy.signals_script.strip() != ""
+        if is_checked and has_signals and not has_decisions:
+            is_checked = False
+            self.window.checkBox.setChecked(False)
+            await ask(
+                "This strategy cannot transact",
+                "Its signals script is used only in simulation. Live transactions"
+                " are decided by the decision script, which this strategy doesn't"
+                " have. Write a decision script for the same strategy to automate it.",
+                ["Okay"],
+            )
+
         if is_checked:
             self.transaction_settings.should_transact = True
         else:
@@ -796,19 +826,19 @@ class Transactor:
 
         # ■■■■■ get light data ■■■■■
 
-        realtime_data = slice_deque(team.collector.realtime_data, 2 ** (10 + 6))
-        aggregate_trades = slice_deque(team.collector.aggregate_trades, 2 ** (10 + 6))
+        book_ticker_buffer = team.collector.book_tickers[symbol]
+        book_tickers = book_ticker_buffer.latest(book_ticker_buffer.capacity)
+        mark_price_buffer = team.collector.mark_prices[symbol]
+        mark_prices = mark_price_buffer.latest(mark_price_buffer.capacity)
+        aggregate_trades = team.collector.aggregate_trades[symbol]
+        recent_trades = aggregate_trades.latest(aggregate_trades.capacity)
 
         # ■■■■■ draw light lines ■■■■■
 
         # mark price
-        mark_prices = [
-            d
-            for d in realtime_data
-            if isinstance(d, MarkPrice) and d.symbol == symbol and d.mark_price > 0.0
-        ]
-        data_y = [d.mark_price for d in mark_prices]
-        data_x = [d.timestamp / 10**3 for d in mark_prices]
+        mask = mark_prices["mark_price"] > 0.0
+        data_y = mark_prices["mark_price"][mask]
+        data_x = mark_prices["timestamp"][mask] / 10**3
         widget = self.window.transaction_lines["mark_price"][0]
         widget.setData(data_x, data_y)
         if find_stop_flag(task_name, task_id):
@@ -816,19 +846,18 @@ class Transactor:
         await asyncio.sleep(0)
 
         # last price and volume
-        filtered = [t for t in aggregate_trades if t.symbol == symbol]
-        timestamps = [t.timestamp / 10**3 for t in filtered]
+        timestamps = recent_trades["timestamp"] / 10**3
 
         data_x = timestamps.copy()
-        data_y = [t.price for t in filtered]
+        data_y = recent_trades["price"].copy()
         widget = self.window.transaction_lines["last_price"][0]
         widget.setData(data_x, data_y)
         if find_stop_flag(task_name, task_id):
             return
         await asyncio.sleep(0)
 
-        index_ar = np.array(timestamps)
-        value_ar = np.array([t.volume for t in filtered])
+        index_ar = timestamps
+        value_ar = recent_trades["volume"].copy()
         length = len(index_ar)
         zero_ar = np.zeros(length)
         nan_ar = np.empty(length)
@@ -842,19 +871,16 @@ class Transactor:
         await asyncio.sleep(0)
 
         # book tickers
-        book_tickers = [
-            d for d in realtime_data if isinstance(d, BookTicker) and d.symbol == symbol
-        ]
-        data_x = [d.timestamp / 10**3 for d in book_tickers]
+        data_x = book_tickers["timestamp"] / 10**3
 
-        data_y = [d.best_bid_price for d in book_tickers]
+        data_y = book_tickers["best_bid_price"].copy()
         widget = self.window.transaction_lines["book_tickers"][0]
         widget.setData(data_x, data_y)
         if find_stop_flag(task_name, task_id):
             return
         await asyncio.sleep(0)
 
-        data_y = [d.best_ask_price for d in book_tickers]
+        data_y = book_tickers["best_ask_price"].copy()
         widget = self.window.transaction_lines["book_tickers"][1]
         widget.setData(data_x, data_y)
         if find_stop_flag(task_name, task_id):
@@ -892,13 +918,50 @@ class Transactor:
             slice_until = datetime.now(timezone.utc)
         slice_until -= timedelta(seconds=1)
 
+        # ■■■■■ check how long candles should be ■■■■■
+
+        # Longer candles are drawn when 10-second ones can't fit in pixels.
+        widget = self.window.plot_widget
+        range_start, range_end = widget.getAxis("bottom").range
+        pixel_width = int(widget.plotItem.vb.width())  # type:ignore
+        if range_end <= range_start or pixel_width <= 0:
+            level_name = "10s"
+        else:
+            view_start = datetime.fromtimestamp(max(range_start, 0.0), tz=timezone.utc)
+            view_end = datetime.fromtimestamp(max(range_end, 0.0), tz=timezone.utc)
+            level_name = choose_pyramid_level(view_start, view_end, pixel_width)
+
+        # ■■■■■ check if only new data should be appended ■■■■■
+
+        # While watching live, only the newly sealed candles are appended.
+        # Everything is drawn again when the symbol, the strategy,
+        # the range or the candle length changes,
+        # and once an extra hour has been appended.
+        drawing_key = (symbol, strategy_index, should_draw_frequently, level_name)
+        drawn_until = self.drawn_until
+        should_append = (
+            periodic
+            and frequent
+            and drawn_until is not None
+            and self.drawing_key == drawing_key
+            and self.drawn_from > slice_from - timedelta(hours=1)
+        )
+
         # ■■■■■ get heavy data ■■■■■
 
         async with team.collector.candle_data.read_lock as cell:
             candle_data_original = cell.data[get_from:slice_until][[symbol]].copy()
+            if level_name == "10s":
+                pyramid_data = None
+            else:
+                pyramid_data = team.collector.candle_pyramid.query(
+                    level_name, slice_from, slice_until, [symbol]
+                )
+        drawing_from = self.drawn_from if should_append else slice_from
         async with self.unrealized_changes.read_lock as cell:
-            unrealized_changes = cell.data.copy()
+            unrealized_changes = cell.data[drawing_from:].copy()
         async with self.asset_record.read_lock as cell:
+            asset_record_length = len(cell.data)
             if len(cell.data) > 0:
                 last_asset = cell.data.iloc[-1]["Result Asset"]
             else:
@@ -910,7 +973,11 @@ class Transactor:
                 before_asset = None
             asset_record = cell.data[slice_from:].copy()
 
-        candle_data = candle_data_original[slice_from:]
+        if should_append and drawn_until is not None:
+            is_new = candle_data_original.index > drawn_until
+            candle_data = candle_data_original[is_new]
+        else:
+            candle_data = candle_data_original[slice_from:]
 
         # ■■■■■ maniuplate heavy data ■■■■■
 
@@ -922,8 +989,8 @@ class Transactor:
             new_index = candle_data.index.union([new_moment])
             candle_data = candle_data.reindex(new_index)
 
+        observed_until = self.account_state["observed_until"]
         if last_asset is not None:
-            observed_until = self.account_state["observed_until"]
             if len(asset_record) == 0 or asset_record.index[-1] < observed_until:
                 if slice_from < observed_until:
                     asset_record.loc[observed_until, "Cause"] = "other"
@@ -941,150 +1008,75 @@ class Transactor:
 
         # ■■■■■ draw heavy lines ■■■■■
 
-        # price movement
-        index_ar = candle_data.index.to_numpy(dtype=np.int64) / 10**9
-        open_ar = candle_data[(symbol, "Open")].to_numpy()
-        close_ar = candle_data[(symbol, "Close")].to_numpy()
-        high_ar = candle_data[(symbol, "High")].to_numpy()
-        low_ar = candle_data[(symbol, "Low")].to_numpy()
-        rise_ar = close_ar > open_ar
-        fall_ar = close_ar < open_ar
-        stay_ar = close_ar == open_ar
-        length = len(index_ar)
-        nan_ar = np.empty(length)
-        nan_ar[:] = np.nan
+        # An interrupted drawing leaves lines incomplete,
+        # so the next one should draw everything again.
+        self.drawing_key = None
 
-        data_x = np.stack(
-            [
-                index_ar[rise_ar] + 2,
-                index_ar[rise_ar] + 5,
-                index_ar[rise_ar],
-                index_ar[rise_ar] + 5,
-                index_ar[rise_ar] + 8,
-                index_ar[rise_ar],
-                index_ar[rise_ar] + 5,
-                index_ar[rise_ar] + 5,
-                index_ar[rise_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        data_y = np.stack(
-            [
-                open_ar[rise_ar],
-                open_ar[rise_ar],
-                nan_ar[rise_ar],
-                close_ar[rise_ar],
-                close_ar[rise_ar],
-                nan_ar[rise_ar],
-                high_ar[rise_ar],
-                low_ar[rise_ar],
-                nan_ar[rise_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        widget = self.window.transaction_lines["price_rise"][0]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
-
-        data_x = np.stack(
-            [
-                index_ar[fall_ar] + 2,
-                index_ar[fall_ar] + 5,
-                index_ar[fall_ar],
-                index_ar[fall_ar] + 5,
-                index_ar[fall_ar] + 8,
-                index_ar[fall_ar],
-                index_ar[fall_ar] + 5,
-                index_ar[fall_ar] + 5,
-                index_ar[fall_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        data_y = np.stack(
-            [
-                open_ar[fall_ar],
-                open_ar[fall_ar],
-                nan_ar[fall_ar],
-                close_ar[fall_ar],
-                close_ar[fall_ar],
-                nan_ar[fall_ar],
-                high_ar[fall_ar],
-                low_ar[fall_ar],
-                nan_ar[fall_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        widget = self.window.transaction_lines["price_fall"][0]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
+        if should_append and len(candle_data) == 0:
+            # No candle was sealed since the last drawing.
+            should_draw_candles = False
+        else:
+            should_draw_candles = True
+
+        if should_draw_candles:
+            # price movement
+            index_ar = candle_data.index.to_numpy(dtype=np.int64) / 10**9
+            if pyramid_data is None:
+                candle_points = make_candle_points(
+                    index_ar,
+                    candle_data[(symbol, "Open")].to_numpy(),
+                    candle_data[(symbol, "High")].to_numpy(),
+                    candle_data[(symbol, "Low")].to_numpy(),
+                    candle_data[(symbol, "Close")].to_numpy(),
+                )
+                should_append_candles = should_append
+            else:
+                # Longer candles are few, but the last one keeps changing,
+                # so they're drawn again entirely.
+                candle_points = make_candle_points(
+                    pyramid_data.index.to_numpy(dtype=np.int64) / 10**9,
+                    pyramid_data[(symbol, "Open")].to_numpy(),
+                    pyramid_data[(symbol, "High")].to_numpy(),
+                    pyramid_data[(symbol, "Low")].to_numpy(),
+                    pyramid_data[(symbol, "Close")].to_numpy(),
+                    PYRAMID_LEVELS[level_name],
+                )
+                should_append_candles = False
+            for name, (data_x, data_y) in candle_points.items():
+                self.draw_heavy_line(
+                    f"price_{name}", 0, data_x, data_y, should_append_candles
+                )
+                if find_stop_flag(task_name, task_id):
+                    return
+                await asyncio.sleep(0)
 
-        data_x = np.stack(
-            [
-                index_ar[stay_ar] + 2,
-                index_ar[stay_ar] + 5,
-                index_ar[stay_ar],
-                index_ar[stay_ar] + 5,
-                index_ar[stay_ar] + 8,
-                index_ar[stay_ar],
-                index_ar[stay_ar] + 5,
-                index_ar[stay_ar] + 5,
-                index_ar[stay_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        data_y = np.stack(
-            [
-                open_ar[stay_ar],
-                open_ar[stay_ar],
-                nan_ar[stay_ar],
-                close_ar[stay_ar],
-                close_ar[stay_ar],
-                nan_ar[stay_ar],
-                high_ar[stay_ar],
-                low_ar[stay_ar],
-                nan_ar[stay_ar],
-            ],
-            axis=1,
-        ).reshape(-1)
-        widget = self.window.transaction_lines["price_stay"][0]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
+            # Lines below end with an empty row, which new rows replace.
+            if should_append:
+                for line_name, turn in (("wobbles", 0), ("wobbles", 1), ("volume", 0)):
+                    line_buffer = self.line_buffers[(line_name, turn)]
+                    line_buffer.truncate(len(line_buffer) - 1)
 
-        # wobbles
-        sr = candle_data[(symbol, "High")]
-        data_x = sr.index.to_numpy(dtype=np.int64) / 10**9
-        data_y = sr.to_numpy(dtype=np.float32)
-        widget = self.window.transaction_lines["wobbles"][0]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
+            # wobbles
+            data_y = candle_data[(symbol, "High")].to_numpy(dtype=np.float32)
+            self.draw_heavy_line("wobbles", 0, index_ar, data_y, should_append)
+            if find_stop_flag(task_name, task_id):
+                return
+            await asyncio.sleep(0)
 
-        sr = candle_data[(symbol, "Low")]
-        data_x = sr.index.to_numpy(dtype=np.int64) / 10**9
-        data_y = sr.to_numpy(dtype=np.float32)
-        widget = self.window.transaction_lines["wobbles"][1]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
+            data_y = candle_data[(symbol, "Low")].to_numpy(dtype=np.float32)
+            self.draw_heavy_line("wobbles", 1, index_ar, data_y, should_append)
+            if find_stop_flag(task_name, task_id):
+                return
+            await asyncio.sleep(0)
 
-        # trade volume
-        sr = candle_data[(symbol, "Volume")]
-        sr = sr.fillna(value=0)
-        data_x = sr.index.to_numpy(dtype=np.int64) / 10**9
-        data_y = sr.to_numpy(dtype=np.float32)
-        widget = self.window.transaction_lines["volume"][0]
-        widget.setData(data_x, data_y)
-        if find_stop_flag(task_name, task_id):
-            return
-        await asyncio.sleep(0)
+            # trade volume
+            sr = candle_data[(symbol, "Volume")]
+            sr = sr.fillna(value=0)
+            data_y = sr.to_numpy(dtype=np.float32)
+            self.draw_heavy_line("volume", 0, index_ar, data_y, should_append)
+            if find_stop_flag(task_name, task_id):
+                return
+            await asyncio.sleep(0)
 
         # asset
         data_x = asset_record["Result Asset"].index.to_numpy(dtype=np.int64) / 10**9
@@ -1096,15 +1088,33 @@ class Transactor:
         await asyncio.sleep(0)
 
         # asset with unrealized profit
-        sr = asset_record["Result Asset"]
-        if len(sr) >= 2:
-            sr = sr.resample("10S").ffill()
-        unrealized_changes_sr = unrealized_changes.reindex(sr.index)
-        sr = sr * (1 + unrealized_changes_sr)
-        data_x = sr.index.to_numpy(dtype=np.int64) / 10**9 + 5
-        data_y = sr.to_numpy(dtype=np.float32)
-        widget = self.window.transaction_lines["asset_with_unrealized_profit"][0]
-        widget.setData(data_x, data_y)
+        if (
+            should_append
+            and last_asset is not None
+            and asset_record_length == self.drawn_asset_record_length
+        ):
+            # Without new records, only the asset of new moments changes.
+            new_moments = pd.date_range(
+                self.drawn_observed_until + timedelta(seconds=10),
+                observed_until,
+                freq="10S",
+            )
+            unrealized_changes_sr = unrealized_changes.reindex(new_moments)
+            sr = last_asset * (1 + unrealized_changes_sr)
+            data_x = new_moments.to_numpy(dtype=np.int64) / 10**9 + 5
+            data_y = sr.to_numpy(dtype=np.float32)
+            self.draw_heavy_line(
+                "asset_with_unrealized_profit", 0, data_x, data_y, True
+            )
+        else:
+            sr = asset_record["Result Asset"]
+            if len(sr) >= 2:
+                sr = sr.resample("10S").ffill()
+            unrealized_changes_sr = unrealized_changes.reindex(sr.index)
+            sr = sr * (1 + unrealized_changes_sr)
+            data_x = sr.index.to_numpy(dtype=np.int64) / 10**9 + 5
+            data_y = sr.to_numpy(dtype=np.float32)
+            self.draw_heavy_line("asset_with_unrealized_profit", 0, data_x, data_y)
         if find_stop_flag(task_name, task_id):
             return
         await asyncio.sleep(0)
@@ -1132,6 +1142,17 @@ class Transactor:
             return
         await asyncio.sleep(0)
 
+        # ■■■■■ remember what is drawn ■■■■■
+
+        self.drawing_key = drawing_key
+        self.drawn_from = drawing_from
+        if len(candle_data) > 0:
+            self.drawn_until = candle_data.index[-1] - timedelta(seconds=10)
+        elif not should_append:
+            self.drawn_until = None
+        self.drawn_observed_until = observed_until
+        self.drawn_asset_record_length = asset_record_length
+
         # ■■■■■ record task duration ■■■■■
 
         duration = time.perf_counter() - start_time
@@ -1139,6 +1160,11 @@ class Transactor:
 
         # ■■■■■ make indicators ■■■■■
 
+        if not should_draw_candles:
+            # Indicators don't change without new candles.
+            await self.set_minimum_view_range()
+            return
+
         indicators_script = strategy.indicators_script
 
         indicators = await go(
@@ -1148,89 +1174,72 @@ class Transactor:
             indicators_script=indicators_script,
         )
 
-        indicators = indicators[slice_from:slice_until]
+        # Indicators are drawn again if the strategy's script has been changed.
+        indicator_columns = indicators.columns.tolist()
+        if should_append and indicator_columns == self.drawn_indicator_columns:
+            indicators = indicators[indicators.index > drawn_until]
+            should_append_indicators = True
+        else:
+            indicators = indicators[drawing_from:slice_until]
+            should_append_indicators = False
+        self.drawn_indicator_columns = None
 
         # ■■■■■ draw strategy lines ■■■■■
 
-        # price indicators
-        df = indicators[symbol]["Price"]
-        data_x = df.index.to_numpy(dtype=np.int64) / 10**9
-        data_x += 5
-        line_list = self.window.transaction_lines["price_indicators"]
-        for turn, widget in enumerate(line_list):
-            if turn < len(df.columns):
-                column_name = df.columns[turn]
-                sr = df[column_name]
-                data_y = sr.to_numpy(dtype=np.float32)
-                inside_strings = re.findall(r"\(([^)]+)", column_name)
-                if len(inside_strings) == 0:
-                    color = "#AAAAAA"
-                else:
-                    color = inside_strings[0]
-                widget.setPen(color)
-                widget.setData(data_x, data_y)
-                if find_stop_flag(task_name, task_id):
-                    return
-                await asyncio.sleep(0)
-            else:
-                if find_stop_flag(task_name, task_id):
-                    return
-                widget.clear()
-
-        # trade volume indicators
-        df = indicators[symbol]["Volume"]
-        data_x = df.index.to_numpy(dtype=np.int64) / 10**9
-        data_x += 5
-        line_list = self.window.transaction_lines["volume_indicators"]
-        for turn, widget in enumerate(line_list):
-            if turn < len(df.columns):
-                column_name = df.columns[turn]
-                sr = df[column_name]
-                data_y = sr.to_numpy(dtype=np.float32)
-                inside_strings = re.findall(r"\(([^)]+)", column_name)
-                if len(inside_strings) == 0:
-                    color = "#AAAAAA"
-                else:
-                    color = inside_strings[0]
-                widget.setPen(color)
-                widget.setData(data_x, data_y)
-                if find_stop_flag(task_name, task_id):
-                    return
-                await asyncio.sleep(0)
-            else:
-                if find_stop_flag(task_name, task_id):
-                    return
-                widget.clear()
-
-        # abstract indicators
-        df = indicators[symbol]["Abstract"]
-        data_x = df.index.to_numpy(dtype=np.int64) / 10**9
-        data_x += 5
-        line_list = self.window.transaction_lines["abstract_indicators"]
-        for turn, widget in enumerate(line_list):
-            if turn < len(df.columns):
-                column_name = df.columns[turn]
-                sr = df[column_name]
-                data_y = sr.to_numpy(dtype=np.float32)
-                inside_strings = re.findall(r"\(([^)]+)", column_name)
-                if len(inside_strings) == 0:
-                    color = "#AAAAAA"
+        for line_name, category in (
+            ("price_indicators", "Price"),
+            ("volume_indicators", "Volume"),
+            ("abstract_indicators", "Abstract"),
+        ):
+            df = indicators[symbol][category]
+            data_x = df.index.to_numpy(dtype=np.int64) / 10**9
+            data_x += 5
+            line_list = self.window.transaction_lines[line_name]
+            for turn, widget in enumerate(line_list):
+                if turn < len(df.columns):
+                    column_name = df.columns[turn]
+                    sr = df[column_name]
+                    data_y = sr.to_numpy(dtype=np.float32)
+                    if not should_append_indicators:
+                        inside_strings = re.findall(r"\(([^)]+)", column_name)
+                        if len(inside_strings) == 0:
+                            color = "#AAAAAA"
+                        else:
+                            color = inside_strings[0]
+                        widget.setPen(color)
+                    self.draw_heavy_line(
+                        line_name, turn, data_x, data_y, should_append_indicators
+                    )
+                    if find_stop_flag(task_name, task_id):
+                        return
+                    await asyncio.sleep(0)
                 else:
-                    color = inside_strings[0]
-                widget.setPen(color)
-                widget.setData(data_x, data_y)
-                if find_stop_flag(task_name, task_id):
-                    return
-                await asyncio.sleep(0)
-            else:
-                if find_stop_flag(task_name, task_id):
-                    return
-                widget.clear()
+                    if find_stop_flag(task_name, task_id):
+                        return
+                    widget.clear()
+
+        self.drawn_indicator_columns = indicator_columns
 
         # ■■■■■ set minimum view range ■■■■■
 
         await self.set_minimum_view_range()
 
+    def draw_heavy_line(
+        self,
+        line_name: str,
+        turn: int,
+        data_x: np.ndarray,
+        data_y: np.ndarray,
+        should_append: bool = False,
+    ):
+        line_buffer = self.line_buffers.setdefault((line_name, turn), LineBuffer())
+        if should_append:
+            line_buffer.append(data_x, data_y)
+        else:
+            line_buffer.replace(data_x, data_y)
+        widget = self.window.transaction_lines[line_name][turn]
+        widget.setData(line_buffer.data_x, line_buffer.data_y)
+
     async def toggle_frequent_draw(self):
         is_checked = self.window.checkBox_2.isChecked()
         if is_checked:
@@ -1893,17 +1902,13 @@ class Transactor:
         current_timestamp = to_moment(datetime.now(timezone.utc)).timestamp() * 1000
 
         current_prices: dict[str, float] = {}
-        recent_aggregate_trades = slice_deque(
-            team.collector.aggregate_trades, 2 ** (10 + 6)
-        )
         for symbol in target_symbols:
-            for aggregate_trade in reversed(recent_aggregate_trades):
-                if aggregate_trade.symbol != symbol:
-                    continue
-                if aggregate_trade.timestamp < current_timestamp - 60 * 1000:
-                    raise ValueError("Recent price is not available for placing orders")
-                current_prices[symbol] = aggregate_trade.price
-                break
+            latest_prices = team.collector.latest_prices[symbol]
+            if latest_prices.trade_time == 0:
+                continue
+            if latest_prices.trade_time < current_timestamp - 60 * 1000:
+                raise ValueError("Recent price is not available for placing orders")
+            current_prices[symbol] = latest_prices.last_price
 
         # cancel_all
         # now_close
@@ -1938,8 +1943,9 @@ class Transactor:
             timestamp = response["updateTime"] / 1000
             update_time = datetime.fromtimestamp(timestamp, tz=timezone.utc)
             async with self.auto_order_record.write_lock as cell:
-                while update_time in cell.data.index:
-                    update_time += timedelta(milliseconds=1)
+                if len(cell.data) > 0:
+                    self.auto_order_record_keys.observe(cell.data.index[-1])
+                update_time = self.auto_order_record_keys.allocate(update_time)
                 cell.data.loc[update_time, "Symbol"] = order_symbol
                 cell.data.loc[update_time, "Order ID"] = order_id
                 if not cell.data.index.is_monotonic_increasing:
@@ -0,0 +1,18 @@
+from solie.utility import decode_mark_prices
+
+MARK_PRICE_DATA = [
+    {"e": "markPriceUpdate", "E": 1700000000000, "s": "BTCUSDT", "p": "37000.5"},
+    {"e": "markPriceUpdate", "E": 1700000000000, "s": "ETHUSDT", "p": "2000.25"},
+    {"e": "markPriceUpdate", "E": 1700000000000, "s": "XRPUSDT", "p": "0.6"},
+]
+
+
+def test_mark_prices_of_other_symbols_are_skipped():
+    mark_prices = decode_mark_prices(MARK_PRICE_DATA, {"ETHUSDT"})
+    assert [(m.symbol, m.mark_price) for m in mark_prices] == [("ETHUSDT", 2000.25)]
+    assert mark_prices[0].timestamp == 1700000000000
+
+
+def test_all_mark_prices_are_decoded_without_symbols():
+    mark_prices = decode_mark_prices(MARK_PRICE_DATA)
+    assert [m.symbol for m in mark_prices] == ["BTCUSDT", "ETHUSDT", "XRPUSDT"]
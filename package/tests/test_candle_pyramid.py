@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+from solie.utility import CandlePyramid, choose_pyramid_level
+
+CANDLE_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+
+def make_candle_data(symbols: list[str], start: datetime, hours: int) -> pd.DataFrame:
+    index = pd.date_range(start, periods=hours * 360, freq="10S", tz="UTC")
+    columns = pd.MultiIndex.from_product([symbols, CANDLE_FIELDS])
+    random_generator = np.random.default_rng(7)
+    close_prices = 100 + random_generator.normal(size=(len(index), len(symbols)))
+    open_prices = close_prices + random_generator.normal(size=close_prices.shape)
+    values = np.stack(
+        [
+            open_prices,
+            np.maximum(open_prices, close_prices) + 1,
+            np.minimum(open_prices, close_prices) - 1,
+            close_prices,
+            random_generator.uniform(size=close_prices.shape),
+        ],
+        axis=2,
+    ).reshape(len(index), -1)
+    return pd.DataFrame(values.astype(np.float32), index=index, columns=columns)
+
+
+def test_added_candles_match_rebuilt_ones():
+    symbols = ["BTCUSDT", "ETHUSDT"]
+    candle_data = make_candle_data(
+        symbols, datetime(2024, 3, 1, 22, tzinfo=timezone.utc), 4
+    )
+    # An illiquid minute without trades
+    candle_data.iloc[400:406] = np.nan
+    split_moment = candle_data.index[1000]
+
+    rebuilt_pyramid = CandlePyramid(symbols)
+    rebuilt_pyramid.rebuild(candle_data)
+    added_pyramid = CandlePyramid(symbols)
+    added_pyramid.rebuild(candle_data[:split_moment].iloc[:-1])
+    for moment, values in candle_data[split_moment:].iterrows():
+        added_pyramid.add(moment, values.tolist())
+
+    start = candle_data.index[0]
+    end = candle_data.index[-1] + timedelta(seconds=10)
+    for level_name in ("1m", "5m", "1h", "1d"):
+        rebuilt_data = rebuilt_pyramid.query(level_name, start, end)
+        added_data = added_pyramid.query(level_name, start, end)
+        pd.testing.assert_frame_equal(added_data, rebuilt_data)
+
+
+def test_partial_rebuild_matches_full_one():
+    symbols = ["BTCUSDT"]
+    candle_data = make_candle_data(
+        symbols, datetime(2024, 3, 1, 22, tzinfo=timezone.utc), 4
+    )
+
+    full_pyramid = CandlePyramid(symbols)
+    full_pyramid.rebuild(candle_data)
+    partial_pyramid = CandlePyramid(symbols)
+    partial_pyramid.rebuild(candle_data * 2)
+    partial_pyramid.rebuild(candle_data, candle_data.index[0])
+
+    start = candle_data.index[0]
+    end = candle_data.index[-1] + timedelta(seconds=10)
+    for level_name in ("1m", "5m", "1h", "1d"):
+        full_data = full_pyramid.query(level_name, start, end)
+        partial_data = partial_pyramid.query(level_name, start, end)
+        pd.testing.assert_frame_equal(partial_data, full_data)
+
+    hourly_data = full_pyramid.query("1h", start, end, ["BTCUSDT"])
+    assert len(hourly_data) == 4
+    assert hourly_data.iloc[0][("BTCUSDT", "High")] == np.float32(
+        candle_data.iloc[:360][("BTCUSDT", "High")].max()
+    )
+
+
+def test_coarsest_adequate_level_is_chosen():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    assert choose_pyramid_level(start, start + timedelta(hours=1), 1000) == "10s"
+    assert choose_pyramid_level(start, start + timedelta(days=1), 1000) == "1m"
+    assert choose_pyramid_level(start, start + timedelta(days=30), 1000) == "5m"
+    assert choose_pyramid_level(start, start + timedelta(days=365), 1000) == "1h"
+    assert choose_pyramid_level(start, start + timedelta(days=365), 300) == "1d"
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import time_machine
+from solie.utility import CoverageBitmap, find_coverage_origin
+from solie.worker.collector import Collector
+
+TARGET_SYMBOLS = ["BTCUSDT", "ETHUSDT"]
+NEW_YEAR_TIME = datetime(2025, 1, 1, 0, 5, tzinfo=timezone.utc)
+
+
+def make_full_candle_data(start: datetime, end: datetime) -> pd.DataFrame:
+    index = pd.date_range(start, end, freq="10S", inclusive="left", tz="UTC")
+    columns = pd.MultiIndex.from_product(
+        [TARGET_SYMBOLS, ["Open", "High", "Low", "Close", "Volume"]]
+    )
+    values = np.ones((len(index), len(columns)), dtype=np.float32)
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def test_origin_reaches_into_last_year():
+    origin = find_coverage_origin(NEW_YEAR_TIME)
+    assert origin == datetime(2024, 12, 30, tzinfo=timezone.utc)
+
+
+def test_origin_is_year_start_later_in_year():
+    origin = find_coverage_origin(datetime(2025, 6, 1, 12, tzinfo=timezone.utc))
+    assert origin == datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@time_machine.travel(NEW_YEAR_TIME, tick=False)
+def test_collector_is_fully_cumulated_on_new_year():
+    # The collector is started on January 1st, 00:05 UTC,
+    # with complete candles of the last two days.
+    current_time = datetime.now(timezone.utc)
+    candle_coverage = CoverageBitmap(
+        TARGET_SYMBOLS,
+        find_coverage_origin(current_time),
+    )
+    candle_coverage.update(
+        make_full_candle_data(current_time - timedelta(days=2), current_time)
+    )
+    collector = SimpleNamespace(candle_coverage=candle_coverage)
+
+    cumulation_rate = asyncio.run(
+        Collector.check_candle_data_cumulation_rate(collector)  # type:ignore
+    )
+    assert cumulation_rate == 1.0
+
+    # The same range that holes are filled from has nothing to fill.
+    for symbol in TARGET_SYMBOLS:
+        first_missing = candle_coverage.first_missing(
+            symbol,
+            current_time - timedelta(hours=24),
+            current_time - timedelta(minutes=1) + timedelta(seconds=10),
+        )
+        assert first_missing is None
@@ -0,0 +1,54 @@
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from solie.utility import CandleStore, check_day_completeness
+
+CANDLE_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+
+def make_candle_data(symbols: list[str], start: datetime, days: int) -> pd.DataFrame:
+    index = pd.date_range(start, periods=days * 8640, freq="10S", tz="UTC")
+    columns = pd.MultiIndex.from_product([symbols, CANDLE_FIELDS])
+    values = np.ones((len(index), len(columns)), dtype=np.float32)
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def test_days_with_gaps_are_told_apart():
+    candle_data = make_candle_data(
+        ["BTCUSDT"], datetime(2024, 3, 1, tzinfo=timezone.utc), 3
+    )
+    # An illiquid hour on the second day
+    candle_data.iloc[8640 + 100 : 8640 + 460] = np.nan
+
+    day_completeness = check_day_completeness(candle_data)
+
+    assert day_completeness == [
+        ("BTCUSDT", date(2024, 3, 1), True),
+        ("BTCUSDT", date(2024, 3, 2), False),
+        ("BTCUSDT", date(2024, 3, 3), True),
+    ]
+
+
+def test_complete_days_are_found_in_store(tmp_path: Path):
+    candle_store = CandleStore(tmp_path / "candle_store")
+    candle_data = make_candle_data(
+        ["BTCUSDT", "ETHUSDT"], datetime(2023, 12, 30, tzinfo=timezone.utc), 4
+    )
+    # A single missing field makes the moment incomplete.
+    candle_data.loc["2024-01-01 12:00:00", ("ETHUSDT", "Volume")] = np.nan
+    candle_store.write(candle_data)
+
+    assert candle_store.complete_days("BTCUSDT") == [
+        date(2023, 12, 30),
+        date(2023, 12, 31),
+        date(2024, 1, 1),
+        date(2024, 1, 2),
+    ]
+    assert candle_store.complete_days("ETHUSDT") == [
+        date(2023, 12, 30),
+        date(2023, 12, 31),
+        date(2024, 1, 2),
+    ]
+    assert candle_store.complete_days("XRPUSDT") == []
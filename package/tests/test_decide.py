@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+from solie.utility import decide
+
+TARGET_SYMBOLS = ["BTCUSDT"]
+
+
+def make_decision(decision_script: str) -> tuple[dict, dict]:
+    index = pd.DatetimeIndex([datetime(2024, 1, 1, tzinfo=timezone.utc)])
+    columns = pd.MultiIndex.from_product([TARGET_SYMBOLS, ["Close"]])
+    candle_data = pd.DataFrame([[100.0]], index=index, columns=columns)
+    indicators = pd.DataFrame(index=index, dtype=np.float32)
+    return decide(
+        target_symbols=TARGET_SYMBOLS,
+        current_moment=datetime(2024, 1, 1, 0, 0, 10, tzinfo=timezone.utc),
+        current_candle_data=candle_data.to_records()[0],
+        current_indicators=indicators.to_records()[0],
+        account_state={},
+        scribbles={},
+        decision_script=decision_script,
+    )
+
+
+def test_star_import_is_allowed():
+    decision_script = """
+from math import *
+scribbles["root"] = sqrt(16)
+"""
+    _, scribbles = make_decision(decision_script)
+    assert scribbles["root"] == 4
+
+
+def test_helper_reads_script_level_variable():
+    decision_script = """
+margin = 0.1
+
+def make_order():
+    global margin
+    return {"margin": margin}
+
+decision["BTCUSDT"]["now_buy"] = make_order()
+"""
+    decision, _ = make_decision(decision_script)
+    assert decision == {"BTCUSDT": {"now_buy": {"margin": 0.1}}}
+
+
+def test_stray_yield_is_rejected():
+    decision_script = """
+decision["BTCUSDT"]["now_buy"] = {"margin": 0.1}
+yield
+"""
+    with pytest.raises(SyntaxError):
+        make_decision(decision_script)
+
+
+def test_names_are_kept_between_decisions():
+    decision_script = """
+if "count" in dir():
+    count += 1
+else:
+    count = 1
+scribbles["count"] = count
+"""
+    make_decision(decision_script)
+    _, scribbles = make_decision(decision_script)
+    assert scribbles["count"] == 2
+
+
+def test_given_names_are_replaced_on_each_decision():
+    decision_script = """
+price = current_candle_data[str(("BTCUSDT", "Close"))]
+decision["BTCUSDT"]["now_buy"] = {"price": price}
+"""
+    first_decision, _ = make_decision(decision_script)
+    second_decision, _ = make_decision(decision_script)
+    assert first_decision is not second_decision
+    assert second_decision == {"BTCUSDT": {"now_buy": {"price": 100.0}}}
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+from solie.common import prepare_process_pool
+from solie.utility import ArchiveDownloader, DownloadPreset
+from solie.utility.download_from_binance import make_archive_path
+
+DOWNLOAD_TARGET = DownloadPreset("BTCUSDT", "daily", 2024, 3, 15)
+ARCHIVE_PATH = make_archive_path(DOWNLOAD_TARGET)
+ARCHIVE_CONTENT = bytes(range(256)) * 4096
+
+
+@pytest.fixture(scope="module", autouse=True)
+def process_pool():
+    prepare_process_pool()
+
+
+class StandInServer:
+    """
+    Serves archives like Binance public data does,
+    answering range requests and recording them.
+    """
+
+    def __init__(self, files: dict[str, bytes]):
+        self.files = files
+        self.requests: list[tuple[str, str | None]] = []
+        self.runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    async def handle(self, request: web.Request) -> web.Response:
+        path = request.path.lstrip("/")
+        range_header = request.headers.get("Range")
+        self.requests.append((path, range_header))
+
+        if path not in self.files:
+            return web.Response(status=404)
+        content = self.files[path]
+
+        if range_header is None:
+            return web.Response(body=content)
+        start = int(range_header.removeprefix("bytes=").removesuffix("-"))
+        if start >= len(content):
+            return web.Response(status=416)
+        return web.Response(status=206, body=content[start:])
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exception_info):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+
+def make_files(checksum_content: bytes) -> dict[str, bytes]:
+    expected_hash = hashlib.sha256(checksum_content).hexdigest()
+    return {
+        ARCHIVE_PATH: ARCHIVE_CONTENT,
+        f"{ARCHIVE_PATH}.CHECKSUM": f"{expected_hash}  archive.zip\n".encode(),
+    }
+
+
+async def fetch(server: StandInServer, directory: Path) -> Path | None:
+    archive_downloader = ArchiveDownloader(
+        directory, base_url=server.base_url, retry_count=1
+    )
+    return await archive_downloader.fetch(DOWNLOAD_TARGET)
+
+
+def test_archive_is_downloaded_and_verified(tmp_path: Path):
+    async def job():
+        async with StandInServer(make_files(ARCHIVE_CONTENT)) as server:
+            filepath = await fetch(server, tmp_path)
+            return filepath, server.requests
+
+    filepath, requests = asyncio.run(job())
+
+    assert filepath == tmp_path / ARCHIVE_PATH
+    assert filepath.read_bytes() == ARCHIVE_CONTENT
+    assert not filepath.with_name(filepath.name + ".part").exists()
+    assert (ARCHIVE_PATH, None) in requests
+
+
+def test_archive_with_wrong_checksum_is_discarded(tmp_path: Path):
+    async def job():
+        async with StandInServer(make_files(b"other content")) as server:
+            return await fetch(server, tmp_path)
+
+    filepath = asyncio.run(job())
+
+    cached_path = tmp_path / ARCHIVE_PATH
+    assert filepath is None
+    assert not cached_path.exists()
+    assert not cached_path.with_name(cached_path.name + ".part").exists()
+
+
+def test_partial_download_is_resumed(tmp_path: Path):
+    cached_path = tmp_path / ARCHIVE_PATH
+    part_path = cached_path.with_name(cached_path.name + ".part")
+    part_path.parent.mkdir(parents=True)
+    part_size = len(ARCHIVE_CONTENT) // 3
+    part_path.write_bytes(ARCHIVE_CONTENT[:part_size])
+
+    async def job():
+        async with StandInServer(make_files(ARCHIVE_CONTENT)) as server:
+            filepath = await fetch(server, tmp_path)
+            return filepath, server.requests
+
+    filepath, requests = asyncio.run(job())
+
+    assert filepath == cached_path
+    assert cached_path.read_bytes() == ARCHIVE_CONTENT
+    assert not part_path.exists()
+    assert (ARCHIVE_PATH, f"bytes={part_size}-") in requests
+
+
+def test_complete_partial_download_is_not_downloaded_again(tmp_path: Path):
+    cached_path = tmp_path / ARCHIVE_PATH
+    part_path = cached_path.with_name(cached_path.name + ".part")
+    part_path.parent.mkdir(parents=True)
+    part_path.write_bytes(ARCHIVE_CONTENT)
+
+    async def job():
+        async with StandInServer(make_files(ARCHIVE_CONTENT)) as server:
+            return await fetch(server, tmp_path)
+
+    filepath = asyncio.run(job())
+
+    assert filepath == cached_path
+    assert cached_path.read_bytes() == ARCHIVE_CONTENT
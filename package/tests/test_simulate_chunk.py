@@ -0,0 +1,215 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+from solie.utility import (
+    create_empty_account_state,
+    create_empty_asset_record,
+    create_empty_unrealized_changes,
+)
+from solie.utility.analyze_market import (
+    CalculationInput,
+    CalculationOutput,
+    simulate_chunk,
+)
+
+TARGET_SYMBOLS = ["BTCUSDT", "ETHUSDT"]
+CANDLE_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+# Every kind of placement is made at moments chosen by a hash of time.
+DECISION_SCRIPT = """
+moment_number = int(current_moment.timestamp()) // 10
+for symbol_number, symbol in enumerate(target_symbols):
+    close_price = current_candle_data[str((symbol, "Close"))]
+    if close_price != close_price:
+        continue
+    choice = (moment_number * 2654435761 + symbol_number * 40503) % 1499
+    direction = account_state["positions"][symbol]["direction"]
+    open_orders = account_state["open_orders"][symbol]
+    # Closing orders are made only when they can't be left alone.
+    can_close = direction != "none" and len(open_orders) == 0
+    margin = 0.02 + (moment_number % 7) * 0.001
+    up_boundary = close_price * 1.003
+    down_boundary = close_price * 0.997
+    symbol_decision = decision[symbol]
+    if choice == 0:
+        symbol_decision["now_buy"] = {"margin": margin}
+    elif choice == 1:
+        symbol_decision["now_sell"] = {"margin": margin}
+    elif choice == 2 and can_close:
+        symbol_decision["now_close"] = {}
+    elif choice == 3 and can_close:
+        symbol_decision["later_up_close"] = {"boundary": up_boundary}
+    elif choice == 4 and can_close:
+        symbol_decision["later_down_close"] = {"boundary": down_boundary}
+    elif choice == 5:
+        symbol_decision["later_up_buy"] = {"boundary": up_boundary, "margin": margin}
+    elif choice == 6:
+        symbol_decision["later_down_buy"] = {"boundary": down_boundary, "margin": margin}
+    elif choice == 7:
+        symbol_decision["later_up_sell"] = {"boundary": up_boundary, "margin": margin}
+    elif choice == 8:
+        symbol_decision["later_down_sell"] = {"boundary": down_boundary, "margin": margin}
+    elif choice == 9:
+        symbol_decision["book_buy"] = {"boundary": down_boundary, "margin": margin}
+    elif choice == 10:
+        symbol_decision["book_sell"] = {"boundary": up_boundary, "margin": margin}
+    elif choice == 11:
+        symbol_decision["cancel_all"] = {}
+    scribbles[symbol] = [o["command_name"] for o in open_orders.values()]
+"""
+
+
+def make_candle_data(length: int) -> pd.DataFrame:
+    random_generator = np.random.default_rng(21)
+    index = pd.date_range("2024-01-01", periods=length, freq="10S", tz="UTC")
+    columns = pd.MultiIndex.from_product([TARGET_SYMBOLS, CANDLE_FIELDS])
+    symbol_values = []
+    for _ in TARGET_SYMBOLS:
+        changes = random_generator.normal(0, 0.0007, length)
+        close_ar = 100 * np.exp(np.cumsum(changes))
+        open_ar = np.concatenate([close_ar[:1], close_ar[:-1]])
+        high_ar = np.maximum(open_ar, close_ar) * (
+            1 + random_generator.random(length) * 0.001
+        )
+        low_ar = np.minimum(open_ar, close_ar) * (
+            1 - random_generator.random(length) * 0.001
+        )
+        volume_ar = random_generator.random(length)
+        values = np.stack([open_ar, high_ar, low_ar, close_ar, volume_ar], axis=1)
+        values[random_generator.random(length) < 0.02] = np.nan
+        symbol_values.append(values)
+    candle_values = np.concatenate(symbol_values, axis=1)
+    return pd.DataFrame(candle_values, index=index, columns=columns).astype(np.float32)
+
+
+def simulate(
+    candle_data: pd.DataFrame, previous_output: CalculationOutput | None
+) -> CalculationOutput:
+    if previous_output is None:
+        virtual_state = {
+            "available_balance": 1,
+            "locations": {s: {"amount": 0, "entry_price": 0} for s in TARGET_SYMBOLS},
+            "placements": {s: {} for s in TARGET_SYMBOLS},
+        }
+        previous_output = CalculationOutput(
+            chunk_asset_record=create_empty_asset_record(),
+            chunk_unrealized_changes=create_empty_unrealized_changes(),
+            chunk_scribbles={},
+            chunk_account_state=create_empty_account_state(TARGET_SYMBOLS),
+            chunk_virtual_state=virtual_state,
+        )
+    indicators = pd.DataFrame(index=candle_data.index, dtype=np.float32)
+    calculation_input = CalculationInput(
+        progress_list=[0],  # type:ignore
+        target_progress=0,
+        target_symbols=TARGET_SYMBOLS,
+        calculation_index=candle_data.index,  # type:ignore
+        chunk_candle_data=candle_data,
+        chunk_indicators=indicators,
+        chunk_asset_record=previous_output.chunk_asset_record,
+        chunk_unrealized_changes=previous_output.chunk_unrealized_changes,
+        chunk_scribbles=previous_output.chunk_scribbles,
+        chunk_account_state=previous_output.chunk_account_state,
+        chunk_virtual_state=previous_output.chunk_virtual_state,
+        decision_script=DECISION_SCRIPT,
+    )
+    return simulate_chunk(calculation_input)
+
+
+# Produced by the kernel that kept placements in dictionaries
+# throughout the simulation, before they were held in slots.
+EXPECTED_TRADES = [
+    ("00:11:53.000", "BTCUSDT", "sell", "taker", 99.96869, 1.0),
+    ("01:02:03.000", "ETHUSDT", "sell", "taker", 99.07082, 1.0),
+    ("01:05:23.000", "BTCUSDT", "sell", "taker", 99.71414, 1.0),
+    ("01:16:53.000", "BTCUSDT", "buy", "taker", 100.07057, 0.999951452),
+    ("01:23:43.000", "ETHUSDT", "buy", "taker", 98.41739, 1.000096557),
+    ("02:22:33.000", "ETHUSDT", "buy", "maker", 98.29038, 1.000096557),
+    ("02:34:53.000", "ETHUSDT", "sell", "maker", 98.99596, 1.000249482),
+    ("02:41:33.000", "BTCUSDT", "sell", "taker", 103.44771, 1.000249482),
+    ("02:42:23.000", "ETHUSDT", "sell", "taker", 98.17988, 1.000238683),
+    ("03:03:13.000", "BTCUSDT", "buy", "taker", 102.51615, 1.000061925),
+    ("03:03:43.000", "ETHUSDT", "sell", "taker", 96.9416, 1.000061925),
+    ("04:03:13.000", "BTCUSDT", "buy", "maker", 100.9973, 1.000198318),
+    ("04:09:53.000", "ETHUSDT", "buy", "taker", 96.80048, 1.00036248),
+    ("04:28:13.000", "BTCUSDT", "sell", "maker", 101.76085, 1.00036248),
+    ("04:45:23.000", "BTCUSDT", "sell", "taker", 102.8119, 1.00036248),
+    ("05:03:33.000", "BTCUSDT", "buy", "taker", 103.87939, 0.999942141),
+    ("05:11:53.000", "ETHUSDT", "sell", "taker", 96.80094, 0.999942141),
+    ("05:26:23.000", "BTCUSDT", "buy", "taker", 104.37294, 0.999463303),
+    ("05:33:33.000", "ETHUSDT", "buy", "taker", 97.23818, 0.999415961),
+    ("06:11:53.000", "ETHUSDT", "sell", "maker", 97.02661, 0.999415961),
+    ("06:34:03.000", "ETHUSDT", "buy", "maker", 97.23758, 0.999371146),
+    ("06:51:23.000", "BTCUSDT", "sell", "taker", 107.6768, 0.999371146),
+    ("06:56:43.000", "ETHUSDT", "sell", "taker", 97.39184, 0.999371146),
+    ("07:13:03.000", "BTCUSDT", "buy", "taker", 108.06403, 0.999167607),
+    ("07:13:33.000", "ETHUSDT", "sell", "taker", 97.96735, 0.999167607),
+    ("07:49:23.000", "BTCUSDT", "sell", "maker", 107.34057, 0.999167607),
+    ("07:56:03.000", "ETHUSDT", "buy", "taker", 98.65246, 0.998907481),
+    ("08:13:43.000", "BTCUSDT", "buy", "maker", 107.41078, 0.998881844),
+    ("08:52:33.000", "BTCUSDT", "sell", "taker", 107.49024, 0.998881844),
+    ("09:21:43.000", "ETHUSDT", "sell", "taker", 99.48437, 0.998881844),
+    ("09:23:33.000", "BTCUSDT", "sell", "taker", 105.95616, 0.998881844),
+    ("09:43:23.000", "ETHUSDT", "buy", "taker", 97.99443, 0.998931696),
+    ("10:18:23.000", "ETHUSDT", "sell", "maker", 99.50435, 0.998931696),
+    ("10:38:53.000", "ETHUSDT", "buy", "maker", 98.71929, 0.998923727),
+    ("11:01:13.000", "BTCUSDT", "sell", "taker", 103.2343, 0.998923727),
+    ("11:13:53.000", "ETHUSDT", "sell", "taker", 99.12661, 0.998923727),
+    ("11:22:53.000", "BTCUSDT", "buy", "taker", 103.18186, 0.999474174),
+    ("11:22:53.001", "ETHUSDT", "sell", "taker", 99.35583, 0.999474174),
+    ("12:14:33.000", "ETHUSDT", "buy", "taker", 99.51792, 0.999345329),
+    ("12:19:13.000", "BTCUSDT", "buy", "maker", 103.16203, 0.999900303),
+    ("12:52:43.000", "ETHUSDT", "buy", "taker", 98.88179, 0.999920979),
+    ("13:00:13.000", "BTCUSDT", "sell", "taker", 102.96438, 0.999920979),
+    ("13:01:23.000", "BTCUSDT", "sell", "taker", 103.27066, 0.999920979),
+    ("13:09:53.000", "ETHUSDT", "buy", "taker", 99.6855, 0.999598833),
+    ("13:31:33.000", "ETHUSDT", "sell", "taker", 99.72433, 0.999598833),
+    ("13:53:13.000", "ETHUSDT", "buy", "taker", 100.32089, 0.999468008),
+    ("13:59:53.000", "BTCUSDT", "buy", "taker", 101.46873, 1.000047585),
+    ("14:27:23.000", "ETHUSDT", "sell", "maker", 100.39098, 1.000047585),
+    ("14:48:53.000", "ETHUSDT", "buy", "maker", 98.93319, 1.00035516),
+    ("15:11:03.000", "BTCUSDT", "sell", "taker", 101.34458, 1.00035516),
+    ("15:32:43.000", "BTCUSDT", "buy", "taker", 102.40014, 1.000617143),
+    ("15:32:53.000", "ETHUSDT", "sell", "taker", 100.32635, 1.000617143),
+    ("15:55:33.000", "ETHUSDT", "buy", "taker", 99.86241, 1.000709652),
+    ("16:25:03.000", "ETHUSDT", "buy", "taker", 99.8864, 1.000747763),
+    ("16:28:23.000", "BTCUSDT", "buy", "maker", 101.62448, 1.001194927),
+]
+EXPECTED_PLACEMENTS = {
+    "BTCUSDT": {"book_sell": ["boundary", "margin", "order_id"]},
+    "ETHUSDT": {"later_down_sell": ["boundary", "margin", "order_id"]},
+}
+EXPECTED_SCRIBBLES = {"BTCUSDT": ["book_sell"], "ETHUSDT": ["later_down_sell"]}
+EXPECTED_BALANCE = 0.955064437140479
+EXPECTED_CHANGE_SUM = 1.4001137018203735
+
+
+def test_simulation_matches_golden_output():
+    random.seed(0)
+    candle_data = make_candle_data(6000)
+    first_output = simulate(candle_data.iloc[:3000], None)
+    second_output = simulate(candle_data.iloc[3000:], first_output)
+
+    asset_record = second_output.chunk_asset_record
+    assert len(asset_record) == len(EXPECTED_TRADES)
+    for (moment, row), expected_trade in zip(asset_record.iterrows(), EXPECTED_TRADES):
+        fill_time, symbol, side, role, fill_price, result_asset = expected_trade
+        assert moment.strftime("%H:%M:%S.%f")[:-3] == fill_time  # type:ignore
+        assert (row["Symbol"], row["Side"], row["Role"]) == (symbol, side, role)
+        assert row["Fill Price"] == pytest.approx(fill_price, abs=1e-5)
+        assert row["Result Asset"] == pytest.approx(result_asset, abs=1e-9)
+
+    virtual_state = second_output.chunk_virtual_state
+    placements = {
+        symbol: {name: sorted(command) for name, command in symbol_placements.items()}
+        for symbol, symbol_placements in virtual_state["placements"].items()
+    }
+    assert placements == EXPECTED_PLACEMENTS
+    assert second_output.chunk_scribbles == EXPECTED_SCRIBBLES
+    assert virtual_state["available_balance"] == pytest.approx(EXPECTED_BALANCE)
+
+    unrealized_changes = second_output.chunk_unrealized_changes
+    assert len(unrealized_changes) == len(candle_data)
+    assert unrealized_changes.sum() == pytest.approx(EXPECTED_CHANGE_SUM)
@@ -0,0 +1,187 @@
+import random
+
+import numpy as np
+import pandas as pd
+from solie.utility import (
+    create_empty_account_state,
+    create_empty_asset_record,
+    create_empty_unrealized_changes,
+)
+from solie.utility.analyze_market import (
+    CalculationInput,
+    CalculationOutput,
+    can_simulate_signals,
+    simulate_chunk,
+)
+
+TARGET_SYMBOLS = ["BTCUSDT", "ETHUSDT"]
+CANDLE_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+# Holds a long or short position depending on the side of the moving average.
+SIGNALS_SCRIPT = """
+for symbol in target_symbols:
+    close_price = candle_data[(symbol, "Close")]
+    average_price = indicators[(symbol, "Price", "SMA")]
+    target_positions[symbol] = np.sign(close_price - average_price) * 0.15
+"""
+
+# Same strategy, placing orders only at candles where the target changes.
+DECISION_SCRIPT = """
+for symbol in target_symbols:
+    close_price = current_candle_data[str((symbol, "Close"))]
+    average_price = current_indicators[str((symbol, "Price", "SMA"))]
+    if close_price != close_price or average_price != average_price:
+        continue
+    if close_price == average_price:
+        target = 0.0
+    else:
+        target = math.copysign(0.15, close_price - average_price)
+    if scribbles.get(symbol) == target:
+        continue
+    scribbles[symbol] = target
+    position = account_state["positions"][symbol]
+    sign = {"long": 1, "short": -1, "none": 0}[position["direction"]]
+    current_margin = sign * position["margin"]
+    target_margin = target * account_state["wallet_balance"]
+    if target_margin == 0:
+        if sign != 0:
+            decision[symbol]["now_close"] = {}
+    elif target_margin > current_margin:
+        decision[symbol]["now_buy"] = {"margin": target_margin - current_margin}
+    elif target_margin < current_margin:
+        decision[symbol]["now_sell"] = {"margin": current_margin - target_margin}
+"""
+
+
+def make_candle_data(length: int) -> pd.DataFrame:
+    random_generator = np.random.default_rng(25)
+    index = pd.date_range("2024-01-01", periods=length, freq="10S", tz="UTC")
+    columns = pd.MultiIndex.from_product([TARGET_SYMBOLS, CANDLE_FIELDS])
+    symbol_values = []
+    for _ in TARGET_SYMBOLS:
+        changes = random_generator.normal(0, 0.0007, length)
+        close_ar = 100 * np.exp(np.cumsum(changes))
+        open_ar = np.concatenate([close_ar[:1], close_ar[:-1]])
+        high_ar = np.maximum(open_ar, close_ar) * 1.0005
+        low_ar = np.minimum(open_ar, close_ar) * 0.9995
+        volume_ar = random_generator.random(length)
+        values = np.stack([open_ar, high_ar, low_ar, close_ar, volume_ar], axis=1)
+        values[random_generator.random(length) < 0.02] = np.nan
+        symbol_values.append(values)
+    candle_values = np.concatenate(symbol_values, axis=1)
+    return pd.DataFrame(candle_values, index=index, columns=columns)
+
+
+def make_indicators(candle_data: pd.DataFrame) -> pd.DataFrame:
+    indicators = pd.DataFrame(index=candle_data.index)
+    for symbol in TARGET_SYMBOLS:
+        close_sr = candle_data[(symbol, "Close")]
+        indicators[(symbol, "Price", "SMA")] = close_sr.rolling(30).mean()
+    indicators.columns = pd.MultiIndex.from_tuples(indicators.columns)
+    return indicators
+
+
+def make_initial_output() -> CalculationOutput:
+    virtual_state = {
+        "available_balance": 1,
+        "locations": {s: {"amount": 0, "entry_price": 0} for s in TARGET_SYMBOLS},
+        "placements": {s: {} for s in TARGET_SYMBOLS},
+    }
+    return CalculationOutput(
+        chunk_asset_record=create_empty_asset_record(),
+        chunk_unrealized_changes=create_empty_unrealized_changes(),
+        chunk_scribbles={},
+        chunk_account_state=create_empty_account_state(TARGET_SYMBOLS),
+        chunk_virtual_state=virtual_state,
+    )
+
+
+def make_input(
+    candle_data: pd.DataFrame,
+    previous_output: CalculationOutput,
+    signals_script: str,
+) -> CalculationInput:
+    return CalculationInput(
+        progress_list=[0],  # type:ignore
+        target_progress=0,
+        target_symbols=TARGET_SYMBOLS,
+        calculation_index=candle_data.index,  # type:ignore
+        chunk_candle_data=candle_data,
+        chunk_indicators=make_indicators(candle_data),
+        chunk_asset_record=previous_output.chunk_asset_record,
+        chunk_unrealized_changes=previous_output.chunk_unrealized_changes,
+        chunk_scribbles=previous_output.chunk_scribbles,
+        chunk_account_state=previous_output.chunk_account_state,
+        chunk_virtual_state=previous_output.chunk_virtual_state,
+        decision_script=DECISION_SCRIPT,
+        signals_script=signals_script,
+    )
+
+
+def simulate(
+    candle_data: pd.DataFrame,
+    previous_output: CalculationOutput,
+    signals_script: str,
+) -> CalculationOutput:
+    random.seed(0)
+    calculation_input = make_input(candle_data, previous_output, signals_script)
+    return simulate_chunk(calculation_input)
+
+
+def assert_same_output(output: CalculationOutput, expected_output: CalculationOutput):
+    pd.testing.assert_frame_equal(
+        output.chunk_asset_record, expected_output.chunk_asset_record
+    )
+    pd.testing.assert_series_equal(
+        output.chunk_unrealized_changes,
+        expected_output.chunk_unrealized_changes,
+        check_freq=False,
+        check_names=False,
+    )
+    account_state = output.chunk_account_state
+    expected_account_state = expected_output.chunk_account_state
+    assert account_state["positions"] == expected_account_state["positions"]
+    assert account_state["wallet_balance"] == expected_account_state["wallet_balance"]
+    virtual_state = output.chunk_virtual_state
+    expected_virtual_state = expected_output.chunk_virtual_state
+    assert virtual_state["locations"] == expected_virtual_state["locations"]
+    assert virtual_state["placements"] == expected_virtual_state["placements"]
+
+
+def test_signals_match_decisions_across_chunks():
+    candle_data = make_candle_data(6000)
+    chunks = [candle_data.iloc[:3000], candle_data.iloc[3000:]]
+
+    decided_output = make_initial_output()
+    signaled_output = make_initial_output()
+    for chunk_candle_data in chunks:
+        decided_output = simulate(chunk_candle_data, decided_output, "")
+        signaled_output = simulate(chunk_candle_data, signaled_output, SIGNALS_SCRIPT)
+        assert_same_output(signaled_output, decided_output)
+
+    assert len(signaled_output.chunk_asset_record) > 100
+
+
+def test_waiting_placements_fall_back_to_decisions():
+    candle_data = make_candle_data(3000)
+
+    def make_waiting_output() -> CalculationOutput:
+        # Left by an earlier chunk, waiting for a price that's never reached
+        previous_output = make_initial_output()
+        placements = previous_output.chunk_virtual_state["placements"]
+        placements["BTCUSDT"]["later_up_buy"] = {
+            "boundary": 1000.0,
+            "margin": 0.1,
+            "order_id": 7,
+        }
+        return previous_output
+
+    calculation_input = make_input(candle_data, make_waiting_output(), SIGNALS_SCRIPT)
+    assert not can_simulate_signals(calculation_input)
+
+    # A signals script that never trades would tell if it was used.
+    decided_output = simulate(candle_data, make_waiting_output(), "")
+    signaled_output = simulate(candle_data, make_waiting_output(), "pass")
+
+    assert_same_output(signaled_output, decided_output)
+    assert len(signaled_output.chunk_asset_record) > 0